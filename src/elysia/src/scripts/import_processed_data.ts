@@ -4,7 +4,12 @@ import type { Prisma } from "@prisma/client";
 import { prisma } from "../lib/prisma";
 
 const DATA_PROCESSED_DIR = resolve(import.meta.dir, "../../../python/data_processed");
-const EXCLUDED_FILE = "processing_report.json";
+// 处理报告、构建清单与调度报告不是图表数据，不参与导库
+const EXCLUDED_FILES = new Set([
+  "processing_report.json",
+  "build_manifest.json",
+  "pipeline_report.json",
+]);
 
 function calcItemCount(payload: unknown): number {
   if (Array.isArray(payload)) {
@@ -22,7 +27,7 @@ function calcItemCount(payload: unknown): number {
 async function main() {
   const runId = `import_${Date.now()}`;
   const files = (await readdir(DATA_PROCESSED_DIR))
-    .filter((file) => file.endsWith(".json") && file !== EXCLUDED_FILE)
+    .filter((file) => file.endsWith(".json") && !EXCLUDED_FILES.has(file))
     .sort();
 
   const details: Array<Record<string, unknown>> = [];
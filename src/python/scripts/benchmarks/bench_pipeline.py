@@ -0,0 +1,504 @@
+"""流水线规模基准：在合成数据上逐个计时全部 preprocess_* / process_* 函数。
+
+每个函数在独立子进程中运行（两个阶段的 common 模块同名，且峰值 RSS 需按函数
+单独统计），结果写出为 JSON，便于跨提交对比回归。
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+import argparse
+import importlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any
+
+BENCH_DIR = Path(__file__).resolve().parent
+SCRIPTS_DIR = BENCH_DIR.parent
+RESULTS_DIR = BENCH_DIR / "results"
+
+# 与 shared.paths.PY_ROOT_ENV 保持一致
+PY_ROOT_ENV = "DPV_CQW_PY_ROOT"
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+
+@dataclass(frozen=True)
+class BenchTarget:
+    """被计时的函数：所属阶段目录、模块、函数名及其原始数据集。"""
+
+    stage: str
+    module: str
+    function: str
+    source: str
+
+
+# 顺序即执行顺序：二次处理依赖预处理写出的清洗数据
+BENCH_TARGETS = (
+    BenchTarget(
+        "preprocessing",
+        "preprocess_beibei_yearly",
+        "preprocess_beibei_yearly",
+        "beibei_yearly",
+    ),
+    BenchTarget(
+        "preprocessing",
+        "preprocess_air_quality_days",
+        "preprocess_air_quality_days",
+        "air_quality_days",
+    ),
+    BenchTarget(
+        "preprocessing",
+        "preprocess_extended_forecast",
+        "preprocess_extended_forecast",
+        "extended_forecast",
+    ),
+    BenchTarget(
+        "preprocessing",
+        "preprocess_grid_history",
+        "preprocess_grid_history",
+        "grid_history",
+    ),
+    BenchTarget(
+        "processing",
+        "process_beibei_charts",
+        "process_beibei_yearly_charts",
+        "beibei_yearly",
+    ),
+    BenchTarget(
+        "processing",
+        "process_air_quality_charts",
+        "process_air_quality_charts",
+        "air_quality_days",
+    ),
+    BenchTarget(
+        "processing",
+        "process_extended_forecast_charts",
+        "process_extended_forecast_charts",
+        "extended_forecast",
+    ),
+    BenchTarget(
+        "processing",
+        "process_grid_history_charts",
+        "process_grid_history_charts",
+        "grid_history",
+    ),
+    BenchTarget(
+        "processing",
+        "process_grid_pyramid",
+        "process_grid_metric_pyramid",
+        "grid_history",
+    ),
+    BenchTarget(
+        "processing",
+        "process_grid_recent_charts",
+        "process_grid_recent_charts",
+        "grid_history",
+    ),
+    BenchTarget(
+        "processing",
+        "process_grid_rolling_charts",
+        "process_grid_rolling_charts",
+        "grid_history",
+    ),
+)
+
+
+def peak_rss_bytes() -> int | None:
+    """当前进程的峰值常驻内存（字节）；平台不支持时返回 None。
+
+    Linux 读取 /proc/self/status 的 VmHWM：getrusage 的 ru_maxrss 会从父进程
+    继承（fork 后跨 exec 保留），子进程读到的是父进程的峰值。
+    """
+    hwm = _proc_status_bytes("VmHWM")
+    if hwm is not None:
+        return hwm
+    try:
+        import resource
+    except ImportError:
+        return _windows_peak_rss_bytes()
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 计，macOS 以字节计
+    return int(peak) if sys.platform == "darwin" else int(peak) * 1024
+
+
+def _proc_status_bytes(field: str) -> int | None:
+    """读取 /proc/self/status 中以 kB 计的字段；不可用时返回 None。"""
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    return None
+
+
+def _windows_peak_rss_bytes() -> int | None:
+    """Windows 下通过 GetProcessMemoryInfo 读取 PeakWorkingSetSize。"""
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class _MemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = _MemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(
+            handle, ctypes.byref(counters), counters.cb
+        ):
+            return None
+        return int(counters.PeakWorkingSetSize)
+    except (AttributeError, OSError):
+        return None
+
+
+def _to_mb(value: int | None) -> float | None:
+    """字节转 MB。"""
+    return round(value / 1024 / 1024, 1) if value is not None else None
+
+
+def _run_target_in_process(target: BenchTarget, formats: list[str]) -> dict[str, Any]:
+    """子进程入口：导入并计时单个函数，预处理结果随后落盘供二次处理使用。
+
+    基线峰值在导入目标模块之前取得，peak_rss_delta_mb 为导入与执行带来的增量。
+    """
+    baseline_rss = peak_rss_bytes()
+    sys.path.insert(0, str(SCRIPTS_DIR / target.stage))
+    module = importlib.import_module(target.module)
+    func = getattr(module, target.function)
+    common = importlib.import_module("common")
+
+    started = time.perf_counter()
+    returned = func()
+    seconds = time.perf_counter() - started
+    peak_rss = peak_rss_bytes()
+
+    if target.stage == "preprocessing":
+        frames = [item for item in returned if hasattr(item, "columns")]
+        results = [item for item in returned if hasattr(item, "dataset")]
+        save_started = time.perf_counter()
+        for df, result in zip(frames, results):
+            common.save_cleaned_dataset(df, result.dataset, formats=formats)
+            result.rows_out = len(df)
+        save_seconds = round(time.perf_counter() - save_started, 4)
+    else:
+        results = returned
+        save_seconds = None
+
+    return {
+        "seconds": seconds,
+        "save_seconds": save_seconds,
+        "baseline_rss_mb": _to_mb(baseline_rss),
+        "peak_rss_mb": _to_mb(peak_rss),
+        "peak_rss_delta_mb": (
+            _to_mb(peak_rss - baseline_rss)
+            if peak_rss is not None and baseline_rss is not None
+            else None
+        ),
+        "results": [
+            {
+                "dataset": item.dataset,
+                "rows_in": item.rows_in,
+                "rows_out": item.rows_out,
+            }
+            for item in results
+        ],
+    }
+
+
+def run_target(target: BenchTarget, root: Path, formats: list[str]) -> dict[str, Any]:
+    """在全新子进程中运行单个目标，返回其计时结果。"""
+    env = {**os.environ, PY_ROOT_ENV: str(root)}
+    command = [
+        sys.executable,
+        str(Path(__file__).resolve()),
+        "--child",
+        target.stage,
+        target.module,
+        target.function,
+        target.source,
+        "--format",
+        *formats,
+    ]
+    completed = subprocess.run(
+        command, env=env, capture_output=True, text=True, encoding="utf-8"
+    )
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"退出码 {completed.returncode}")
+    # 子进程最后一行输出为结果 JSON，之前的输出（如有）忽略
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def bench_size(
+    rows: int,
+    root: Path,
+    repeat: int,
+    formats: list[str],
+    grid_files: int,
+    stations: int,
+    seed: int,
+) -> dict[str, Any]:
+    """生成指定规模的合成数据并计时全部目标。"""
+    from synthetic_data import generate_raw_data
+
+    started = time.perf_counter()
+    source_rows = generate_raw_data(root, rows, grid_files, stations, seed)
+    generate_seconds = time.perf_counter() - started
+
+    items = []
+    for target in BENCH_TARGETS:
+        item: dict[str, Any] = {**asdict(target), "rows": source_rows[target.source]}
+        try:
+            runs = [run_target(target, root, formats) for _ in range(repeat)]
+        except RuntimeError as exc:
+            item.update(status="failed", error=str(exc))
+            items.append(item)
+            continue
+
+        # 多次运行取最快一次，降低系统抖动对跨提交对比的影响
+        best = min(runs, key=lambda run: run["seconds"])
+        item.update(
+            status="ok",
+            seconds=round(best["seconds"], 4),
+            seconds_all=[round(run["seconds"], 4) for run in runs],
+            rows_per_second=(
+                round(item["rows"] / best["seconds"], 1) if best["seconds"] else None
+            ),
+            save_seconds=best["save_seconds"],
+            baseline_rss_mb=best["baseline_rss_mb"],
+            peak_rss_mb=max(
+                (run["peak_rss_mb"] for run in runs if run["peak_rss_mb"] is not None),
+                default=None,
+            ),
+            peak_rss_delta_mb=max(
+                (
+                    run["peak_rss_delta_mb"]
+                    for run in runs
+                    if run["peak_rss_delta_mb"] is not None
+                ),
+                default=None,
+            ),
+            results=best["results"],
+        )
+        items.append(item)
+
+    return {
+        "rows": rows,
+        "generate_seconds": round(generate_seconds, 3),
+        "targets": items,
+    }
+
+
+def _git_commit() -> str | None:
+    """当前提交哈希；不在 git 仓库中时返回 None。"""
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=BENCH_DIR,
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return None
+    return completed.stdout.strip() or None
+
+
+def run_benchmarks(
+    sizes: list[int],
+    repeat: int = 1,
+    formats: list[str] | None = None,
+    grid_files: int = 3,
+    stations: int = 100,
+    seed: int = 0,
+    workdir: Path | None = None,
+    keep_data: bool = False,
+) -> dict[str, Any]:
+    """按规模依次运行基准，返回可直接写出的报告内容。"""
+    import numpy as np
+    import pandas as pd
+
+    formats = formats or ["json"]
+    runs = []
+    for rows in sizes:
+        root = Path(tempfile.mkdtemp(prefix=f"dpv_cqw_bench_{rows}_", dir=workdir))
+        try:
+            runs.append(
+                bench_size(rows, root, repeat, formats, grid_files, stations, seed)
+            )
+        finally:
+            if not keep_data:
+                shutil.rmtree(root, ignore_errors=True)
+
+    return {
+        "project": "DPV-CQW",
+        "suite": "pipeline",
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "environment": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "params": {
+            "sizes": sizes,
+            "repeat": repeat,
+            "formats": formats,
+            "grid_files": grid_files,
+            "stations": stations,
+            "seed": seed,
+        },
+        "runs": runs,
+    }
+
+
+def compare_reports(
+    previous: dict[str, Any], current: dict[str, Any]
+) -> list[dict[str, Any]]:
+    """按 (规模, 函数) 对比两份报告的耗时与峰值内存，ratio > 1 表示变慢。"""
+    index = {
+        (run["rows"], item["function"]): item
+        for run in previous.get("runs", [])
+        for item in run["targets"]
+        if item.get("status") == "ok"
+    }
+    rows = []
+    for run in current.get("runs", []):
+        for item in run["targets"]:
+            old = index.get((run["rows"], item["function"]))
+            if old is None or item.get("status") != "ok":
+                continue
+            rows.append(
+                {
+                    "rows": run["rows"],
+                    "function": item["function"],
+                    "seconds_before": old["seconds"],
+                    "seconds_after": item["seconds"],
+                    "ratio": (
+                        round(item["seconds"] / old["seconds"], 3)
+                        if old["seconds"]
+                        else None
+                    ),
+                    "peak_rss_mb_before": old.get("peak_rss_mb"),
+                    "peak_rss_mb_after": item.get("peak_rss_mb"),
+                    "peak_rss_delta_mb_before": old.get("peak_rss_delta_mb"),
+                    "peak_rss_delta_mb_after": item.get("peak_rss_delta_mb"),
+                }
+            )
+    return rows
+
+
+def write_report(report: dict[str, Any], output: Path | None = None) -> Path:
+    """写出基准报告，默认按提交哈希命名到 results 目录。"""
+    if output is None:
+        commit = (report.get("git_commit") or "nogit")[:10]
+        output = RESULTS_DIR / f"pipeline_{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return output
+
+
+def _parse_args() -> argparse.Namespace:
+    """解析命令行参数。"""
+    parser = argparse.ArgumentParser(description="DPV-CQW 流水线规模基准")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=list(DEFAULT_SIZES),
+        help="各数据集合成行数，可多选（默认 10000 100000 1000000，最大可到 5000 万）",
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="每个函数重复次数")
+    parser.add_argument(
+        "--format",
+        dest="formats",
+        nargs="+",
+        choices=("json", "parquet"),
+        default=["json"],
+        help="清洗结果落盘格式（影响二次处理读取耗时）",
+    )
+    parser.add_argument("--grid-files", type=int, default=3, help="网格历史文件数")
+    parser.add_argument("--stations", type=int, default=100, help="网格站点数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--workdir", type=Path, default=None, help="合成数据所在目录（默认系统临时目录）")
+    parser.add_argument("--keep-data", action="store_true", help="保留合成数据与中间产物")
+    parser.add_argument(
+        "--output", type=Path, default=None, help="报告路径（默认 results/pipeline_<提交>.json）"
+    )
+    parser.add_argument("--compare", type=Path, default=None, help="与既有报告对比并输出耗时比值")
+    parser.add_argument("--child", nargs=4, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+
+    if args.child:
+        child_result = _run_target_in_process(BenchTarget(*args.child), args.formats)
+        print(json.dumps(child_result, ensure_ascii=False))
+        sys.exit(0)
+
+    sys.path.insert(0, str(BENCH_DIR))
+    bench_report = run_benchmarks(
+        sizes=args.sizes,
+        repeat=max(1, args.repeat),
+        formats=args.formats,
+        grid_files=args.grid_files,
+        stations=args.stations,
+        seed=args.seed,
+        workdir=args.workdir,
+        keep_data=args.keep_data,
+    )
+    if args.compare:
+        with args.compare.open("r", encoding="utf-8") as f:
+            bench_report["comparison"] = {
+                "baseline": str(args.compare),
+                "items": compare_reports(json.load(f), bench_report),
+            }
+    report_file = write_report(bench_report, args.output)
+
+    for size_run in bench_report["runs"]:
+        print(f"\n规模 {size_run['rows']} 行（生成 {size_run['generate_seconds']}s）：")
+        for target_item in size_run["targets"]:
+            if target_item["status"] != "ok":
+                print(f"- {target_item['function']}: 失败 {target_item['error']}")
+                continue
+            print(
+                f"- {target_item['function']}: {target_item['seconds']:.3f}s, "
+                f"{target_item['rows_per_second']:.0f} 行/s, "
+                f"峰值 RSS {target_item['peak_rss_mb']} MB"
+                f"（增量 {target_item['peak_rss_delta_mb']} MB）"
+            )
+    for compared in bench_report.get("comparison", {}).get("items", []):
+        print(
+            f"对比 {compared['rows']} 行 {compared['function']}: "
+            f"{compared['seconds_before']}s -> {compared['seconds_after']}s "
+            f"(x{compared['ratio']})"
+        )
+    print(f"\n报告文件: {report_file}")
@@ -0,0 +1,63 @@
+"""recv_time 解析基准：对比原 strptime 格式解析与去重 + 定位快速解析。"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# 基准脚本独立运行，需手动把预处理目录加入导入路径
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "preprocessing"))
+
+from common import RECV_TIME_FORMAT, parse_recv_time_series  # noqa: E402
+
+
+def make_recv_time_column(rows: int, stations: int, seed: int = 0) -> pd.Series:
+    """生成合成 recv_time 列：多站点逐小时上报，时间戳在站点间重复。"""
+    hours = max(1, rows // stations)
+    start = pd.Timestamp("2021-01-01 01:00:00")
+    timeline = pd.date_range(start, periods=hours, freq="h")
+    text = pd.Series(timeline.strftime("%a %b %d %H:%M:%S CST %Y"))
+
+    rng = np.random.default_rng(seed)
+    positions = np.tile(np.arange(hours), stations)[:rows]
+    # 打乱顺序，避免排序后的输入让缓存命中过于理想
+    rng.shuffle(positions)
+    return pd.Series(text.to_numpy()[positions], dtype="object")
+
+
+def _time_call(func, *args) -> tuple[float, pd.Series]:
+    """执行一次并返回耗时（秒）与结果。"""
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="recv_time 解析基准")
+    parser.add_argument("--rows", type=int, default=3_000_000, help="合成行数")
+    parser.add_argument("--stations", type=int, default=300, help="站点数")
+    args = parser.parse_args()
+
+    column = make_recv_time_column(args.rows, args.stations)
+
+    baseline_seconds, expected = _time_call(
+        lambda s: pd.to_datetime(s, format=RECV_TIME_FORMAT, errors="coerce"), column
+    )
+    fast_seconds, actual = _time_call(parse_recv_time_series, column)
+
+    if not actual.equals(expected):
+        raise SystemExit("快速解析结果与原解析器不一致")
+
+    print(f"行数: {len(column)}，唯一时间戳: {column.nunique()}")
+    print(f"原格式解析: {baseline_seconds:.3f}s")
+    print(f"快速解析:   {fast_seconds:.3f}s")
+    print(f"加速比:     {baseline_seconds / fast_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
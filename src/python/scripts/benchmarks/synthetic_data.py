@@ -0,0 +1,296 @@
+"""合成原始数据生成器：按原始文件结构写出任意规模的基准输入。
+
+生成的目录与 src/python 一致（data/ 下为原始 JSON），配合环境变量
+DPV_CQW_PY_ROOT 即可让预处理、二次处理脚本在临时目录中完整运行。
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import argparse
+import json
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+
+# 单次序列化的记录数：决定生成大文件时的峰值内存
+CHUNK_ROWS = 1_000_000
+
+GRID_FILE_TEMPLATE = "大气网格化监测历史数据信息({index}).json"
+AIR_QUALITY_FILE = "空气优良天数(1).json"
+FORECAST_FILE = "延伸期预报气象服务(1).json"
+BEIBEI_FILE = "北碚区主要年份气象基本情况信息(1).json"
+
+# 各原始文件首条记录为“字段中文名”说明行，与真实数据保持一致
+GRID_HEADER = {
+    "recv_time": "字段中文名：时间",
+    "sp_id": "字段中文名：站点ID",
+    "pm2_5": "字段中文名：PM2点5",
+    "id": "字段中文名：序号",
+}
+AIR_QUALITY_HEADER = {
+    "chaobiaotianshu": "字段中文名：超标天数",
+    "youdetianshu": "字段中文名：优的天数",
+    "liangdetianshu": "字段中文名：良的天数",
+    "yf": "字段中文名：月份日期",
+}
+FORECAST_HEADER = {
+    "zytqgc": "字段中文名：主要天气过程",
+    "tqqs": "字段中文名：天气趋势",
+    "fbsj": "字段中文名：发布时间",
+}
+BEIBEI_HEADER = {
+    "xh": "字段中文名：序号",
+    "jsl": "字段中文名：降水量",
+    "pjfs": "字段中文名：平均风速",
+    "pjqw": "字段中文名：平均气温",
+    "wsq": "字段中文名：无霜期",
+    "pjqy": "字段中文名：平均气压",
+    "nf": "字段中文名：年份",
+    "pjxdsd": "字段中文名：平均相对湿度",
+    "rzss": "字段中文名：日照时数",
+}
+
+RECV_TIME_TEXT_FORMAT = "%a %b %d %H:%M:%S CST %Y"
+
+
+def _chunk_bounds(rows: int, chunk_rows: int = CHUNK_ROWS) -> Iterator[tuple[int, int]]:
+    """按块切分 [0, rows)。"""
+    for start in range(0, rows, chunk_rows):
+        yield start, min(start + chunk_rows, rows)
+
+
+def _write_json_array(
+    path: Path, header: dict[str, str], chunks: Iterator[pd.DataFrame]
+) -> None:
+    """以说明行开头，逐块把 DataFrame 追加为 JSON 数组元素（不整体驻留内存）。"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        f.write("[")
+        f.write(json.dumps(header, ensure_ascii=False, separators=(",", ":")))
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            lines = chunk.to_json(orient="records", lines=True, force_ascii=False)
+            f.write(",")
+            f.write(lines.rstrip("\n").replace("\n", ","))
+        f.write("]")
+
+
+def _with_blanks(
+    values: pd.Series, rng: np.random.Generator, ratio: float
+) -> pd.Series:
+    """按比例把部分值替换为空字符串，模拟原始数据中的缺测。"""
+    mask = rng.random(len(values)) < ratio
+    return values.mask(mask, "")
+
+
+def _grid_chunks(
+    start_id: int, rows: int, stations: int, rng: np.random.Generator
+) -> Iterator[pd.DataFrame]:
+    """网格监测记录：站点逐小时上报，同一文件内按站点、时间有序。"""
+    hours = max(1, -(-rows // stations))
+    timeline = pd.date_range("2021-01-01 01:00:00", periods=hours, freq="h")
+    recv_text = np.asarray(timeline.strftime(RECV_TIME_TEXT_FORMAT), dtype=object)
+
+    for lo, hi in _chunk_bounds(rows):
+        positions = np.arange(lo, hi)
+        station = 1000 + positions // hours
+        pm2_5 = np.round(rng.gamma(2.0, 0.02, hi - lo), 7)
+        yield pd.DataFrame(
+            {
+                "id": start_id + positions,
+                "sp_id": station.astype(str),
+                "pm2_5": _with_blanks(pd.Series(pm2_5.astype(str)), rng, 0.002),
+                "recv_time": recv_text[positions % hours],
+            }
+        )
+
+
+def write_grid_history(
+    data_dir: Path, rows: int, files: int = 3, stations: int = 100, seed: int = 0
+) -> list[Path]:
+    """写出网格监测历史文件，总行数 rows 均分到 files 个文件。"""
+    rng = np.random.default_rng(seed)
+    files = max(1, files)
+    paths = []
+    start_id = 1
+    for index in range(files):
+        file_rows = rows // files + (1 if index < rows % files else 0)
+        path = data_dir / GRID_FILE_TEMPLATE.format(index=index + 1)
+        _write_json_array(
+            path, GRID_HEADER, _grid_chunks(start_id, file_rows, stations, rng)
+        )
+        start_id += file_rows
+        paths.append(path)
+    return paths
+
+
+def _chinese_date(days: pd.DatetimeIndex, with_year: bool = True) -> pd.Index:
+    """拼出“2024年6月15日”形式的中文日期（不依赖平台相关的 strftime 标志）。"""
+    text = days.month.astype(str) + "月" + days.day.astype(str) + "日"
+    return days.year.astype(str) + "年" + text if with_year else text
+
+
+def _air_quality_chunks(rows: int, rng: np.random.Generator) -> Iterator[pd.DataFrame]:
+    """空气优良天数：yf 混合月份数字、Excel 序列号与中文日期三种写法。"""
+    for lo, hi in _chunk_bounds(rows):
+        size = hi - lo
+        kind = rng.integers(0, 3, size)
+        month = rng.integers(1, 13, size).astype(str)
+        serial = rng.integers(43831, 46023, size).astype(str)
+        days = pd.Timestamp("2020-01-01") + pd.to_timedelta(
+            rng.integers(0, 2200, size), unit="D"
+        )
+        yf = np.where(
+            kind == 0, month, np.where(kind == 1, serial, _chinese_date(days))
+        )
+        yield pd.DataFrame(
+            {
+                "yf": yf,
+                "youdetianshu": rng.integers(0, 31, size).astype(str),
+                "liangdetianshu": rng.integers(0, 31, size).astype(str),
+                "chaobiaotianshu": _with_blanks(
+                    pd.Series(rng.integers(0, 10, size).astype(str)), rng, 0.05
+                ),
+            }
+        )
+
+
+def write_air_quality_days(data_dir: Path, rows: int, seed: int = 0) -> Path:
+    """写出空气优良天数文件。"""
+    rng = np.random.default_rng(seed + 1)
+    path = data_dir / AIR_QUALITY_FILE
+    _write_json_array(path, AIR_QUALITY_HEADER, _air_quality_chunks(rows, rng))
+    return path
+
+
+def _forecast_chunks(rows: int, rng: np.random.Generator) -> Iterator[pd.DataFrame]:
+    """延伸期预报：按真实文本句式拼出气温/降水区间与发布时间。"""
+    for lo, hi in _chunk_bounds(rows):
+        size = hi - lo
+        start = pd.Timestamp("2023-10-01") + pd.to_timedelta(
+            rng.integers(0, 700, size), unit="D"
+        )
+        end = start + pd.Timedelta(days=15)
+        temp_lo = np.round(rng.uniform(5, 28, size), 1)
+        temp_hi = np.round(temp_lo + rng.uniform(0.2, 0.6, size), 1)
+        rain_lo = rng.integers(5, 120, size)
+        rain_hi = rain_lo + rng.integers(1, 10, size)
+        rain_single = rng.random(size) < 0.4
+        sep = np.where(rng.random(size) < 0.5, "～", "~")
+
+        period = (
+            "预计未来15—30天（"
+            + _chinese_date(start)
+            + "—"
+            + _chinese_date(end, with_year=False)
+            + "），平均气温为"
+        )
+        temp = pd.Series(temp_lo.astype(str)) + sep + temp_hi.astype(str) + "℃"
+        rain = pd.Series(
+            np.where(
+                rain_single,
+                rain_lo.astype(str) + "毫米左右",
+                rain_lo.astype(str) + "～" + rain_hi.astype(str) + "毫米",
+            )
+        )
+        tqqs = (
+            pd.Series(period)
+            + temp
+            + "，与常年同期相比偏高0.2～0.5℃。降水量为"
+            + rain
+            + "，与常年同期相比偏少1成左右。"
+        )
+        zytqgc = pd.Series(
+            start.day.astype(str)
+            + "—"
+            + (start + pd.Timedelta(days=1)).day.astype(str)
+            + "日，小雨，气温略降； "
+            + _chinese_date(end, with_year=False)
+            + "，中到大雨。"
+        )
+        fbsj = pd.Series(_chinese_date(start - pd.Timedelta(days=1)))
+        yield pd.DataFrame(
+            {"tqqs": tqqs, "zytqgc": zytqgc, "fbsj": _with_blanks(fbsj, rng, 0.1)}
+        )
+
+
+def write_extended_forecast(data_dir: Path, rows: int, seed: int = 0) -> Path:
+    """写出延伸期预报文件。"""
+    rng = np.random.default_rng(seed + 2)
+    path = data_dir / FORECAST_FILE
+    _write_json_array(path, FORECAST_HEADER, _forecast_chunks(rows, rng))
+    return path
+
+
+def _beibei_chunks(rows: int, rng: np.random.Generator) -> Iterator[pd.DataFrame]:
+    """北碚年度气象：数值字段均以字符串形式存放。"""
+    for lo, hi in _chunk_bounds(rows):
+        size = hi - lo
+        positions = np.arange(lo, hi)
+        yield pd.DataFrame(
+            {
+                "nf": (2001 + positions % 25).astype(str),
+                "jsl": np.round(rng.uniform(800, 1400, size), 1).astype(str),
+                "pjqw": np.round(rng.uniform(17.5, 19.5, size), 6).astype(str),
+                "rzss": np.round(rng.uniform(900, 1300, size), 1).astype(str),
+                "pjxdsd": rng.integers(70, 85, size).astype(str),
+                "pjfs": np.round(rng.uniform(0.8, 1.6, size), 1).astype(str),
+                "wsq": rng.integers(300, 365, size).astype(str),
+                "pjqy": np.round(rng.uniform(980, 990, size), 1).astype(str),
+                "xh": (positions + 1).astype(str),
+            }
+        )
+
+
+def write_beibei_yearly(data_dir: Path, rows: int, seed: int = 0) -> Path:
+    """写出北碚年度气象文件。"""
+    rng = np.random.default_rng(seed + 3)
+    path = data_dir / BEIBEI_FILE
+    _write_json_array(path, BEIBEI_HEADER, _beibei_chunks(rows, rng))
+    return path
+
+
+def generate_raw_data(
+    root: Path,
+    rows: int,
+    grid_files: int = 3,
+    stations: int = 100,
+    seed: int = 0,
+) -> dict[str, int]:
+    """在 root/data 下写出全部原始数据集，各数据集均为 rows 行，返回各数据集行数。"""
+    data_dir = root / "data"
+    write_beibei_yearly(data_dir, rows, seed)
+    write_air_quality_days(data_dir, rows, seed)
+    write_extended_forecast(data_dir, rows, seed)
+    write_grid_history(data_dir, rows, grid_files, stations, seed)
+    return {
+        "beibei_yearly": rows,
+        "air_quality_days": rows,
+        "extended_forecast": rows,
+        "grid_history": rows,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="生成合成原始数据")
+    parser.add_argument("root", type=Path, help="输出根目录（原始文件写入 root/data）")
+    parser.add_argument("--rows", type=int, default=100_000, help="每个数据集的行数")
+    parser.add_argument("--grid-files", type=int, default=3, help="网格历史文件数")
+    parser.add_argument("--stations", type=int, default=100, help="网格站点数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    counts = generate_raw_data(
+        args.root, args.rows, args.grid_files, args.stations, args.seed
+    )
+    for dataset, rows in counts.items():
+        print(f"- {dataset}: {rows} 行")
+    print(f"输出目录: {args.root / 'data'}")
+
+
+if __name__ == "__main__":
+    main()
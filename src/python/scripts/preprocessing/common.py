@@ -2,20 +2,63 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
+import importlib.util
 import json
+import os
 import re
-from typing import Any
+import shutil
+import sys
+import time
+from typing import Any, Iterable, Iterator
 
+import numpy as np
 import pandas as pd
 
 
-# 目录定义：统一从 src/python 根目录推导
-PY_ROOT_DIR = Path(__file__).resolve().parents[2]
-RAW_DATA_DIR = PY_ROOT_DIR / "data"
-CLEANED_DIR = PY_ROOT_DIR / "data_cleaned"
+# 两个阶段共用的 shared 包位于 scripts 目录；直接运行本阶段脚本时需加入 sys.path。
+# 以下导入的目录、运行指标与构建清单工具由本阶段各脚本经 common 使用
+_SCRIPTS_ROOT = str(Path(__file__).resolve().parents[1])
+if _SCRIPTS_ROOT not in sys.path:
+    sys.path.insert(0, _SCRIPTS_ROOT)
+
+from shared.json_stream import STREAM_CHUNK_CHARS, iter_json_array
+from shared.layout import (
+    PARTITIONS_FILE,
+    PARTITIONS_VERSION,
+    STATION_INDEX_FILE,
+    STATION_INDEX_SUFFIX,
+    TIME_PARTITIONS_FILE,
+    load_partition_manifest,
+    partitions_dir,
+    station_index_dir,
+    time_partitions_dir,
+)
+from shared.manifest import build_fingerprint, file_sha256
+from shared.manifest import code_version as _code_version
+from shared.manifest import load_build_manifest, save_build_manifest
+from shared.metrics import (
+    call_with_worker_metrics,
+    collect_step_metrics,
+    current_step_metrics,
+    merge_worker_metrics,
+    record_load,
+    record_serialize,
+    timed_substep,
+)
+from shared.paths import CLEANED_DIR, PY_ROOT_DIR, PY_ROOT_ENV, RAW_DATA_DIR
+
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+BUILD_MANIFEST_PATH = CLEANED_DIR / "build_manifest.json"
+
+# 清洗结果落盘格式：JSON 为默认导出格式，Parquet 为可选列式格式（保留 dtype）
+CLEANED_FORMATS = ("json", "parquet")
+DEFAULT_CLEANED_FORMATS = ("json",)
 
 
 @dataclass
@@ -26,6 +69,14 @@ class PreprocessResult:
     rows_in: int
     rows_out: int
     json_path: str
+    parquet_path: str = ""
+    # 按站点排序的时间索引目录（仅网格宽表），见 save_station_index
+    index_path: str = ""
+    # 按月时间分区目录（网格宽表 / 长表，--time-partitions），见 save_time_partitions
+    partitions_path: str = ""
+    rebuilt: bool = True
+    metrics: dict[str, Any] = field(default_factory=dict)
+    compaction: dict[str, int] = field(default_factory=dict)
 
 
 def ensure_output_dirs() -> None:
@@ -33,6 +84,13 @@ def ensure_output_dirs() -> None:
     CLEANED_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def resolve_workers(workers: int | None, file_count: int) -> int:
+    """解析并行进程数：None/0 表示按 CPU 核数，且不超过文件数。"""
+    if not workers:
+        workers = os.cpu_count() or 1
+    return max(1, min(int(workers), file_count))
+
+
 def _is_header_row(row: dict[str, Any]) -> bool:
     """识别“字段中文名：xxx”这类说明行。"""
     if not row:
@@ -45,7 +103,7 @@ def _is_header_row(row: dict[str, Any]) -> bool:
 
 def load_json_records(file_path: Path) -> list[dict[str, Any]]:
     """读取 JSON 数组并剔除首行字段说明。"""
-    with file_path.open("r", encoding="utf-8") as f:
+    with record_load(file_path), file_path.open("r", encoding="utf-8") as f:
         data = json.load(f)
 
     if not isinstance(data, list):
@@ -57,24 +115,246 @@ def load_json_records(file_path: Path) -> list[dict[str, Any]]:
     return records
 
 
+# 流式读取默认批大小
+DEFAULT_BATCH_SIZE = 50_000
+
+
+def iter_json_records(
+    file_path: Path, chunk_chars: int = STREAM_CHUNK_CHARS
+) -> Iterator[dict[str, Any]]:
+    """流式解析顶层 JSON 数组，逐条产出记录并剔除首行字段说明。
+
+    与 load_json_records 语义一致：顶层不是数组时不产出任何记录，
+    非 dict 元素被忽略，仅第一条 dict 记录参与表头判断。
+    """
+    header_checked = False
+    for value in iter_json_array(file_path, chunk_chars=chunk_chars):
+        if not isinstance(value, dict):
+            continue
+        if not header_checked:
+            header_checked = True
+            if _is_header_row(value):
+                continue
+        yield value
+
+
+def iter_json_record_batches(
+    file_path: Path,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    chunk_chars: int = STREAM_CHUNK_CHARS,
+) -> Iterator[list[dict[str, Any]]]:
+    """按固定批大小流式产出记录，峰值内存只与批大小相关。
+
+    每批的解析耗时计入当前步骤的读取指标（不含调用方处理该批的时间）。
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size 必须为正整数")
+
+    records = iter_json_records(file_path, chunk_chars=chunk_chars)
+    metrics = current_step_metrics()
+    if metrics is not None:
+        metrics.bytes_read += file_path.stat().st_size
+
+    while True:
+        started = time.perf_counter()
+        batch = list(islice(records, batch_size))
+        if metrics is not None:
+            metrics.load_seconds += time.perf_counter() - started
+        if not batch:
+            return
+        yield batch
+
+
 def to_numeric_series(series: pd.Series) -> pd.Series:
     """将字符串数值安全转换为数字。"""
     return pd.to_numeric(series, errors="coerce")
 
 
+def frame_memory_bytes(df: pd.DataFrame) -> int:
+    """DataFrame 实际占用的内存字节数（含字符串对象本身）。"""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def smallest_int_dtype(series: pd.Series) -> str | None:
+    """能无损容纳该列的最小整数类型名。
+
+    含非整数值或全为空时返回 None；含缺失值时返回可空类型（如 "Int16"）。
+    """
+    values = series.dropna()
+    if values.empty or not pd.api.types.is_numeric_dtype(values):
+        return None
+    if pd.api.types.is_float_dtype(values) and not (values == np.floor(values)).all():
+        return None
+
+    low, high = values.min(), values.max()
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            name = np.dtype(dtype).name
+            return name.capitalize() if len(values) < len(series) else name
+    return None
+
+
+def compact_dtypes(
+    df: pd.DataFrame,
+    int_columns: Iterable[str] = (),
+    category_columns: dict[str, list[str] | None] | None = None,
+    drop_columns: Iterable[str] = (),
+) -> pd.DataFrame:
+    """紧凑 dtype：浮点测量值降为 float32，整数标识列取最小整数类型，
+    重复字符串转分类，并丢弃冗余的原始列。
+
+    category_columns 为列名 -> 固定类别（None 表示按数据推断）；多批结果需要
+    拼接时应传入固定类别，保证拼接后仍为分类类型。未转换的列不复制数据。
+    """
+    int_columns = set(int_columns)
+    category_columns = category_columns or {}
+    dropped = set(drop_columns)
+
+    columns: dict[str, pd.Series] = {}
+    for col in df.columns:
+        if col in dropped:
+            continue
+        series = df[col]
+        if col in int_columns:
+            dtype = smallest_int_dtype(series)
+            columns[col] = series.astype(dtype) if dtype else series
+        elif col in category_columns:
+            columns[col] = series.astype(
+                pd.CategoricalDtype(category_columns[col])
+                if category_columns[col] is not None
+                else "category"
+            )
+        elif pd.api.types.is_float_dtype(series) and series.dtype != np.float32:
+            columns[col] = series.astype(np.float32)
+        else:
+            columns[col] = series
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+# 网格监测 recv_time 固定版式，如 "Fri Jan 01 01:00:00 CST 2021"
+RECV_TIME_FORMAT = "%a %b %d %H:%M:%S CST %Y"
+_MONTH_NUMBERS = {
+    name: f"{index:02d}"
+    for index, name in enumerate(
+        [
+            "Jan",
+            "Feb",
+            "Mar",
+            "Apr",
+            "May",
+            "Jun",
+            "Jul",
+            "Aug",
+            "Sep",
+            "Oct",
+            "Nov",
+            "Dec",
+        ],
+        start=1,
+    )
+}
+_RECV_TIME_PATTERN = re.compile(
+    r"^(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun) "
+    rf"({'|'.join(_MONTH_NUMBERS)}) (\d{{2}}) (\d{{2}}:\d{{2}}:\d{{2}}) CST (\d{{4}})$"
+)
+
+
+def parse_recv_time_series(series: pd.Series) -> pd.Series:
+    """批量解析 recv_time，结果与 pd.to_datetime(format=RECV_TIME_FORMAT) 一致。
+
+    小时级数据在站点间大量重复，先对字符串去重只解析唯一值：符合固定版式的
+    按位置重排为 ISO 文本走 pandas 快速解析，其余回退到原格式逐条解析。
+    """
+    codes, uniques = pd.factorize(series)
+    unique_text = pd.Series(uniques, dtype="object")
+
+    parts = unique_text.str.extract(_RECV_TIME_PATTERN)
+    matched = parts[0].notna()
+
+    pieces: list[pd.Series] = []
+    if matched.any():
+        fast = parts[matched]
+        iso_text = fast[3] + "-" + fast[0].map(_MONTH_NUMBERS) + "-" + fast[1]
+        pieces.append(
+            pd.to_datetime(
+                iso_text + " " + fast[2], format="%Y-%m-%d %H:%M:%S", errors="coerce"
+            )
+        )
+    if not matched.all():
+        pieces.append(
+            pd.to_datetime(
+                unique_text[~matched], format=RECV_TIME_FORMAT, errors="coerce"
+            )
+        )
+
+    if not pieces:
+        # 全为缺失值，直接交给原解析器以保持相同的 dtype
+        return pd.to_datetime(series, format=RECV_TIME_FORMAT, errors="coerce")
+
+    parsed = pd.concat(pieces).sort_index() if len(pieces) > 1 else pieces[0]
+    return _broadcast_unique_dates(parsed, codes, series.index)
+
+
+def _broadcast_unique_dates(
+    parsed: pd.Series, codes: np.ndarray, index: pd.Index
+) -> pd.Series:
+    """把唯一值的解析结果按 factorize 编码回填到每一行。"""
+    # 末尾追加 NaT，factorize 对缺失值给出的 -1 编码恰好取到它
+    lookup = np.append(parsed.to_numpy(), np.array(["NaT"], dtype=parsed.dtype))
+    return pd.Series(lookup[codes], index=index)
+
+
+# Excel 序列日期（1900 系统）的基准日与常见取值区间
+EXCEL_EPOCH = datetime(1899, 12, 30)
+EXCEL_SERIAL_RANGE = (20000, 90000)
+
+# 常见中文日期格式：2025年12月1日 / 2025.3.7 / 2024-11-15（按顺序尝试，首个命中即定论）
+CHINESE_DATE_PATTERNS = (
+    re.compile(r"(\d{4})\s*年\s*(\d{1,2})\s*月\s*(\d{1,2})\s*日"),
+    re.compile(r"(\d{4})[./-](\d{1,2})[./-](\d{1,2})"),
+)
+
+
+# 标量解析的记忆化缓存上限（按唯一字符串计）
+DATE_PARSE_CACHE_SIZE = 4096
+_EXCEL_SERIAL_TEXT = r"\s*[+-]?\d+\s*"
+
+
 def parse_excel_serial_date(value: Any) -> datetime | None:
     """解析 Excel 序列日期（1900 系统）。"""
+    return _parse_excel_serial_cached(str(value).strip())
+
+
+@lru_cache(maxsize=DATE_PARSE_CACHE_SIZE)
+def _parse_excel_serial_cached(raw: str) -> datetime | None:
+    """parse_excel_serial_date 的带缓存实现。"""
     try:
-        serial = int(str(value).strip())
+        serial = int(raw)
     except Exception:
         return None
 
     # 仅接受常见的 Excel 日期序列区间
-    if serial < 20000 or serial > 90000:
+    if serial < EXCEL_SERIAL_RANGE[0] or serial > EXCEL_SERIAL_RANGE[1]:
         return None
 
-    base = datetime(1899, 12, 30)
-    return base + timedelta(days=serial)
+    return EXCEL_EPOCH + timedelta(days=serial)
+
+
+def parse_excel_serial_date_series(values: pd.Series) -> pd.Series:
+    """批量版 parse_excel_serial_date：去重后按列解析，非序列日期记为 NaT。"""
+    codes, uniques = pd.factorize(values)
+    text = pd.Series(uniques, dtype=object).map(str).astype("string")
+
+    is_integer = text.str.fullmatch(_EXCEL_SERIAL_TEXT).fillna(False).astype(bool)
+    serial = pd.to_numeric(text.where(is_integer).str.strip(), errors="coerce")
+    in_range = serial.between(*EXCEL_SERIAL_RANGE)
+
+    parsed = pd.Series(pd.NaT, index=text.index, dtype="datetime64[us]")
+    parsed[in_range] = pd.Timestamp(EXCEL_EPOCH) + pd.to_timedelta(
+        serial[in_range], unit="D"
+    )
+    return _broadcast_unique_dates(parsed, codes, values.index)
 
 
 def parse_chinese_date_text(text: Any) -> datetime | None:
@@ -85,15 +365,14 @@ def parse_chinese_date_text(text: Any) -> datetime | None:
     raw = str(text).strip()
     if not raw:
         return None
+    return _parse_chinese_date_cached(raw)
 
-    # 常见格式：2025年12月1日 / 2025.3.7 / 2024-11-15
-    patterns = [
-        r"(\d{4})\s*年\s*(\d{1,2})\s*月\s*(\d{1,2})\s*日",
-        r"(\d{4})[./-](\d{1,2})[./-](\d{1,2})",
-    ]
 
-    for pattern in patterns:
-        match = re.search(pattern, raw)
+@lru_cache(maxsize=DATE_PARSE_CACHE_SIZE)
+def _parse_chinese_date_cached(raw: str) -> datetime | None:
+    """parse_chinese_date_text 的带缓存实现（入参已去除首尾空白）。"""
+    for pattern in CHINESE_DATE_PATTERNS:
+        match = pattern.search(raw)
         if not match:
             continue
         year, month, day = [int(match.group(i)) for i in range(1, 4)]
@@ -109,18 +388,403 @@ def parse_chinese_date_text(text: Any) -> datetime | None:
     return parsed.to_pydatetime()
 
 
-def save_cleaned_dataset(df: pd.DataFrame, dataset_name: str) -> PreprocessResult:
-    """保存清洗结果到 JSON（清洗后数据目录）。"""
+def parse_chinese_date_series(values: pd.Series) -> pd.Series:
+    """批量版 parse_chinese_date_text：去重后只解析唯一值，再按编码回填。
+
+    各模式依次只处理前面模式都未命中的值（首个命中的模式即定论，非法日期
+    记为 NaT），剩余值交给 pandas 逐值推断格式。
+    """
+    codes, uniques = pd.factorize(values)
+    text = pd.Series(uniques, dtype=object).map(str).astype("string").str.strip()
+
+    parsed = pd.Series(pd.NaT, index=text.index, dtype="datetime64[us]")
+    pending = (text.notna() & (text != "")).astype(bool)
+    for pattern in CHINESE_DATE_PATTERNS:
+        if not pending.any():
+            break
+        parts = text[pending].str.extract(pattern)
+        hit_index = parts.index[parts[0].notna()]
+        if len(hit_index):
+            parsed[hit_index] = pd.to_datetime(
+                {
+                    "year": parts.loc[hit_index, 0].astype(int),
+                    "month": parts.loc[hit_index, 1].astype(int),
+                    "day": parts.loc[hit_index, 2].astype(int),
+                },
+                errors="coerce",
+            )
+        pending[hit_index] = False
+
+    if pending.any():
+        parsed[pending] = pd.to_datetime(
+            text[pending].astype(object), format="mixed", errors="coerce"
+        )
+    return _broadcast_unique_dates(parsed, codes, values.index)
+
+
+@dataclass(frozen=True)
+class RangeField:
+    """文本区间字段：关键词及输出的下限/上限列名。"""
+
+    keyword: str
+    min_column: str
+    max_column: str
+
+
+_NUMBER = r"\d+(?:\.\d+)?"
+
+
+class RangeExtractor:
+    """预编译的多字段数值区间抽取器（如“平均气温17.7～18.1℃”）。
+
+    每个字段先找“关键词…下限～上限”，全文都没有区间时再找“关键词…单值”
+    （单值时上下限相同），两种匹配均不跨越句号/分号。全部字段合并为一条
+    锚定在文本开头的正则，各字段各占一个可选前瞻，对一列文本（去重后）只需
+    一次 str.extract，新增字段不会增加扫描轮数。
+    """
+
+    def __init__(self, fields: Iterable[RangeField]):
+        self.fields = tuple(fields)
+        lookaheads = []
+        for index, field in enumerate(self.fields):
+            keyword = re.escape(field.keyword)
+            range_part = (
+                rf"{keyword}[^。；;]*?(?P<lo{index}>{_NUMBER})"
+                rf"\s*[～~—\-]\s*(?P<hi{index}>{_NUMBER})"
+            )
+            single_part = rf"{keyword}[^。；;]*?(?P<one{index}>{_NUMBER})"
+            lookaheads.append(rf"(?:(?=.*?{range_part})|(?=.*?{single_part}))?")
+        self.pattern = re.compile("^" + "".join(lookaheads), re.DOTALL)
+
+    def extract(self, text: pd.Series) -> pd.DataFrame:
+        """对一列文本抽取全部字段，返回每个字段的下限/上限浮点列。"""
+        columns = [col for f in self.fields for col in (f.min_column, f.max_column)]
+        if text.empty or not self.fields:
+            return pd.DataFrame(index=text.index, columns=columns, dtype=float)
+
+        # 相同文本只匹配一次（缺失值编码为 -1，对应末尾追加的空行）
+        codes, uniques = pd.factorize(text)
+        parts = pd.Series(uniques, dtype=object).str.extract(self.pattern)
+        parts.loc[len(parts)] = None
+
+        result = pd.DataFrame(index=parts.index)
+        for index, field in enumerate(self.fields):
+            low = pd.to_numeric(parts[f"lo{index}"], errors="coerce")
+            high = pd.to_numeric(parts[f"hi{index}"], errors="coerce")
+            single = pd.to_numeric(parts[f"one{index}"], errors="coerce")
+            result[field.min_column] = low.fillna(single)
+            result[field.max_column] = high.fillna(single)
+
+        result = result[columns].take(codes)
+        result.index = text.index
+        return result
+
+
+def normalize_cleaned_formats(formats: Iterable[str] | None) -> tuple[str, ...]:
+    """校验并规范化落盘格式列表，保持 CLEANED_FORMATS 中的顺序。"""
+    if formats is None:
+        return DEFAULT_CLEANED_FORMATS
+
+    requested = {str(item).strip().lower() for item in formats if str(item).strip()}
+    unknown = requested - set(CLEANED_FORMATS)
+    if unknown:
+        raise ValueError(f"不支持的清洗结果格式: {sorted(unknown)}")
+    if not requested:
+        raise ValueError("至少需要指定一种清洗结果格式")
+    if "parquet" in requested and importlib.util.find_spec("pyarrow") is None:
+        raise RuntimeError("输出 parquet 需要安装 pyarrow（pip install pyarrow）")
+    return tuple(fmt for fmt in CLEANED_FORMATS if fmt in requested)
+
+
+def _write_cleaned_files(
+    df: pd.DataFrame, paths: dict[str, Path], formats: tuple[str, ...]
+) -> None:
+    """按选定格式写出清洗结果文件。"""
+    if "json" in formats:
+        df.to_json(
+            paths["json"], orient="records", force_ascii=False, date_format="iso"
+        )
+
+    if "parquet" in formats:
+        # Parquet 保留可空整数、时间、分类等 dtype 及列 schema，读取时无需再转换
+        df.to_parquet(paths["parquet"], engine="pyarrow", index=False)
+
+
+def save_cleaned_dataset(
+    df: pd.DataFrame,
+    dataset_name: str,
+    formats: Iterable[str] | None = None,
+) -> PreprocessResult:
+    """保存清洗结果到清洗后数据目录（JSON 导出 / Parquet 列式）。
+
+    未选中的格式若存在旧文件会被删除，避免读取端误用过期数据。
+    """
     ensure_output_dirs()
+    selected = normalize_cleaned_formats(formats)
+
+    paths = {fmt: CLEANED_DIR / f"{dataset_name}.{fmt}" for fmt in CLEANED_FORMATS}
 
-    # 仅输出 JSON，避免不必要的格式转换
-    json_path = CLEANED_DIR / f"{dataset_name}.json"
+    with record_serialize(dataset_name, [paths[fmt] for fmt in selected]):
+        _write_cleaned_files(df, paths, selected)
 
-    df.to_json(json_path, orient="records", force_ascii=False, date_format="iso")
+    for fmt, path in paths.items():
+        if fmt not in selected and path.exists():
+            path.unlink()
 
     return PreprocessResult(
         dataset=dataset_name,
         rows_in=0,
         rows_out=int(len(df)),
-        json_path=str(json_path),
+        json_path=str(paths["json"]) if "json" in selected else "",
+        parquet_path=str(paths["parquet"]) if "parquet" in selected else "",
     )
+
+
+# ---------------------------------------------------------------------------
+# 站点时间索引：按 (站点, 时间) 排序的列式副本 + 偏移表 + 粗粒度时间块
+# ---------------------------------------------------------------------------
+
+# 时间块行数：查询先在内存中的块起始时间上二分，再只在首尾块内二分
+STATION_INDEX_BLOCK_ROWS = 4096
+
+
+def save_station_index(
+    df: pd.DataFrame,
+    dataset_name: str,
+    value_columns: Iterable[str],
+    key_column: str = "sp_id",
+    time_column: str = "timestamp",
+    block_rows: int = STATION_INDEX_BLOCK_ROWS,
+    directory: Path | None = None,
+) -> str:
+    """写出按 (key_column, time_column) 排序的站点时间索引，返回索引目录路径。
+
+    directory 默认为 <dataset_name>_index/（增量模式下为各来源文件分区旁的
+    <分区名>_index/），目录下每列一个 .npy（可内存映射，查询只读取命中的行），
+    index.json 记录各站点的起止行与每 block_rows 行的起始时间。row.npy 为排序后
+    每行在原表中的位置。键或时间缺失的行不进入索引；df 为空时删除旧索引并返回空串。
+    """
+    directory = directory or station_index_dir(dataset_name)
+    if df.empty or key_column not in df.columns or time_column not in df.columns:
+        shutil.rmtree(directory, ignore_errors=True)
+        return ""
+
+    keys = pd.to_numeric(df[key_column], errors="coerce")
+    times = pd.to_datetime(df[time_column], errors="coerce")
+    valid = (keys.notna() & times.notna()).to_numpy()
+    keys = keys.to_numpy(dtype="float64")[valid].astype(np.int64)
+    times = times.to_numpy()[valid].astype("datetime64[ns]").astype(np.int64)
+    positions = np.flatnonzero(valid)
+    order = np.lexsort((times, keys))
+
+    columns: dict[str, np.ndarray] = {
+        key_column: keys[order],
+        time_column: times[order],
+        "row": positions[order],
+    }
+    for col in value_columns:
+        values = pd.to_numeric(df[col], errors="coerce")
+        dtype = np.float32 if values.dtype == np.float32 else np.float64
+        columns[str(col)] = values.to_numpy(dtype=dtype, na_value=np.nan)[valid][order]
+
+    sorted_keys, sorted_times = columns[key_column], columns[time_column]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    ends = np.r_[starts[1:], len(sorted_keys)]
+    stations = {
+        str(int(sorted_keys[lo])): {
+            "start": int(lo),
+            "end": int(hi),
+            "blocks": sorted_times[lo:hi:block_rows].tolist(),
+        }
+        for lo, hi in zip(starts, ends)
+    }
+    index = {
+        "dataset": dataset_name,
+        "rows": int(len(sorted_keys)),
+        "key_column": key_column,
+        "time_column": time_column,
+        "block_rows": block_rows,
+        "columns": list(columns),
+        "stations": stations,
+    }
+
+    # 先写临时目录再替换，读取端不会看到写了一半的索引
+    staging = directory.with_name(directory.name + ".tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    paths = [staging / STATION_INDEX_FILE]
+    with record_serialize(dataset_name, paths):
+        for name, values in columns.items():
+            path = staging / f"{name}.npy"
+            np.save(path, values)
+            paths.append(path)
+        with paths[0].open("w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+    shutil.rmtree(directory, ignore_errors=True)
+    staging.rename(directory)
+    return str(directory)
+
+
+# ---------------------------------------------------------------------------
+# 按月时间分区：读取端按时间范围与站点集合跳过不相交的分区
+# ---------------------------------------------------------------------------
+
+# 时间缺失的行单独成区，带时间范围条件的读取总会跳过它
+UNDATED_PARTITION = "undated"
+
+
+def save_time_partitions(
+    df: pd.DataFrame,
+    dataset_name: str,
+    formats: Iterable[str] | None = None,
+    time_column: str = "timestamp",
+    key_column: str = "sp_id",
+) -> str:
+    """按 time_column 的年月把数据集拆分为分区写出，返回分区目录路径。
+
+    每个分区为 <dataset_name>_by_month/<YYYY-MM>.<fmt>（格式与整表相同），行保持
+    原有顺序；partitions.json 记录各分区的起止时间、站点集合与行数。df 为空或
+    没有时间列时删除旧分区并返回空串。
+    """
+    directory = time_partitions_dir(dataset_name)
+    if df.empty or time_column not in df.columns:
+        shutil.rmtree(directory, ignore_errors=True)
+        return ""
+
+    selected = normalize_cleaned_formats(formats)
+    times = pd.to_datetime(df[time_column], errors="coerce")
+    labels = times.dt.strftime("%Y-%m").fillna(UNDATED_PARTITION).to_numpy()
+    keys = (
+        pd.to_numeric(df[key_column], errors="coerce")
+        if key_column in df.columns
+        else None
+    )
+
+    # 先写临时目录再替换，读取端不会看到写了一半的分区
+    staging = directory.with_name(directory.name + ".tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    partitions = []
+    groups = pd.Series(labels).groupby(labels).indices
+    for label, positions in sorted(groups.items()):
+        dated = label != UNDATED_PARTITION
+        part_times = times.take(positions)
+        stations = (
+            sorted(int(key) for key in keys.take(positions).dropna().unique())
+            if keys is not None
+            else []
+        )
+        paths = {fmt: staging / f"{label}.{fmt}" for fmt in CLEANED_FORMATS}
+        with record_serialize(dataset_name, [paths[fmt] for fmt in selected]):
+            _write_cleaned_files(df.take(positions), paths, selected)
+        partitions.append(
+            {
+                "name": label,
+                "rows": int(len(positions)),
+                "start": part_times.min().isoformat() if dated else None,
+                "end": part_times.max().isoformat() if dated else None,
+                "stations": stations,
+            }
+        )
+
+    meta = {
+        "dataset": dataset_name,
+        "time_column": time_column,
+        "key_column": key_column if keys is not None else None,
+        "formats": list(selected),
+        "rows": int(len(df)),
+        "partitions": partitions,
+    }
+    with (staging / TIME_PARTITIONS_FILE).open("w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    shutil.rmtree(directory, ignore_errors=True)
+    staging.rename(directory)
+    return str(directory)
+
+
+# ---------------------------------------------------------------------------
+# 按来源文件分区的清洗结果：增量模式只清洗并写出新增或内容变化的原始文件
+# ---------------------------------------------------------------------------
+
+
+def _partition_bounds(
+    df: pd.DataFrame, time_column: str = "timestamp", key_column: str = "sp_id"
+) -> dict[str, Any]:
+    """分区的行数、起止时间（没有有效时间时为 None）与站点集合，供读取端剪枝。"""
+    start = end = None
+    if time_column in df.columns:
+        times = pd.to_datetime(df[time_column], errors="coerce").dropna()
+        if not times.empty:
+            start, end = times.min().isoformat(), times.max().isoformat()
+    stations = []
+    if key_column in df.columns:
+        keys = pd.to_numeric(df[key_column], errors="coerce").dropna().unique()
+        stations = sorted(int(key) for key in keys)
+    return {"rows": int(len(df)), "start": start, "end": end, "stations": stations}
+
+
+def save_partition(
+    df: pd.DataFrame,
+    dataset_name: str,
+    source_file: str,
+    time_column: str = "timestamp",
+    key_column: str = "sp_id",
+) -> dict[str, Any]:
+    """把单个来源文件的清洗结果写成 Parquet 分区，返回分区记录。
+
+    记录含分区名、文件名、行数、起止时间与站点集合（同按月分区的元数据），读取端
+    据此剪枝。Parquet 完整保留 dtype（含分类、可空整数），读回后与重新清洗的结果一致。
+    """
+    if importlib.util.find_spec("pyarrow") is None:
+        raise RuntimeError("增量模式的分区为 Parquet 格式，需要安装 pyarrow（pip install pyarrow）")
+    directory = partitions_dir(dataset_name)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = Path(source_file).stem
+    path = directory / f"{name}.parquet"
+    staging = path.with_name(path.name + ".tmp")
+    with record_serialize(dataset_name, [path]):
+        df.to_parquet(staging, engine="pyarrow", index=False)
+        staging.replace(path)
+    return {
+        "name": name,
+        "file": path.name,
+        **_partition_bounds(df, time_column, key_column),
+    }
+
+
+def save_partition_manifest(dataset_name: str, manifest: dict[str, Any]) -> Path:
+    """写出分区清单（附清单版本），并删除清单中已不存在的分区文件与分区索引。"""
+    directory = partitions_dir(dataset_name)
+    directory.mkdir(parents=True, exist_ok=True)
+    keep = {PARTITIONS_FILE}
+    for item in manifest["files"].values():
+        keep.update(name for name in (item["file"], item.get("index")) if name)
+    for path in directory.iterdir():
+        if path.name in keep:
+            continue
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+    path = directory / PARTITIONS_FILE
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(
+            {"version": PARTITIONS_VERSION, **manifest}, f, ensure_ascii=False, indent=2
+        )
+    return path
+
+
+def remove_cleaned_dataset(dataset_name: str) -> None:
+    """删除数据集的整表文件、整表站点索引与按月分区。
+
+    增量模式以来源文件分区为输出，旧的整表产物若保留会被读取端误用。
+    """
+    for fmt in CLEANED_FORMATS:
+        (CLEANED_DIR / f"{dataset_name}.{fmt}").unlink(missing_ok=True)
+    shutil.rmtree(station_index_dir(dataset_name), ignore_errors=True)
+    shutil.rmtree(time_partitions_dir(dataset_name), ignore_errors=True)
+
+
+def code_version(module_files: Iterable[str]) -> str:
+    """以脚本源码内容哈希作为代码版本（模块本身 + common.py + shared 包）。"""
+    return _code_version(SCRIPTS_DIR, [*module_files, "common.py"])
@@ -2,16 +2,15 @@
 
 from __future__ import annotations
 
-from datetime import datetime
-
 import pandas as pd
 
 from common import (
     RAW_DATA_DIR,
     PreprocessResult,
     load_json_records,
-    parse_chinese_date_text,
-    parse_excel_serial_date,
+    parse_chinese_date_series,
+    parse_excel_serial_date_series,
+    timed_substep,
     to_numeric_series,
 )
 
@@ -20,31 +19,61 @@ RAW_FILE = "空气优良天数(1).json"
 DATASET_NAME = "air_quality_good_days"
 
 
-def _parse_period(value: object) -> tuple[str, datetime | None, int | None]:
-    """解析 yf 字段（可能是月份、Excel 日期序列或中文日期）。"""
-    if value is None:
-        return "unknown", None, None
-
-    raw = str(value).strip()
-    if not raw:
-        return "unknown", None, None
-
-    # 1~12 视为月份
-    if raw.isdigit():
-        number = int(raw)
-        if 1 <= number <= 12:
-            return "month", None, number
+def _classify_periods(values: pd.Series) -> pd.DataFrame:
+    """按列解析 yf 字段（可能是月份、Excel 日期序列或中文日期）。
 
-        excel_date = parse_excel_serial_date(number)
-        if excel_date:
-            return "date", excel_date, excel_date.month
+    返回 period_type / period_date / month 三列。各站点的 yf 取值高度重复，
+    先去重只对唯一值分类，再按编码回填到每一行；缺失值记为 unknown。
+    """
+    codes, uniques = pd.factorize(values)
+    unique_parsed = _classify_unique_periods(pd.Series(uniques, dtype=object))
 
-    # 中文日期文本
-    parsed_date = parse_chinese_date_text(raw)
-    if parsed_date:
-        return "date", parsed_date, parsed_date.month
-
-    return "unknown", None, None
+    # 末尾追加一行 unknown，factorize 对缺失值给出的 -1 编码恰好取到它
+    missing = pd.DataFrame(
+        {
+            "period_type": ["unknown"],
+            "period_date": pd.Series([pd.NaT], dtype="datetime64[us]"),
+            "month": pd.Series([pd.NA], dtype="Int64"),
+        }
+    )
+    lookup = pd.concat([unique_parsed, missing], ignore_index=True)
+    parsed = lookup.take(codes)
+    parsed.index = values.index
+    return parsed
+
+
+def _classify_unique_periods(values: pd.Series) -> pd.DataFrame:
+    """对去重后的 yf 取值分类，判定顺序与逐值解析一致。
+
+    1~12 视为月份；区间内的纯数字视为 Excel 序列日期；其余依次尝试
+    中文日期模式（首个命中的模式即定论）与 pandas 通用解析。
+    """
+    # 与逐值解析一致按 str() 取文本（去重后的取值不含缺失值）
+    text = values.map(str).astype("string").str.strip()
+    present = (text.notna() & (text != "")).astype(bool)
+
+    # 纯数字：月份 / Excel 序列日期
+    is_digit = present & text.str.isdigit().fillna(False).astype(bool)
+    number = pd.to_numeric(text.where(is_digit), errors="coerce")
+    is_month = is_digit & number.between(1, 12)
+    period_date = parse_excel_serial_date_series(text.where(is_digit & ~is_month))
+
+    # 其余取值按中文日期文本解析
+    is_text = present & ~is_month & period_date.isna()
+    period_date[is_text] = parse_chinese_date_series(text[is_text])
+
+    is_date = period_date.notna()
+    month = pd.Series(pd.NA, index=values.index, dtype="Int64")
+    month[is_month] = number[is_month].astype("Int64")
+    month[is_date] = period_date[is_date].dt.month.astype("Int64")
+
+    period_type = pd.Series("unknown", index=values.index, dtype=object)
+    period_type[is_month] = "month"
+    period_type[is_date] = "date"
+
+    return pd.DataFrame(
+        {"period_type": period_type, "period_date": period_date, "month": month}
+    )
 
 
 def preprocess_air_quality_days() -> tuple[pd.DataFrame, PreprocessResult]:
@@ -61,10 +90,11 @@ def preprocess_air_quality_days() -> tuple[pd.DataFrame, PreprocessResult]:
     df["yf_raw"] = df.get("yf", "")
 
     # 分解并规范周期字段
-    parsed = df["yf_raw"].apply(_parse_period)
-    df["period_type"] = parsed.map(lambda item: item[0])
-    df["period_date"] = parsed.map(lambda item: item[1])
-    df["month"] = parsed.map(lambda item: item[2]).astype("Int64")
+    with timed_substep("classify_periods"):
+        parsed = _classify_periods(df["yf_raw"])
+    df["period_type"] = parsed["period_type"]
+    df["period_date"] = parsed["period_date"]
+    df["month"] = parsed["month"]
     df["year"] = df["period_date"].dt.year.astype("Int64")
 
     # 核心统计字段转数值；缺失超标天数按 0 处理
@@ -1,27 +1,59 @@
-"""北碚区主要年份气象基本情况预处理。"""
+"""区县主要年份气象基本情况预处理（北碚区及其他区县，可多文件合并）。"""
 
 from __future__ import annotations
 
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 
 import pandas as pd
 
-from common import RAW_DATA_DIR, PreprocessResult, load_json_records, to_numeric_series
+from common import (
+    RAW_DATA_DIR,
+    PreprocessResult,
+    call_with_worker_metrics,
+    load_json_records,
+    merge_worker_metrics,
+    resolve_workers,
+    to_numeric_series,
+)
 
 
-RAW_FILE = "北碚区主要年份气象基本情况信息(1).json"
+# 每个区县一个文件，如 “北碚区主要年份气象基本情况信息(1).json”
+FILE_GLOB = "*主要年份气象基本情况信息*.json"
+FILE_NAME_MARKER = "主要年份气象基本情况信息"
+# 数据集名沿用北碚单区时的命名，下游图表与导库无需改动
 DATASET_NAME = "beibei_yearly_weather"
 
+# 原始记录中可能携带区县名的字段，优先于文件名
+DISTRICT_COLUMNS = ("district", "qxmc", "qx")
 
-def preprocess_beibei_yearly() -> tuple[pd.DataFrame, PreprocessResult]:
-    """清洗北碚年度气象数据。"""
-    file_path = RAW_DATA_DIR / RAW_FILE
+
+def district_from_filename(file_path: Path) -> str:
+    """由文件名推断区县名：取 “主要年份…” 之前的部分，缺失时用文件名。"""
+    district = file_path.stem.split(FILE_NAME_MARKER, 1)[0].strip()
+    return district or file_path.stem
+
+
+def _district_series(df: pd.DataFrame, file_path: Path) -> pd.Series | str:
+    """区县标识：记录中有区县字段时逐行取值，空值回退到文件名推断的区县。"""
+    fallback = district_from_filename(file_path)
+    for column in DISTRICT_COLUMNS:
+        if column in df.columns:
+            values = df[column].astype("string").str.strip().replace("", pd.NA)
+            if values.notna().any():
+                return values.fillna(fallback).astype(object)
+    return fallback
+
+
+def _clean_district_file(file_path: Path) -> tuple[pd.DataFrame, int]:
+    """清洗单个区县的年度气象文件，返回清洗结果与输入行数。"""
     records = load_json_records(file_path)
     rows_in = len(records)
 
     df = pd.DataFrame(records)
     if df.empty:
-        return df, PreprocessResult(DATASET_NAME, 0, 0, "")
+        return df, rows_in
 
     # 关键字段统一转为数值，便于后续分析绘图
     numeric_columns = [
@@ -44,14 +76,67 @@ def preprocess_beibei_yearly() -> tuple[pd.DataFrame, PreprocessResult]:
         if column in df.columns:
             df[column] = df[column].astype("Int64")
 
-    # 清理缺少年份的记录，并按年份去重排序
+    # 区县标识：支持多区合并
+    df["district"] = _district_series(df, file_path)
+
+    # 清理缺少年份的记录，并按区县、年份去重排序
     if "nf" in df.columns:
         df = df[df["nf"].notna()].copy()
-        df = df.sort_values(by=["nf", "xh"], kind="stable")
-        df = df.drop_duplicates(subset=["nf"], keep="last")
+        sort_cols = [col for col in ["nf", "xh"] if col in df.columns]
+        df = df.sort_values(by=sort_cols, kind="stable")
+        df = df.drop_duplicates(subset=["district", "nf"], keep="last")
+
+    return df, rows_in
+
 
-    # 统一增加区县标识，后续支持多区合并
-    df["district"] = "北碚区"
+def _combine_districts(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """合并各区县结果：区县按首次出现顺序排列，同一区县同一年份以后出现的文件为准。"""
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+
+    df = pd.concat(frames, ignore_index=True)
+    if "nf" not in df.columns:
+        return df
+    order = {name: rank for rank, name in enumerate(pd.unique(df["district"]))}
+    df = df.sort_values(
+        by=["district", "nf"],
+        key=lambda col: col.map(order) if col.name == "district" else col,
+        kind="stable",
+    )
+    return df.drop_duplicates(subset=["district", "nf"], keep="last")
+
+
+def preprocess_beibei_yearly(
+    workers: int | None = 1,
+) -> tuple[pd.DataFrame, PreprocessResult]:
+    """清洗全部区县年度气象数据并合并为一张表。
+
+    workers 为并行进程数（None/0 表示按 CPU 核数）；结果按文件名顺序合并，
+    与串行一致。
+    """
+    raw_files = sorted(RAW_DATA_DIR.glob(FILE_GLOB))
+    if not raw_files:
+        return pd.DataFrame(), PreprocessResult(DATASET_NAME, 0, 0, "")
+
+    worker_count = resolve_workers(workers, len(raw_files))
+    if worker_count <= 1:
+        cleaned = [_clean_district_file(file_path) for file_path in raw_files]
+    else:
+        # 读取发生在子进程中，其读取指标随结果交回后并入当前步骤
+        task = partial(call_with_worker_metrics, _clean_district_file)
+        with ProcessPoolExecutor(max_workers=worker_count) as executor:
+            outputs = list(executor.map(task, raw_files))
+        for _, metrics in outputs:
+            merge_worker_metrics(metrics)
+        cleaned = [result for result, _ in outputs]
+
+    rows_in = sum(rows for _, rows in cleaned)
+    df = _combine_districts([frame for frame, _ in cleaned])
+    if df.empty:
+        return df, PreprocessResult(DATASET_NAME, rows_in, 0, "")
 
     # 重排列顺序，优先放图表常用字段
     preferred_columns = [
@@ -2,41 +2,28 @@
 
 from __future__ import annotations
 
-import re
-
 import pandas as pd
 
 from common import (
     RAW_DATA_DIR,
     PreprocessResult,
+    RangeExtractor,
+    RangeField,
     load_json_records,
-    parse_chinese_date_text,
+    parse_chinese_date_series,
+    timed_substep,
 )
 
 
 RAW_FILE = "延伸期预报气象服务(1).json"
 DATASET_NAME = "extended_forecast"
 
-
-def _extract_range(text: str, keyword: str) -> tuple[float | None, float | None]:
-    """从描述文本中抽取数值区间（如 24.7～25）。"""
-    if not text:
-        return None, None
-
-    # 先匹配区间
-    range_pattern = rf"{keyword}[^。；;]*?(\d+(?:\.\d+)?)\s*[～~—\-]\s*(\d+(?:\.\d+)?)"
-    match = re.search(range_pattern, text)
-    if match:
-        return float(match.group(1)), float(match.group(2))
-
-    # 再匹配单值
-    single_pattern = rf"{keyword}[^。；;]*?(\d+(?:\.\d+)?)"
-    single_match = re.search(single_pattern, text)
-    if single_match:
-        value = float(single_match.group(1))
-        return value, value
-
-    return None, None
+# 天气趋势文本中需抽取的数值区间字段；新增字段只需在此登记
+TREND_RANGE_FIELDS = (
+    RangeField("平均气温", "temp_min", "temp_max"),
+    RangeField("降水量", "rain_min_mm", "rain_max_mm"),
+)
+TREND_EXTRACTOR = RangeExtractor(TREND_RANGE_FIELDS)
 
 
 def preprocess_extended_forecast() -> tuple[pd.DataFrame, PreprocessResult]:
@@ -62,16 +49,15 @@ def preprocess_extended_forecast() -> tuple[pd.DataFrame, PreprocessResult]:
             )
 
     # 发布时间抽取（优先第一日期）
-    df["publish_date"] = df.get("fbsj", "").apply(parse_chinese_date_text)
-
-    # 从天气趋势中抽取温度与降水区间
-    temp_range = df.get("tqqs", "").apply(lambda x: _extract_range(str(x), "平均气温"))
-    rain_range = df.get("tqqs", "").apply(lambda x: _extract_range(str(x), "降水量"))
-
-    df["temp_min"] = temp_range.map(lambda item: item[0])
-    df["temp_max"] = temp_range.map(lambda item: item[1])
-    df["rain_min_mm"] = rain_range.map(lambda item: item[0])
-    df["rain_max_mm"] = rain_range.map(lambda item: item[1])
+    publish_text = df["fbsj"] if "fbsj" in df.columns else pd.Series("", index=df.index)
+    df["publish_date"] = parse_chinese_date_series(publish_text)
+
+    # 从天气趋势中一次性抽取温度与降水区间
+    trend_text = df["tqqs"] if "tqqs" in df.columns else pd.Series("", index=df.index)
+    with timed_substep("extract_trend_ranges"):
+        ranges = TREND_EXTRACTOR.extract(trend_text)
+    for column in ranges.columns:
+        df[column] = ranges[column]
 
     # 去掉完全空白记录
     df = df[
@@ -2,21 +2,55 @@
 
 from __future__ import annotations
 
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
+import shutil
+from typing import Any, Iterator
 
 import pandas as pd
 
-from common import RAW_DATA_DIR, PreprocessResult, load_json_records, to_numeric_series
+from common import (
+    RAW_DATA_DIR,
+    STATION_INDEX_SUFFIX,
+    PreprocessResult,
+    call_with_worker_metrics,
+    code_version,
+    compact_dtypes,
+    file_sha256,
+    frame_memory_bytes,
+    iter_json_record_batches,
+    load_partition_manifest,
+    merge_worker_metrics,
+    parse_recv_time_series,
+    partitions_dir,
+    remove_cleaned_dataset,
+    resolve_workers,
+    save_partition,
+    save_partition_manifest,
+    save_station_index,
+    timed_substep,
+    to_numeric_series,
+)
 
 
 FILE_GLOB = "大气网格化监测历史数据信息(*).json"
 DATASET_WIDE = "grid_history_wide"
 DATASET_LONG = "grid_history_long"
 
+# 单批记录数：决定清洗单个文件时原始记录的峰值内存
+GRID_BATCH_SIZE = 50_000
 
-def _clean_single_grid_file(file_path: Path) -> pd.DataFrame:
-    """清洗单个网格历史文件。"""
-    records = load_json_records(file_path)
+# 长表标识列（原始 recv_time 已解析为 timestamp，不再冗余保存）
+LONG_ID_COLUMNS = ["source_file", "timestamp", "sp_id", "id"]
+
+# 紧凑模式：整数标识列取最小整数类型，原始时间字符串已由 timestamp 取代
+COMPACT_INT_COLUMNS = ("sp_id", "id")
+COMPACT_DROP_COLUMNS = ("recv_time",)
+
+
+def _clean_grid_batch(records: list[dict], source_file: str) -> pd.DataFrame:
+    """清洗一批网格历史记录。"""
     df = pd.DataFrame(records)
     if df.empty:
         return df
@@ -26,11 +60,7 @@ def _clean_single_grid_file(file_path: Path) -> pd.DataFrame:
 
     # 时间字段统一解析
     if "recv_time" in df.columns:
-        df["timestamp"] = pd.to_datetime(
-            df["recv_time"],
-            format="%a %b %d %H:%M:%S CST %Y",
-            errors="coerce",
-        )
+        df["timestamp"] = parse_recv_time_series(df["recv_time"])
     else:
         df["timestamp"] = pd.NaT
 
@@ -41,63 +71,180 @@ def _clean_single_grid_file(file_path: Path) -> pd.DataFrame:
         df[col] = to_numeric_series(df[col])
 
     # 增加来源文件标识，便于追踪
-    df["source_file"] = file_path.name
+    df["source_file"] = source_file
 
-    # 丢弃时间和站点都缺失的明显脏行
+    # 丢弃时间和站点都缺失的明显脏行（布尔索引已生成新对象，无需再复制）
     if "sp_id" in df.columns:
-        df = df[df["timestamp"].notna() | df["sp_id"].notna()].copy()
+        df = df[df["timestamp"].notna() | df["sp_id"].notna()]
+
+    return df
+
+
+def _compact_grid_batch(df: pd.DataFrame, source_files: list[str]) -> pd.DataFrame:
+    """紧凑模式下的批次 dtype 收缩；source_file 使用全部文件名作为固定类别。"""
+    return compact_dtypes(
+        df,
+        int_columns=COMPACT_INT_COLUMNS,
+        category_columns={"source_file": source_files},
+        drop_columns=COMPACT_DROP_COLUMNS,
+    )
+
+
+def _clean_single_grid_file(
+    file_path: Path,
+    batch_size: int = GRID_BATCH_SIZE,
+    compact: bool = False,
+    source_files: list[str] | None = None,
+) -> tuple[pd.DataFrame, int, int]:
+    """清洗单个网格历史文件（文件只读取一遍）。
+
+    返回清洗结果、输入行数，以及紧凑模式下各批收缩前的内存字节数（否则为 0）。
+    紧凑模式逐批收缩 dtype，峰值内存不会出现完整的宽 dtype 副本。
+    """
+    frames: list[pd.DataFrame] = []
+    rows_in = 0
+    bytes_before = 0
+    for batch in iter_json_record_batches(file_path, batch_size=batch_size):
+        rows_in += len(batch)
+        cleaned = _clean_grid_batch(batch, file_path.name)
+        if cleaned.empty:
+            continue
+        if compact:
+            bytes_before += frame_memory_bytes(cleaned)
+            cleaned = _compact_grid_batch(cleaned, source_files or [file_path.name])
+        frames.append(cleaned)
+
+    if not frames:
+        return pd.DataFrame(), rows_in, bytes_before
+
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
 
     # 排序，后续图表按时间展示更稳定
     sort_cols = [col for col in ["sp_id", "timestamp", "id"] if col in df.columns]
     if sort_cols:
         df = df.sort_values(by=sort_cols, kind="stable")
 
-    return df.reset_index(drop=True)
+    return df.reset_index(drop=True), rows_in, bytes_before
 
 
-def _to_long_format(df: pd.DataFrame) -> pd.DataFrame:
-    """将宽表转换为长表，便于图表组件复用。"""
-    if df.empty:
-        return df
+def _clean_grid_files(
+    raw_files: list[Path],
+    workers: int | None = 1,
+    compact: bool = False,
+    source_files: list[str] | None = None,
+) -> list[tuple[pd.DataFrame, int, int]]:
+    """逐文件清洗；多进程时结果仍按文件顺序返回，保证与串行输出一致。
+
+    source_files 为紧凑模式 source_file 的类别（默认即 raw_files 的文件名）。
+    """
+    if not raw_files:
+        return []
+    clean_file = partial(
+        _clean_single_grid_file,
+        compact=compact,
+        source_files=source_files or [path.name for path in raw_files],
+    )
+    worker_count = resolve_workers(workers, len(raw_files))
+    if worker_count <= 1:
+        return [clean_file(file_path) for file_path in raw_files]
+
+    # 读取发生在子进程中，其读取指标随结果交回后并入当前步骤
+    with ProcessPoolExecutor(max_workers=worker_count) as executor:
+        outputs = list(
+            executor.map(partial(call_with_worker_metrics, clean_file), raw_files)
+        )
+    for _, metrics in outputs:
+        merge_worker_metrics(metrics)
+    return [result for result, _ in outputs]
+
+
+def _partition_sha256(file_path: Path, record: dict | None) -> str:
+    """原始文件哈希；大小与修改时间与分区记录一致时直接复用。"""
+    stat = file_path.stat()
+    if (
+        record
+        and record.get("size") == stat.st_size
+        and record.get("mtime_ns") == stat.st_mtime_ns
+    ):
+        return record["sha256"]
+    return file_sha256(file_path)
 
-    id_candidates = ["source_file", "timestamp", "recv_time", "sp_id", "id"]
-    id_vars = [col for col in id_candidates if col in df.columns]
 
-    value_vars = [
+def metric_columns(df: pd.DataFrame) -> list[str]:
+    """宽表中的监测指标列：除标识列外的数值列。"""
+    return [
         col
         for col in df.columns
-        if col not in set(id_vars)
-        and pd.api.types.is_numeric_dtype(df[col])
+        if col not in LONG_ID_COLUMNS
         and col not in {"id", "sp_id"}
+        and pd.api.types.is_numeric_dtype(df[col])
     ]
 
-    if not value_vars:
+
+def iter_long_view(
+    df: pd.DataFrame, metrics: list[str] | None = None
+) -> Iterator[pd.DataFrame]:
+    """按指标逐个产出长表切片，是宽表的惰性长表视图。
+
+    每次只物化一个指标的非空读数，调用方可边迭代边聚合，无需整张长表驻留内存。
+    """
+    id_vars = [col for col in LONG_ID_COLUMNS if col in df.columns]
+    for metric in metric_columns(df) if metrics is None else metrics:
+        mask = df[metric].notna()
+        part = df.loc[mask, id_vars]
+        part["metric"] = metric
+        part["value"] = df.loc[mask, metric]
+        yield part
+
+
+@timed_substep("to_long_format")
+def _to_long_format(df: pd.DataFrame) -> pd.DataFrame:
+    """将宽表转换为长表（紧凑存储）。
+
+    metric / source_file 使用分类类型，不再重复保存原始 recv_time 字符串。
+    """
+    if df.empty:
+        return df
+
+    metrics = metric_columns(df)
+    id_vars = [col for col in LONG_ID_COLUMNS if col in df.columns]
+    if not metrics:
         return pd.DataFrame(columns=id_vars + ["metric", "value"])
 
-    long_df = df.melt(
-        id_vars=id_vars,
-        value_vars=value_vars,
-        var_name="metric",
-        value_name="value",
-    )
-    long_df = long_df[long_df["value"].notna()].copy()
-    return long_df.reset_index(drop=True)
+    long_df = pd.concat(iter_long_view(df, metrics), ignore_index=True)
+    long_df["metric"] = pd.Categorical(long_df["metric"], categories=metrics)
+    if "source_file" in long_df.columns:
+        long_df["source_file"] = long_df["source_file"].astype("category")
+    return long_df
 
 
-def preprocess_grid_history() -> (
-    tuple[pd.DataFrame, pd.DataFrame, PreprocessResult, PreprocessResult]
-):
-    """清洗并合并网格历史数据，输出宽表与长表。"""
+def preprocess_grid_history(
+    workers: int | None = 1, compact: bool = False
+) -> tuple[pd.DataFrame, pd.DataFrame, PreprocessResult, PreprocessResult]:
+    """清洗并合并网格历史数据，输出宽表与长表。
+
+    workers 为清洗进程数：1 为串行，None/0 为按 CPU 核数并行。
+    compact=True 时启用紧凑 dtype（float32 测量值、最小整数标识列、分类
+    source_file、去掉 recv_time），宽表结果的 compaction 记录节省的内存。
+    增量模式见 preprocess_grid_history_partitions；整表模式会删除其写出的来源
+    文件分区，避免读取端误用过期分区。
+    """
     raw_files = sorted(RAW_DATA_DIR.glob(FILE_GLOB))
     frames: list[pd.DataFrame] = []
     total_rows_in = 0
+    bytes_before = 0
+
+    for dataset in (DATASET_WIDE, DATASET_LONG):
+        shutil.rmtree(partitions_dir(dataset), ignore_errors=True)
 
-    for file_path in raw_files:
-        records = load_json_records(file_path)
-        total_rows_in += len(records)
-        cleaned = _clean_single_grid_file(file_path)
-        if not cleaned.empty:
-            frames.append(cleaned)
+    with timed_substep("clean_grid_files"):
+        for cleaned, rows_in, cleaned_bytes in _clean_grid_files(
+            raw_files, workers=workers, compact=compact
+        ):
+            total_rows_in += rows_in
+            bytes_before += cleaned_bytes
+            if not cleaned.empty:
+                frames.append(cleaned)
 
     if not frames:
         empty = pd.DataFrame()
@@ -117,6 +264,13 @@ def preprocess_grid_history() -> (
         rows_out=len(wide_df),
         json_path="",
     )
+    if compact:
+        bytes_after = frame_memory_bytes(wide_df)
+        wide_result.compaction = {
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_after,
+            "bytes_saved": bytes_before - bytes_after,
+        }
     long_result = PreprocessResult(
         dataset=DATASET_LONG,
         rows_in=total_rows_in,
@@ -124,3 +278,131 @@ def preprocess_grid_history() -> (
         json_path="",
     )
     return wide_df, long_df, wide_result, long_result
+
+
+def _partition_current(
+    sha256: str,
+    wide: dict[str, Any] | None,
+    long: dict[str, Any] | None,
+) -> bool:
+    """来源文件的宽表 / 长表分区（及分区索引）是否仍与文件内容一致且都在。"""
+    if wide is None or long is None:
+        return False
+    if wide.get("sha256") != sha256 or long.get("sha256") != sha256:
+        return False
+    paths = [
+        partitions_dir(DATASET_WIDE) / wide["file"],
+        partitions_dir(DATASET_LONG) / long["file"],
+    ]
+    if wide.get("index"):
+        paths.append(partitions_dir(DATASET_WIDE) / wide["index"])
+    return all(path.exists() for path in paths)
+
+
+def _save_file_partitions(
+    file_path: Path,
+    sha256: str,
+    cleaned: tuple[pd.DataFrame, int, int],
+    compact: bool,
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    """写出单个来源文件的宽表分区、分区索引与长表分区，返回两条分区记录。"""
+    df, rows_in, bytes_before = cleaned
+    if compact and "source_file" in df.columns:
+        # 分区只含本文件，分类列只保留自身类别；读取端合并分区时取并集
+        df["source_file"] = df["source_file"].cat.remove_unused_categories()
+    stat = file_path.stat()
+    source = {"sha256": sha256, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    wide = {
+        **source,
+        **save_partition(df, DATASET_WIDE, file_path.name),
+        "rows_in": rows_in,
+        "bytes_before": bytes_before,
+        "bytes_after": frame_memory_bytes(df) if compact else 0,
+    }
+    index_dir = partitions_dir(DATASET_WIDE) / f"{wide['name']}{STATION_INDEX_SUFFIX}"
+    index_path = save_station_index(
+        df, DATASET_WIDE, value_columns=metric_columns(df), directory=index_dir
+    )
+    wide["index"] = Path(index_path).name if index_path else None
+    long = {
+        **source,
+        **save_partition(_to_long_format(df), DATASET_LONG, file_path.name),
+    }
+    return wide, long
+
+
+def preprocess_grid_history_partitions(
+    workers: int | None = 1, compact: bool = False
+) -> tuple[PreprocessResult, PreprocessResult]:
+    """增量清洗网格历史：按来源文件分区即为输出，只清洗并写出新增或变化的文件。
+
+    每个来源文件对应一个宽表分区（附该分区的站点时间索引）与一个长表分区，
+    分别位于 grid_history_wide_parts/ 与 grid_history_long_parts/；内容未变的
+    文件既不读取也不重写，已删除文件的分区随清单更新移除。整表文件、整表索引
+    与按月分区不再写出，旧文件一并删除，读取端改读分区。
+    """
+    raw_files = sorted(RAW_DATA_DIR.glob(FILE_GLOB))
+    wide_manifest = load_partition_manifest(DATASET_WIDE) or {"params": {}, "files": {}}
+    long_manifest = load_partition_manifest(DATASET_LONG) or {"params": {}, "files": {}}
+    # 清洗参数或清洗代码（本模块、common.py 与 shared 包）变化后旧分区不可复用
+    params = {"compact": compact, "code": code_version([Path(__file__).name])}
+    reusable = wide_manifest["params"] == params and long_manifest["params"] == params
+    previous_wide = wide_manifest["files"] if reusable else {}
+    previous_long = long_manifest["files"] if reusable else {}
+
+    hashes = {
+        path.name: _partition_sha256(path, previous_wide.get(path.name))
+        for path in raw_files
+    }
+    stale = [
+        path
+        for path in raw_files
+        if not _partition_current(
+            hashes[path.name],
+            previous_wide.get(path.name),
+            previous_long.get(path.name),
+        )
+    ]
+    with timed_substep("clean_grid_files"):
+        cleaned = _clean_grid_files(stale, workers=workers, compact=compact)
+
+    reused = [path.name for path in raw_files if path not in stale]
+    wide_files = {name: previous_wide[name] for name in reused}
+    long_files = {name: previous_long[name] for name in reused}
+    for path, item in zip(stale, cleaned):
+        wide_files[path.name], long_files[path.name] = _save_file_partitions(
+            path, hashes[path.name], item, compact
+        )
+
+    layout = {"time_column": "timestamp", "key_column": "sp_id"}
+    for dataset, files in ((DATASET_WIDE, wide_files), (DATASET_LONG, long_files)):
+        ordered = {name: files[name] for name in sorted(files)}
+        save_partition_manifest(dataset, {"params": params, **layout, "files": ordered})
+        remove_cleaned_dataset(dataset)
+
+    records = list(wide_files.values())
+    rows_in = sum(item["rows_in"] for item in records)
+    wide_result = PreprocessResult(
+        dataset=DATASET_WIDE,
+        rows_in=rows_in,
+        rows_out=sum(item["rows"] for item in records),
+        json_path="",
+        partitions_path=str(partitions_dir(DATASET_WIDE)),
+    )
+    if compact:
+        bytes_before = sum(item["bytes_before"] for item in records)
+        bytes_after = sum(item["bytes_after"] for item in records)
+        wide_result.compaction = {
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_after,
+            "bytes_saved": bytes_before - bytes_after,
+        }
+    long_result = PreprocessResult(
+        dataset=DATASET_LONG,
+        rows_in=rows_in,
+        rows_out=sum(item["rows"] for item in long_files.values()),
+        json_path="",
+        partitions_path=str(partitions_dir(DATASET_LONG)),
+    )
+    return wide_result, long_result
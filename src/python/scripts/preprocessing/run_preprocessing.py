@@ -2,67 +2,361 @@
 
 from __future__ import annotations
 
-from dataclasses import asdict
+from dataclasses import asdict, dataclass
 from datetime import datetime
 from pathlib import Path
+import argparse
 import json
+import shutil
+from typing import Any, Callable
+
+import pandas as pd
 
 from common import (
+    BUILD_MANIFEST_PATH,
     CLEANED_DIR,
+    CLEANED_FORMATS,
+    DEFAULT_CLEANED_FORMATS,
+    PY_ROOT_DIR,
+    RAW_DATA_DIR,
     PreprocessResult,
+    build_fingerprint,
+    code_version,
+    collect_step_metrics,
     ensure_output_dirs,
+    file_sha256,
+    load_build_manifest,
+    normalize_cleaned_formats,
+    save_build_manifest,
     save_cleaned_dataset,
+    save_station_index,
+    save_time_partitions,
+    time_partitions_dir,
 )
+from preprocess_air_quality_days import RAW_FILE as AIR_QUALITY_RAW_FILE
 from preprocess_air_quality_days import preprocess_air_quality_days
+from preprocess_beibei_yearly import FILE_GLOB as BEIBEI_FILE_GLOB
 from preprocess_beibei_yearly import preprocess_beibei_yearly
+from preprocess_extended_forecast import RAW_FILE as FORECAST_RAW_FILE
 from preprocess_extended_forecast import preprocess_extended_forecast
-from preprocess_grid_history import preprocess_grid_history
+from preprocess_grid_history import FILE_GLOB as GRID_FILE_GLOB
+from preprocess_grid_history import (
+    metric_columns,
+    preprocess_grid_history,
+    preprocess_grid_history_partitions,
+)
 
 
-def _save_and_fill_result(result: PreprocessResult, dataset_name: str, df):
+def _save_and_fill_result(
+    result: PreprocessResult,
+    dataset_name: str,
+    df,
+    formats: tuple[str, ...] = DEFAULT_CLEANED_FORMATS,
+):
     """保存数据并回填结果文件路径。"""
-    saved = save_cleaned_dataset(df, dataset_name)
+    saved = save_cleaned_dataset(df, dataset_name, formats=formats)
     result.json_path = saved.json_path
+    result.parquet_path = saved.parquet_path
     result.rows_out = len(df)
     return result
 
 
-def run_all_preprocessing() -> list[PreprocessResult]:
-    """执行全部预处理流程。"""
-    ensure_output_dirs()
+@dataclass(frozen=True)
+class PreprocessStep:
+    """单个预处理步骤：原始输入、源码模块与执行函数。"""
 
-    results: list[PreprocessResult] = []
+    name: str
+    module_file: str
+    raw_patterns: tuple[str, ...]
+    run: Callable[
+        [int | None, bool, bool], list[tuple[pd.DataFrame | None, PreprocessResult]]
+    ]
+    supports_compact: bool = False
+    supports_incremental: bool = False
+    supports_time_partitions: bool = False
 
-    # 1) 北碚年度气象
-    beibei_df, beibei_result = preprocess_beibei_yearly()
-    results.append(
-        _save_and_fill_result(beibei_result, beibei_result.dataset, beibei_df)
-    )
 
-    # 2) 空气优良天数
-    air_df, air_result = preprocess_air_quality_days()
-    results.append(_save_and_fill_result(air_result, air_result.dataset, air_df))
+def _run_beibei(
+    workers: int | None, compact: bool, incremental: bool
+) -> list[tuple[pd.DataFrame, PreprocessResult]]:
+    """区县年度气象（多文件并行清洗后合并）。"""
+    return [preprocess_beibei_yearly(workers=workers)]
 
-    # 3) 延伸期预报
-    forecast_df, forecast_result = preprocess_extended_forecast()
-    results.append(
-        _save_and_fill_result(forecast_result, forecast_result.dataset, forecast_df)
-    )
 
-    # 4) 网格化历史（宽表 + 长表）
-    grid_wide_df, grid_long_df, grid_wide_result, grid_long_result = (
-        preprocess_grid_history()
+def _run_air_quality(
+    workers: int | None, compact: bool, incremental: bool
+) -> list[tuple[pd.DataFrame, PreprocessResult]]:
+    """空气优良天数。"""
+    return [preprocess_air_quality_days()]
+
+
+def _run_forecast(
+    workers: int | None, compact: bool, incremental: bool
+) -> list[tuple[pd.DataFrame, PreprocessResult]]:
+    """延伸期预报。"""
+    return [preprocess_extended_forecast()]
+
+
+def _run_grid(
+    workers: int | None, compact: bool, incremental: bool
+) -> list[tuple[pd.DataFrame | None, PreprocessResult]]:
+    """网格化历史（宽表 + 长表），宽表同时写出站点时间索引。
+
+    增量模式下按来源文件分区已在步骤内写出，不再返回整表。
+    """
+    if incremental:
+        wide_result, long_result = preprocess_grid_history_partitions(
+            workers=workers, compact=compact
+        )
+        return [(None, wide_result), (None, long_result)]
+
+    wide_df, long_df, wide_result, long_result = preprocess_grid_history(
+        workers=workers, compact=compact
     )
-    results.append(
-        _save_and_fill_result(grid_wide_result, grid_wide_result.dataset, grid_wide_df)
+    wide_result.index_path = save_station_index(
+        wide_df, wide_result.dataset, value_columns=metric_columns(wide_df)
     )
-    results.append(
-        _save_and_fill_result(grid_long_result, grid_long_result.dataset, grid_long_df)
+    return [(wide_df, wide_result), (long_df, long_result)]
+
+
+# 执行顺序即报告中的数据集顺序
+PREPROCESS_STEPS = [
+    PreprocessStep(
+        "beibei_yearly",
+        "preprocess_beibei_yearly.py",
+        (BEIBEI_FILE_GLOB,),
+        _run_beibei,
+    ),
+    PreprocessStep(
+        "air_quality_days",
+        "preprocess_air_quality_days.py",
+        (AIR_QUALITY_RAW_FILE,),
+        _run_air_quality,
+    ),
+    PreprocessStep(
+        "extended_forecast",
+        "preprocess_extended_forecast.py",
+        (FORECAST_RAW_FILE,),
+        _run_forecast,
+    ),
+    PreprocessStep(
+        "grid_history",
+        "preprocess_grid_history.py",
+        (GRID_FILE_GLOB,),
+        _run_grid,
+        supports_compact=True,
+        supports_incremental=True,
+        supports_time_partitions=True,
+    ),
+]
+
+
+def _step_outputs_exist(step_entry: dict[str, Any]) -> bool:
+    """检查清单中记录的产物文件是否仍然存在。"""
+    for item in step_entry.get("results", []):
+        for key in ("json_path", "parquet_path", "index_path", "partitions_path"):
+            path = item.get(key)
+            if path and not Path(path).exists():
+                return False
+    return bool(step_entry.get("results"))
+
+
+def run_preprocess_step(
+    step: PreprocessStep,
+    manifest: dict[str, Any],
+    file_hashes: dict[str, Any],
+    workers: int | None = 1,
+    formats: tuple[str, ...] = DEFAULT_CLEANED_FORMATS,
+    force: bool = False,
+    compact: bool = False,
+    incremental: bool = False,
+    time_partitions: bool = False,
+) -> list[PreprocessResult]:
+    """增量执行单个预处理步骤，并把最新记录写回 manifest 与 file_hashes。
+
+    原始输入内容、代码版本与参数均未变化且产物仍在时直接复用上次结果；
+    force=True 时强制重建。重建时每个结果附带读取/转换/序列化耗时、
+    峰值内存增量与读写字节数（metrics）。compact 只作用于支持紧凑 dtype 的步骤。
+    incremental 只作用于支持按文件分区的步骤：输出改为按来源文件分区，重建时
+    只清洗并写出新增或变化的原始文件。time_partitions 时支持的步骤额外按月写出
+    时间分区（save_time_partitions），未开启时删除旧分区；增量模式的来源文件
+    分区自带起止时间与站点集合，不再另写按月分区。
+    """
+    previous_hashes = manifest["file_hashes"]
+    compact = compact and step.supports_compact
+    incremental = incremental and step.supports_incremental
+    time_partitions = (
+        time_partitions and step.supports_time_partitions and not incremental
     )
+    params: dict[str, Any] = {"formats": list(formats)}
+    if compact:
+        params["compact"] = True
+    if incremental:
+        params["incremental"] = True
+    if time_partitions:
+        params["time_partitions"] = True
+
+    raw_files = sorted(
+        {path for pattern in step.raw_patterns for path in RAW_DATA_DIR.glob(pattern)}
+    )
+    inputs = {}
+    for path in raw_files:
+        inputs[path.name] = file_sha256(path, previous_hashes)
+        key = str(path.resolve().relative_to(PY_ROOT_DIR))
+        file_hashes[key] = previous_hashes[key]
+
+    code = code_version([step.module_file])
+    fingerprint = build_fingerprint(inputs, code, params)
+
+    previous = manifest["steps"].get(step.name, {})
+    if (
+        not force
+        and previous.get("fingerprint") == fingerprint
+        and _step_outputs_exist(previous)
+    ):
+        # 跳过的步骤没有本次运行指标，清空以免监控误读上次数值
+        return [
+            PreprocessResult(**{**item, "rebuilt": False, "metrics": {}})
+            for item in previous["results"]
+        ]
+
+    with collect_step_metrics() as metrics:
+        step_results = []
+        for df, result in step.run(workers, compact, incremental):
+            if df is None:
+                step_results.append(result)
+                continue
+            step_results.append(
+                _save_and_fill_result(result, result.dataset, df, formats)
+            )
+            if time_partitions:
+                result.partitions_path = save_time_partitions(
+                    df, result.dataset, formats
+                )
+            elif step.supports_time_partitions:
+                shutil.rmtree(time_partitions_dir(result.dataset), ignore_errors=True)
+    for item in step_results:
+        item.metrics = metrics.for_result(item.dataset)
+    manifest["steps"][step.name] = {
+        "fingerprint": fingerprint,
+        "inputs": inputs,
+        "code_version": code,
+        "params": params,
+        "results": [asdict(item) for item in step_results],
+    }
+    return step_results
+
 
+def run_all_preprocessing(
+    workers: int | None = 1,
+    formats: list[str] | tuple[str, ...] | None = None,
+    force: bool = False,
+    compact: bool = False,
+    incremental: bool = False,
+    time_partitions: bool = False,
+) -> list[PreprocessResult]:
+    """执行全部预处理流程。
+
+    workers 为网格历史与区县年度气象清洗的并行进程数；formats 为清洗结果落盘格式；
+    默认按构建清单增量执行，force=True 时全部重建；compact=True 时网格宽表
+    使用紧凑 dtype；incremental=True 时网格历史按来源文件分区输出，只清洗并
+    写出新增或变化的文件；time_partitions=True 时网格宽表与长表额外按月写出
+    时间分区（增量模式除外）。
+    """
+    ensure_output_dirs()
+    formats = normalize_cleaned_formats(formats)
+
+    manifest = load_build_manifest(BUILD_MANIFEST_PATH)
+    file_hashes: dict[str, Any] = {}
+
+    results: list[PreprocessResult] = []
+    for step in PREPROCESS_STEPS:
+        results.extend(
+            run_preprocess_step(
+                step,
+                manifest,
+                file_hashes,
+                workers,
+                formats,
+                force,
+                compact,
+                incremental,
+                time_partitions,
+            )
+        )
+
+    # 只保留本次仍存在的原始文件哈希缓存
+    manifest["file_hashes"] = file_hashes
+    save_build_manifest(manifest, BUILD_MANIFEST_PATH)
     return results
 
 
+def run_named_step(
+    step_name: str,
+    workers: int | None = 1,
+    formats: list[str] | tuple[str, ...] | None = None,
+    force: bool = False,
+    compact: bool = False,
+    incremental: bool = False,
+    time_partitions: bool = False,
+) -> dict[str, Any]:
+    """执行单个命名步骤并返回可序列化结果，供流水线调度器在独立进程中调用。
+
+    构建清单只读不写，由 write_step_payloads 在调度结束后统一合并写出。
+    """
+    ensure_output_dirs()
+    step = next(item for item in PREPROCESS_STEPS if item.name == step_name)
+    manifest = load_build_manifest(BUILD_MANIFEST_PATH)
+    file_hashes: dict[str, Any] = {}
+    results = run_preprocess_step(
+        step,
+        manifest,
+        file_hashes,
+        workers,
+        normalize_cleaned_formats(formats),
+        force,
+        compact,
+        incremental,
+        time_partitions,
+    )
+    return {
+        "results": [asdict(item) for item in results],
+        "entry": manifest["steps"].get(step_name),
+        "file_hashes": file_hashes,
+    }
+
+
+def write_step_payloads(
+    payloads: dict[str, dict[str, Any]], keep_missing: bool = False
+) -> Path:
+    """合并 run_named_step 的结果，写出构建清单与预处理报告，返回报告路径。
+
+    keep_missing=True 用于只执行部分节点（监听模式）：未执行步骤沿用清单中的
+    记录与文件哈希缓存，并以未重建状态列入报告。
+    """
+    manifest = load_build_manifest(BUILD_MANIFEST_PATH)
+    file_hashes: dict[str, Any] = dict(manifest["file_hashes"]) if keep_missing else {}
+    results: list[PreprocessResult] = []
+    for step in PREPROCESS_STEPS:
+        payload = payloads.get(step.name)
+        if payload is None:
+            previous = manifest["steps"].get(step.name)
+            if keep_missing and previous:
+                results.extend(
+                    PreprocessResult(**{**item, "rebuilt": False, "metrics": {}})
+                    for item in previous["results"]
+                )
+            continue
+        if payload["entry"] is not None:
+            manifest["steps"][step.name] = payload["entry"]
+        file_hashes.update(payload["file_hashes"])
+        results.extend(PreprocessResult(**item) for item in payload["results"])
+
+    manifest["file_hashes"] = file_hashes
+    save_build_manifest(manifest, BUILD_MANIFEST_PATH)
+    return write_report(results)
+
+
 def write_report(results: list[PreprocessResult]) -> Path:
     """输出预处理报告，方便后续导库脚本与联调查看。"""
     report_path = CLEANED_DIR / "preprocessing_report.json"
@@ -71,6 +365,13 @@ def write_report(results: list[PreprocessResult]) -> Path:
         "generated_at": datetime.now().isoformat(timespec="seconds"),
         "datasets": [asdict(item) for item in results],
     }
+    # 紧凑 dtype 模式下汇总本阶段节省的内存
+    compacted = [item.compaction for item in results if item.compaction]
+    if compacted:
+        payload["compaction"] = {
+            key: sum(item[key] for item in compacted)
+            for key in ("bytes_before", "bytes_after", "bytes_saved")
+        }
 
     with report_path.open("w", encoding="utf-8") as f:
         json.dump(payload, f, ensure_ascii=False, indent=2)
@@ -78,14 +379,69 @@ def write_report(results: list[PreprocessResult]) -> Path:
     return report_path
 
 
+def _parse_args() -> argparse.Namespace:
+    """解析命令行参数。"""
+    parser = argparse.ArgumentParser(description="DPV-CQW 数据预处理")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="网格历史与区县年度气象文件并行清洗进程数，1 为串行，0 为按 CPU 核数（默认 1）",
+    )
+    parser.add_argument(
+        "--format",
+        dest="formats",
+        nargs="+",
+        choices=CLEANED_FORMATS,
+        default=list(DEFAULT_CLEANED_FORMATS),
+        help="清洗结果落盘格式，可多选（默认 json；parquet 需安装 pyarrow）",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="忽略构建清单，重建全部数据集",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="网格宽表使用紧凑 dtype（float32、最小整数、分类列），节省内存",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="网格历史按来源文件分区输出，只清洗并写出新增或变化的文件",
+    )
+    parser.add_argument(
+        "--time-partitions",
+        action="store_true",
+        help="网格宽表与长表额外按月写出时间分区，读取端可按时间范围与站点跳过分区",
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    preprocess_results = run_all_preprocessing()
+    args = _parse_args()
+    preprocess_results = run_all_preprocessing(
+        workers=args.workers,
+        formats=args.formats,
+        force=args.force,
+        compact=args.compact,
+        incremental=args.incremental,
+        time_partitions=args.time_partitions,
+    )
     report_file = write_report(preprocess_results)
 
     print("\n预处理完成，结果如下：")
     for item in preprocess_results:
+        status = "" if item.rebuilt else "（未变化，已跳过）"
+        cost = f", 步骤耗时 {item.metrics['step_seconds']:.2f}s" if item.metrics else ""
         print(
-            f"- {item.dataset}: 输入 {item.rows_in} 行, 输出 {item.rows_out} 行\n"
-            f"  JSON: {item.json_path}"
+            f"- {item.dataset}{status}: 输入 {item.rows_in} 行, 输出 {item.rows_out} 行"
+            f"{cost}\n"
+            f"  JSON: {item.json_path or '-'}"
         )
+        if item.parquet_path:
+            print(f"  Parquet: {item.parquet_path}")
+        if item.compaction:
+            print(f"  紧凑 dtype 节省内存: {item.compaction['bytes_saved']} 字节")
     print(f"\n报告文件: {report_file}")
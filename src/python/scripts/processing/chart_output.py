@@ -0,0 +1,224 @@
+"""图表 JSON 输出：默认缩进排版；minify 时紧凑输出，可附带预压缩副本。"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+import gzip
+import importlib.util
+import json
+import math
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from common import PROCESSED_DIR, ProcessResult, ensure_processed_dir, record_serialize
+from payload_codec import encode_payload
+
+
+# 预压缩副本格式 -> 文件后缀
+COMPRESSED_SUFFIXES = {"gz": ".json.gz", "br": ".json.br"}
+
+# 图表数据格式版本：1 为原始 xAxis + 数值列表，2 为列式编码
+PAYLOAD_VERSIONS = (1, 2)
+
+
+@dataclass(frozen=True)
+class JsonOutputOptions:
+    """图表 JSON 写出方式。
+
+    minify=True 时去掉缩进与空白，安装 orjson 时用其编码（numpy / pandas 标量
+    原生输出）；compress 为同时写出的预压缩副本（gz / br），供 Web 服务直接发送；
+    payload_version=2 时每个图表包在 v2 信封中，时序类图表改用列式编码（见
+    encode_payload）。
+    """
+
+    minify: bool = False
+    compress: tuple[str, ...] = ()
+    payload_version: int = 1
+
+    def fingerprint_params(self) -> dict[str, Any]:
+        """写出方式会改变输出文件，非默认时计入构建指纹。"""
+        if self == JsonOutputOptions():
+            return {}
+        params: dict[str, Any] = {
+            "minify": self.minify,
+            "compress": list(self.compress),
+        }
+        if self.payload_version != 1:
+            params["payload_version"] = self.payload_version
+        return {"json_output": params}
+
+
+_ACTIVE_OUTPUT_OPTIONS: list[JsonOutputOptions] = []
+
+
+def normalize_json_output(
+    minify: bool = False,
+    compress: Iterable[str] | None = None,
+    payload_version: int = 1,
+) -> JsonOutputOptions:
+    """校验并规范化写出方式；br 需要 brotli 包。"""
+    if payload_version not in PAYLOAD_VERSIONS:
+        raise ValueError(f"不支持的图表数据版本: {payload_version}，可选 1 / 2")
+    requested = {str(item).strip().lower() for item in compress or () if str(item)}
+    unknown = requested - set(COMPRESSED_SUFFIXES)
+    if unknown:
+        raise ValueError(f"不支持的压缩格式: {sorted(unknown)}，可选 gz / br")
+    if "br" in requested and importlib.util.find_spec("brotli") is None:
+        raise RuntimeError("输出 br 需要安装 brotli（pip install brotli）")
+    ordered = tuple(item for item in COMPRESSED_SUFFIXES if item in requested)
+    return JsonOutputOptions(
+        minify=bool(minify), compress=ordered, payload_version=int(payload_version)
+    )
+
+
+@contextmanager
+def json_output_options(options: JsonOutputOptions) -> Iterator[JsonOutputOptions]:
+    """在 with 块内让 save_processed_json 按 options 写出（图表函数无需改签名）。"""
+    _ACTIVE_OUTPUT_OPTIONS.append(options)
+    try:
+        yield options
+    finally:
+        _ACTIVE_OUTPUT_OPTIONS.remove(options)
+
+
+def current_json_output() -> JsonOutputOptions:
+    """当前生效的写出方式；不在 json_output_options 内时为默认缩进输出。"""
+    return _ACTIVE_OUTPUT_OPTIONS[-1] if _ACTIVE_OUTPUT_OPTIONS else JsonOutputOptions()
+
+
+def encode_json(payload: Any, minify: bool = False) -> bytes:
+    """把图表数据编码为 UTF-8 JSON。
+
+    minify=False 与原输出一致（indent=2）；minify=True 时优先用 orjson，
+    未安装则退回标准库紧凑输出，两者结果一致（NaN 写为 null，float32 取最短表示）。
+    """
+    if not minify:
+        text = json.dumps(payload, ensure_ascii=False, indent=2, default=_json_default)
+        return text.encode("utf-8")
+    if importlib.util.find_spec("orjson") is not None:
+        import orjson
+
+        return orjson.dumps(
+            payload,
+            default=_json_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+    text = json.dumps(
+        _orjson_compatible(payload),
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=_json_default,
+    )
+    return text.encode("utf-8")
+
+
+def _orjson_compatible(value: Any) -> Any:
+    """标准库紧凑输出前的规范化，使结果与 orjson 一致。
+
+    非有限浮点（NaN / ±inf）写为 null；float32 取其最短往返表示（0.1 而非
+    0.10000000149011612）。numpy 数组逐元素处理，其余类型交给 _json_default。
+    """
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, np.floating):
+        item = float(str(value)) if value.dtype == np.float32 else float(value)
+        return item if math.isfinite(item) else None
+    if isinstance(value, dict):
+        return {key: _orjson_compatible(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_orjson_compatible(item) for item in value]
+    return value
+
+
+def _compress(data: bytes, fmt: str) -> bytes:
+    """生成预压缩副本内容；gzip 固定 mtime，内容不变时文件逐字节一致。"""
+    if fmt == "gz":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    import brotli
+
+    return brotli.compress(data, quality=11)
+
+
+def output_paths(json_path: Path, sizes: dict[str, int]) -> list[Path]:
+    """由 json 路径与 sizes 记录推出该数据集的全部输出文件。"""
+    base = json_path.name[: -len(".json")]
+    return [json_path] + [
+        json_path.with_name(base + COMPRESSED_SUFFIXES[fmt])
+        for fmt in sizes
+        if fmt in COMPRESSED_SUFFIXES
+    ]
+
+
+def save_processed_json(
+    dataset_name: str, payload: Any, rows_in: int, rows_out: int
+) -> ProcessResult:
+    """保存图表最终数据为 JSON，写出方式由 json_output_options 决定。
+
+    dataset_name 可带子目录（如 grid_pyramid/1001），写入 data_processed 下对应位置。
+    内容与已有文件逐字节一致时不重写（增量构建时未变化的图表保持原文件与 mtime），
+    已有的预压缩副本随之复用。
+    """
+    ensure_processed_dir()
+    options = current_json_output()
+    output_path = PROCESSED_DIR / f"{dataset_name}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    sibling_paths = {
+        fmt: PROCESSED_DIR / f"{dataset_name}{COMPRESSED_SUFFIXES[fmt]}"
+        for fmt in COMPRESSED_SUFFIXES
+    }
+
+    with record_serialize(dataset_name, [output_path, *sibling_paths.values()]):
+        if options.payload_version == 2:
+            payload = encode_payload(payload)
+        data = encode_json(payload, minify=options.minify)
+        changed = _write_if_changed(output_path, data)
+        sizes = {"json": len(data)}
+        for fmt, path in sibling_paths.items():
+            if fmt in options.compress:
+                if not changed and path.exists():
+                    sizes[fmt] = path.stat().st_size
+                    continue
+                compressed = _compress(data, fmt)
+                path.write_bytes(compressed)
+                sizes[fmt] = len(compressed)
+            else:
+                # 未请求的副本若残留则删除，避免 Web 服务发送过期内容
+                path.unlink(missing_ok=True)
+
+    return ProcessResult(
+        dataset=dataset_name,
+        rows_in=int(rows_in),
+        rows_out=int(rows_out),
+        json_path=str(output_path),
+        sizes=sizes,
+    )
+
+
+def _write_if_changed(path: Path, data: bytes) -> bool:
+    """内容变化时写出并返回 True；先比较大小，大小相同再比较内容。"""
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    path.write_bytes(data)
+    return True
+
+
+def _json_default(value: Any) -> Any:
+    """处理 datetime / pandas 时间戳与 numpy 标量序列化，其余转为字符串。"""
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        item = value.item()
+        return None if isinstance(item, float) and item != item else item
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return str(value)
@@ -0,0 +1,351 @@
+"""清洗后数据的读取：优先 Parquet 列式文件，缺失时回退到 JSON。
+
+支持只读所需列、按时间范围与站点集合筛选（有按月时间分区时剪枝），以及分批流式读取。
+预处理以增量模式运行时没有整表文件，改为按来源文件分区读取（同样按时间与站点剪枝）。
+网格宽表的指标列约定（标识列与指标发现）也在此定义，供各网格图表共用。
+"""
+
+from __future__ import annotations
+
+from itertools import islice
+from pathlib import Path
+import importlib.util
+import json
+import time
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+from common import (
+    CLEANED_DIR,
+    current_step_metrics,
+    iter_json_array,
+    load_partition_manifest,
+    load_time_partitions,
+    partitions_dir,
+    record_load,
+    time_partitions_dir,
+)
+from partitions import ordered_partitions, partition_meta, prune_time_partitions
+
+
+# 网格历史宽表：各网格图表的输入
+DATASET_WIDE = "grid_history_wide"
+
+# 宽表中不属于监测指标的标识列
+ID_COLUMNS = frozenset({"id", "sp_id", "timestamp", "recv_time", "source_file"})
+
+
+def _select_columns(
+    available: Iterable[str], columns: Iterable[str] | None
+) -> list[str] | None:
+    """按请求顺序保留存在的列；columns 为 None 表示读取全部列。"""
+    if columns is None:
+        return None
+    existing = set(available)
+    return [col for col in columns if col in existing]
+
+
+def load_cleaned_json(
+    dataset_name: str, columns: Iterable[str] | None = None
+) -> pd.DataFrame:
+    """读取清洗后的 JSON 数据。"""
+    file_path = CLEANED_DIR / f"{dataset_name}.json"
+    if not file_path.exists():
+        return pd.DataFrame()
+
+    with record_load(file_path), file_path.open("r", encoding="utf-8") as f:
+        raw = json.load(f)
+
+    if not isinstance(raw, list):
+        return pd.DataFrame()
+
+    records = [item for item in raw if isinstance(item, dict)]
+    df = pd.DataFrame(records)
+    selected = _select_columns(df.columns, columns)
+    return df if selected is None else df[selected]
+
+
+def load_cleaned_parquet(
+    dataset_name: str, columns: Iterable[str] | None = None
+) -> pd.DataFrame:
+    """读取清洗后的 Parquet 数据，只读取所需列且保留原始 dtype。"""
+    import pyarrow.parquet as pq
+
+    file_path = CLEANED_DIR / f"{dataset_name}.parquet"
+    if not file_path.exists():
+        return pd.DataFrame()
+
+    with record_load(file_path):
+        selected = _select_columns(pq.read_schema(file_path).names, columns)
+        return pd.read_parquet(file_path, engine="pyarrow", columns=selected)
+
+
+def _load_cleaned_file(
+    dataset_name: str, columns: Iterable[str] | None = None
+) -> pd.DataFrame:
+    """读取单个清洗结果文件：优先 Parquet 列式文件，缺失时回退到 JSON。"""
+    parquet_path = CLEANED_DIR / f"{dataset_name}.parquet"
+    if parquet_path.exists() and importlib.util.find_spec("pyarrow") is not None:
+        return load_cleaned_parquet(dataset_name, columns)
+    return load_cleaned_json(dataset_name, columns)
+
+
+def _table_files(dataset_name: str) -> list[str]:
+    """整表读取时的文件：没有整表文件而有来源文件分区时为全部分区（按文件顺序）。"""
+    if any(
+        (CLEANED_DIR / f"{dataset_name}.{fmt}").exists() for fmt in ("parquet", "json")
+    ):
+        return [dataset_name]
+    manifest = load_partition_manifest(dataset_name)
+    if manifest is None:
+        return [dataset_name]
+    directory = partitions_dir(dataset_name).name
+    return [f"{directory}/{part['name']}" for part in ordered_partitions(manifest)]
+
+
+def _partition_layout(dataset_name: str) -> tuple[str, dict[str, Any]] | None:
+    """可剪枝的分区目录名与元数据：按月时间分区优先，其次为来源文件分区。"""
+    meta = load_time_partitions(dataset_name)
+    if meta is not None:
+        return time_partitions_dir(dataset_name).name, meta
+    manifest = load_partition_manifest(dataset_name)
+    if manifest is not None:
+        return partitions_dir(dataset_name).name, partition_meta(manifest)
+    return None
+
+
+def _concat_frames(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """按顺序合并多个分区的读取结果；各分区分类列的类别不同时取并集，保持分类类型。"""
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    for col in frames[0].columns:
+        dtypes = [frame[col].dtype for frame in frames if col in frame.columns]
+        if not all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+            continue
+        categories = list(
+            dict.fromkeys(value for dtype in dtypes for value in dtype.categories)
+        )
+        frames = [
+            (
+                frame.assign(**{col: frame[col].cat.set_categories(categories)})
+                if col in frame.columns
+                else frame
+            )
+            for frame in frames
+        ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _filter_rows(
+    df: pd.DataFrame,
+    start: Any,
+    end: Any,
+    stations: Iterable[int] | None,
+    time_column: str,
+    key_column: str,
+) -> pd.DataFrame:
+    """按 [start, end) 与站点集合筛选行；缺少所需列时返回空表。"""
+    if df.empty:
+        return df
+    mask = np.ones(len(df), dtype=bool)
+    if start is not None or end is not None:
+        if time_column not in df.columns:
+            return df.iloc[0:0]
+        times = df[time_column]
+        if not pd.api.types.is_datetime64_any_dtype(times):
+            times = pd.to_datetime(times, errors="coerce")
+        if start is not None:
+            mask &= (times >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            mask &= (times < pd.Timestamp(end)).to_numpy()
+    if stations is not None:
+        if key_column not in df.columns:
+            return df.iloc[0:0]
+        keys = pd.to_numeric(df[key_column], errors="coerce")
+        mask &= keys.isin([int(item) for item in stations]).to_numpy()
+    return df[mask]
+
+
+def _scan_plan(
+    dataset_name: str,
+    columns: Iterable[str] | None,
+    start: Any,
+    end: Any,
+    stations: Iterable[int] | None,
+) -> tuple[list[str], list[str] | None, str, str]:
+    """带筛选条件的读取计划：要读取的文件（分区或整表）、读取列与时间 / 站点列名。"""
+    layout = _partition_layout(dataset_name)
+    meta = layout[1] if layout is not None else {}
+    time_column = meta.get("time_column") or "timestamp"
+    key_column = meta.get("key_column") or "sp_id"
+    read_columns = None
+    if columns is not None:
+        read_columns = list(dict.fromkeys([*columns, time_column, key_column]))
+    if layout is None:
+        return [dataset_name], read_columns, time_column, key_column
+    directory = layout[0]
+    names = prune_time_partitions(meta, start, end, stations)
+    return (
+        [f"{directory}/{name}" for name in names],
+        read_columns,
+        time_column,
+        key_column,
+    )
+
+
+def load_cleaned_dataset(
+    dataset_name: str,
+    columns: Iterable[str] | None = None,
+    start: Any = None,
+    end: Any = None,
+    stations: Iterable[int] | None = None,
+) -> pd.DataFrame:
+    """读取清洗后的数据：优先 Parquet 列式文件，缺失时回退到 JSON。
+
+    指定 [start, end) 时间范围或站点集合时只返回匹配的行；数据集有按月时间分区
+    或来源文件分区时只读取相交的分区（行按分区顺序返回），否则读取整表后筛选。
+    """
+    if start is None and end is None and stations is None:
+        names = _table_files(dataset_name)
+        if names == [dataset_name]:
+            return _load_cleaned_file(dataset_name, columns)
+        return _concat_frames([_load_cleaned_file(name, columns) for name in names])
+
+    names, read_columns, time_column, key_column = _scan_plan(
+        dataset_name, columns, start, end, stations
+    )
+    frames = [
+        _filter_rows(
+            _load_cleaned_file(name, read_columns),
+            start,
+            end,
+            stations,
+            time_column,
+            key_column,
+        )
+        for name in names
+    ]
+    df = _concat_frames(frames)
+    if df.empty:
+        return df
+    selected = _select_columns(df.columns, columns)
+    return df if selected is None else df[selected]
+
+
+# 分块读取默认批行数
+DEFAULT_CHUNK_ROWS = 200_000
+
+
+def _timed_batches(
+    batches: Iterator[pd.DataFrame], file_path: Path
+) -> Iterator[pd.DataFrame]:
+    """把每批的读取耗时与文件大小计入当前步骤的读取指标。"""
+    metrics = current_step_metrics()
+    if metrics is not None:
+        metrics.bytes_read += file_path.stat().st_size
+    while True:
+        started = time.perf_counter()
+        batch = next(batches, None)
+        if metrics is not None:
+            metrics.load_seconds += time.perf_counter() - started
+        if batch is None:
+            return
+        yield batch
+
+
+def _iter_json_batches(
+    file_path: Path, columns: Iterable[str] | None, batch_size: int
+) -> Iterator[pd.DataFrame]:
+    """流式解析 JSON records 数组，按批构建 DataFrame。"""
+    records = (item for item in iter_json_array(file_path) if isinstance(item, dict))
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        df = pd.DataFrame(batch)
+        selected = _select_columns(df.columns, columns)
+        yield df if selected is None else df[selected]
+
+
+def _iter_parquet_batches(
+    file_path: Path, columns: Iterable[str] | None, batch_size: int
+) -> Iterator[pd.DataFrame]:
+    """按行批次流式读取 Parquet，只读取所需列。"""
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(file_path)
+    selected = _select_columns(parquet_file.schema_arrow.names, columns)
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=selected):
+        yield batch.to_pandas()
+
+
+def iter_cleaned_batches(
+    dataset_name: str,
+    columns: Iterable[str] | None = None,
+    batch_size: int = DEFAULT_CHUNK_ROWS,
+    start: Any = None,
+    end: Any = None,
+    stations: Iterable[int] | None = None,
+) -> Iterator[pd.DataFrame]:
+    """分批读取清洗后的数据（优先 Parquet，缺失时流式解析 JSON），内存只与批大小相关。
+
+    start / end / stations 的含义同 load_cleaned_dataset：有按月时间分区或来源文件
+    分区时只读取相交的分区，每批只保留匹配的行（筛选后为空的批不产出）。
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size 必须为正整数")
+    if start is None and end is None and stations is None:
+        for name in _table_files(dataset_name):
+            yield from _iter_cleaned_file_batches(name, columns, batch_size)
+        return
+
+    names, read_columns, time_column, key_column = _scan_plan(
+        dataset_name, columns, start, end, stations
+    )
+    for name in names:
+        for batch in _iter_cleaned_file_batches(name, read_columns, batch_size):
+            batch = _filter_rows(batch, start, end, stations, time_column, key_column)
+            if batch.empty:
+                continue
+            selected = _select_columns(batch.columns, columns)
+            yield batch if selected is None else batch[selected]
+
+
+def _iter_cleaned_file_batches(
+    dataset_name: str, columns: Iterable[str] | None, batch_size: int
+) -> Iterator[pd.DataFrame]:
+    """分批读取单个清洗结果文件。"""
+    parquet_path = CLEANED_DIR / f"{dataset_name}.parquet"
+    json_path = CLEANED_DIR / f"{dataset_name}.json"
+    if parquet_path.exists() and importlib.util.find_spec("pyarrow") is not None:
+        batches = _iter_parquet_batches(parquet_path, columns, batch_size)
+        yield from _timed_batches(batches, parquet_path)
+    elif json_path.exists():
+        batches = _iter_json_batches(json_path, columns, batch_size)
+        yield from _timed_batches(batches, json_path)
+
+
+def grid_metric_columns(df: pd.DataFrame, top: int | None = None) -> list[str]:
+    """宽表中至少有一个读数的监测指标列（非标识列的数值列）。
+
+    top 为 None 时返回全部指标，按名称排序；否则按读数条数降序取前 top 个
+    （条数相同按名称），保持条数顺序。
+    """
+    counts = pd.Series(
+        {
+            col: int(df[col].count())
+            for col in df.columns
+            if col not in ID_COLUMNS and is_numeric_dtype(df[col])
+        },
+        dtype="int64",
+    )
+    counts = counts[counts > 0].sort_index()
+    if top is None:
+        return counts.index.tolist()
+    return counts.sort_values(ascending=False, kind="stable").head(top).index.tolist()
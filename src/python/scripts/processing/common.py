@@ -2,19 +2,59 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import datetime
+from dataclasses import dataclass, field
 from pathlib import Path
-import json
-from typing import Any
+import sys
+from typing import Any, Iterable
 
+import numpy as np
 import pandas as pd
 
 
-# 目录定义：统一从 src/python 根目录推导
-PY_ROOT_DIR = Path(__file__).resolve().parents[2]
-CLEANED_DIR = PY_ROOT_DIR / "data_cleaned"
-PROCESSED_DIR = PY_ROOT_DIR / "data_processed"
+# 两个阶段共用的 shared 包位于 scripts 目录；直接运行本阶段脚本时需加入 sys.path。
+# 以下导入的目录、运行指标与构建清单工具由本阶段各脚本经 common 使用
+_SCRIPTS_ROOT = str(Path(__file__).resolve().parents[1])
+if _SCRIPTS_ROOT not in sys.path:
+    sys.path.insert(0, _SCRIPTS_ROOT)
+
+from shared.json_stream import iter_json_array
+from shared.layout import (
+    PARTITIONS_FILE,
+    STATION_INDEX_FILE,
+    load_partition_manifest,
+    load_station_index_meta,
+    load_time_partitions,
+    partitions_dir,
+    station_index_dir,
+    time_partitions_dir,
+)
+from shared.manifest import build_fingerprint, file_sha256
+from shared.manifest import code_version as _code_version
+from shared.manifest import load_build_manifest, save_build_manifest
+from shared.metrics import (
+    collect_step_metrics,
+    current_step_metrics,
+    record_load,
+    record_serialize,
+    timed_substep,
+)
+from shared.paths import CLEANED_DIR, PROCESSED_DIR, PY_ROOT_DIR, PY_ROOT_ENV
+
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+BUILD_MANIFEST_PATH = PROCESSED_DIR / "build_manifest.json"
+
+# 各步骤共用的本阶段模块：改动其中任一模块都会令全部步骤重建
+SUPPORT_MODULES = (
+    "common.py",
+    "chart_output.py",
+    "cleaned_data.py",
+    "lttb.py",
+    "partitions.py",
+    "payload_codec.py",
+    "running_stats.py",
+    "station_index.py",
+)
 
 
 @dataclass
@@ -25,6 +65,10 @@ class ProcessResult:
     rows_in: int
     rows_out: int
     json_path: str
+    rebuilt: bool = True
+    metrics: dict[str, Any] = field(default_factory=dict)
+    # 各输出文件字节数：{"json": ..., "gz": ..., "br": ...}（仅含实际写出的文件）
+    sizes: dict[str, int] = field(default_factory=dict)
 
 
 def ensure_processed_dir() -> None:
@@ -32,51 +76,51 @@ def ensure_processed_dir() -> None:
     PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def load_cleaned_json(dataset_name: str) -> pd.DataFrame:
-    """读取清洗后的 JSON 数据。"""
-    file_path = CLEANED_DIR / f"{dataset_name}.json"
-    if not file_path.exists():
-        return pd.DataFrame()
+def column_values(values: pd.Series, digits: int | None = None) -> list[Any]:
+    """把一列批量转换为 JSON 列表：整数列输出 int，其余输出 float，NaN/NA 统一为 None。
 
-    with file_path.open("r", encoding="utf-8") as f:
-        raw = json.load(f)
+    digits 指定时按内置 round 逐元素舍入（numpy 的乘除舍入在边界值上结果不同），
+    输出与逐行 round(float(v), digits) 一致。
+    """
+    if pd.api.types.is_integer_dtype(values) and not values.hasnans:
+        return values.astype("int64").tolist()
+    items = values.to_numpy(dtype=float, na_value=np.nan).tolist()
+    if digits is None:
+        return [None if item != item else item for item in items]
+    return [None if item != item else round(item, digits) for item in items]
 
-    if not isinstance(raw, list):
-        return pd.DataFrame()
 
-    records = [item for item in raw if isinstance(item, dict)]
-    return pd.DataFrame(records)
+def frame_series(frame: pd.DataFrame, digits: int | None = None) -> dict[str, list]:
+    """把已按 x 轴对齐的矩阵（行 = x 轴，列 = 系列）整体转换为 {系列名: 数值列表}。"""
+    return {str(col): column_values(frame[col], digits) for col in frame.columns}
 
 
-def save_processed_json(
-    dataset_name: str, payload: Any, rows_in: int, rows_out: int
-) -> ProcessResult:
-    """保存图表最终数据为 JSON。"""
-    ensure_processed_dir()
-    output_path = PROCESSED_DIR / f"{dataset_name}.json"
-
-    with output_path.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2, default=_json_default)
-
-    return ProcessResult(
-        dataset=dataset_name,
-        rows_in=int(rows_in),
-        rows_out=int(rows_out),
-        json_path=str(output_path),
-    )
-
-
-def _json_default(value: Any) -> Any:
-    """处理 datetime / pandas 时间戳序列化。"""
-    if isinstance(value, (datetime, pd.Timestamp)):
-        return value.isoformat()
-    return str(value)
+def frame_records(columns: dict[str, list[Any]]) -> list[dict[str, Any]]:
+    """把逐列转换好的等长列表按行拼成 [{字段: 值}, ...]，替代 iterrows。"""
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
 
 
 def to_numeric(df: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
-    """批量数值化列，避免后续统计报错。"""
-    copied = df.copy()
-    for col in columns:
-        if col in copied.columns:
-            copied[col] = pd.to_numeric(copied[col], errors="coerce")
-    return copied
+    """批量数值化列，避免后续统计报错。
+
+    已是数值类型（如 Parquet 读回的 Int64/float32）的列不做转换；只替换需转换
+    的列，其余列与原表共享数据，不整体复制（原表保持不变）。
+    """
+    converted = {
+        col: pd.to_numeric(df[col], errors="coerce")
+        for col in columns
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col])
+    }
+    if not converted:
+        return df
+
+    shallow = df.copy(deep=False)
+    for col, values in converted.items():
+        shallow[col] = values
+    return shallow
+
+
+def code_version(module_files: Iterable[str]) -> str:
+    """以脚本源码内容哈希作为代码版本（模块本身 + 本阶段共用模块 + shared 包）。"""
+    return _code_version(SCRIPTS_DIR, [*module_files, *SUPPORT_MODULES])
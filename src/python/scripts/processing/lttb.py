@@ -0,0 +1,42 @@
+"""时序降采样：Largest-Triangle-Three-Buckets（LTTB）。"""
+
+from __future__ import annotations
+
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets 降采样，返回保留点的下标（含首尾点）。
+
+    x 需升序；点数不超过 threshold（或 threshold < 3）时返回全部下标。每个桶内
+    选取与前一个保留点、下一个桶均值所成三角形面积最大的点，保留峰谷形状。
+    """
+    count = len(x)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    every = (count - 2) / (threshold - 2)
+    # 第 i 个桶为 [edges[i], edges[i + 1])；末点单独成桶
+    edges = np.minimum((np.arange(threshold - 1) * every).astype(np.int64) + 1, count)
+    edges[-1] = count - 1
+    bounds = np.append(edges, count)
+    # 各桶均值与已选点无关，可一次算出（reduceat 按桶起点分段求和）
+    sizes = np.diff(bounds)
+    avg_x = np.add.reduceat(x, bounds[:-1]) / sizes
+    avg_y = np.add.reduceat(y, bounds[:-1]) / sizes
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, count - 1
+    previous = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        px, py = x[previous], y[previous]
+        area = np.abs(
+            (px - avg_x[i + 1]) * (y[lo:hi] - py)
+            - (px - x[lo:hi]) * (avg_y[i + 1] - py)
+        )
+        previous = lo + int(area.argmax())
+        selected[i + 1] = previous
+    return selected
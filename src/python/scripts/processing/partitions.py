@@ -0,0 +1,75 @@
+"""预处理写出的分区：按时间范围与站点剪枝，按来源文件分区的读取。
+
+目录布局与元数据读取（load_time_partitions / load_partition_manifest）见
+shared/layout.py，经 common 导入。按月分区与按来源文件分区的记录都带有
+name / start / end / stations，共用同一剪枝逻辑。
+"""
+
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+import pandas as pd
+
+from common import partitions_dir, record_load
+
+
+# ---------------------------------------------------------------------------
+# 按时间范围与站点集合剪枝（按月分区与按来源文件分区通用）
+# ---------------------------------------------------------------------------
+
+
+def prune_time_partitions(
+    meta: dict[str, Any],
+    start: Any = None,
+    end: Any = None,
+    stations: Iterable[int] | None = None,
+) -> list[str]:
+    """与 [start, end) 时间范围及站点集合相交的分区名，按 meta["partitions"] 的顺序。
+
+    带时间条件时跳过没有有效时间的分区（如 undated）；元数据没有站点列时不按站点剪枝。
+    """
+    start_ts = None if start is None else pd.Timestamp(start)
+    end_ts = None if end is None else pd.Timestamp(end)
+    wanted = None if stations is None else {int(item) for item in stations}
+    names = []
+    for part in meta["partitions"]:
+        if part.get("start") is None:
+            if start_ts is not None or end_ts is not None:
+                continue
+        else:
+            if start_ts is not None and pd.Timestamp(part["end"]) < start_ts:
+                continue
+            if end_ts is not None and pd.Timestamp(part["start"]) >= end_ts:
+                continue
+        if (
+            wanted is not None
+            and meta.get("key_column")
+            and not wanted.intersection(part.get("stations", []))
+        ):
+            continue
+        names.append(part["name"])
+    return names
+
+
+# ---------------------------------------------------------------------------
+# 按来源文件分区的清洗结果（预处理增量模式写出）
+# ---------------------------------------------------------------------------
+
+
+def ordered_partitions(manifest: dict[str, Any]) -> list[dict[str, Any]]:
+    """分区清单中的分区记录，按来源文件名排序（即全量清洗时的合并顺序）。"""
+    files = manifest["files"]
+    return [files[name] for name in sorted(files)]
+
+
+def partition_meta(manifest: dict[str, Any]) -> dict[str, Any]:
+    """把分区清单转成与按月分区元数据相同的结构，供 prune_time_partitions 使用。"""
+    return {**manifest, "partitions": ordered_partitions(manifest)}
+
+
+def load_cleaned_partition(dataset_name: str, record: dict[str, Any]) -> pd.DataFrame:
+    """读取单个来源文件的清洗分区（Parquet，dtype 与全量清洗结果一致）。"""
+    path = partitions_dir(dataset_name) / record["file"]
+    with record_load(path):
+        return pd.read_parquet(path, engine="pyarrow")
@@ -0,0 +1,231 @@
+"""图表数据 v2：统一信封与时序图表的列式编码。
+
+v2 模式下每个图表文件都包在信封中（v1 文件即图表数据本身，没有信封）：
+  {"format": 2, "encoding": "columnar" | "plain", "payload": 图表数据}
+encoding 为 plain 时 payload 为原图表数据；为 columnar 时其中的时序字段改为
+  "xAxis": {"type": "date", "start": "2021-01-01", "step": 1, "count": N}
+           （不等间隔时以 "deltas" 给出 int32 天数差分），
+  "series": {名称: {"dtype": "int16", "digits": 4, "count": N,
+                    "data": base64 小端数组, "nulls": base64 空值位图}}
+dtype 为 int16 / int32 时 data 为值乘以 10**digits 后的整数；放不下时用
+float32（按 digits 舍入可还原时）或 float64。其余字段原样保留。
+"""
+
+from __future__ import annotations
+
+import base64
+import re
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+
+# 信封中的格式版本；decode_payload 只解开该版本的信封
+PAYLOAD_FORMAT = 2
+_ENVELOPE_KEYS = {"format", "encoding", "payload"}
+
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+# 序列数组类型 -> 小端 numpy dtype；int16 / int32 为按 10**digits 缩放后的整数
+_SERIES_DTYPES = {"int16": "<i2", "int32": "<i4", "float32": "<f4", "float64": "<f8"}
+
+# 点数少于此值的图表仍按 v1 输出：base64 与字段头开销超过列式编码的收益
+SERIES_MIN_POINTS = 256
+
+# 推断数值小数位时尝试的最大位数，超过则按 float64 原值保存
+_MAX_SERIES_DIGITS = 6
+
+
+def _b64(array: np.ndarray) -> str:
+    """数组按小端字节序 base64 编码。"""
+    return base64.b64encode(array.tobytes()).decode("ascii")
+
+
+def _unb64(text: str, dtype: str) -> np.ndarray:
+    """_b64 的逆操作。"""
+    return np.frombuffer(base64.b64decode(text), dtype=dtype)
+
+
+def _encode_axis(values: list[Any]) -> dict[str, Any]:
+    """编码 x 轴：ISO 日期或整数等间隔时只存起点、步长与个数，日期不等间隔时存差分。"""
+    count = len(values)
+    if count and all(isinstance(v, str) and _ISO_DATE.match(v) for v in values):
+        days = pd.to_datetime(pd.Series(values), format="%Y-%m-%d", errors="coerce")
+        if days.notna().all():
+            ordinal = days.to_numpy().astype("datetime64[D]").astype(np.int64)
+            deltas = np.diff(ordinal)
+            axis = {"type": "date", "start": values[0], "count": count}
+            if not len(deltas) or (deltas == deltas[0]).all():
+                axis["step"] = int(deltas[0]) if len(deltas) else 1
+            elif np.abs(deltas).max() < 2**31:
+                axis["deltas"] = _b64(deltas.astype("<i4"))
+            else:
+                return {"type": "values", "values": values}
+            return axis
+    if count and all(type(v) is int for v in values):
+        deltas = np.diff(np.asarray(values, dtype=np.int64))
+        if not len(deltas) or (deltas == deltas[0]).all():
+            step = int(deltas[0]) if len(deltas) else 1
+            return {"type": "number", "start": values[0], "step": step, "count": count}
+    return {"type": "values", "values": values}
+
+
+def _decode_axis(axis: dict[str, Any]) -> list[Any]:
+    """_encode_axis 的逆操作。"""
+    if axis["type"] == "values":
+        return axis["values"]
+    count = axis["count"]
+    if axis["type"] == "number":
+        return [axis["start"] + axis["step"] * i for i in range(count)]
+    start = np.datetime64(axis["start"], "D")
+    if "deltas" in axis:
+        offsets = np.concatenate([[0], np.cumsum(_unb64(axis["deltas"], "<i4"))])
+    else:
+        offsets = np.arange(count) * axis["step"]
+    return [str(day) for day in start + offsets.astype("timedelta64[D]")]
+
+
+def _series_digits(values: np.ndarray) -> int | None:
+    """推断数值已舍入到的小数位数；无法在 _MAX_SERIES_DIGITS 位内表示时返回 None。"""
+    for digits in range(_MAX_SERIES_DIGITS + 1):
+        if np.array_equal(np.round(values, digits), values):
+            return digits
+    return None
+
+
+def _encode_column(values: list[Any]) -> dict[str, Any] | None:
+    """数值列编码为类型化数组 + 空值位图；含非数值内容时返回 None（整体退回 v1）。"""
+    if not all(v is None or type(v) in (int, float) for v in values):
+        return None
+    nulls = np.array([v is None for v in values], dtype=bool)
+    array = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    valid = array[~nulls]
+    if not np.isfinite(valid).all():
+        return None
+
+    column: dict[str, Any] = {"count": len(values)}
+    digits = _series_digits(valid)
+    if digits is not None:
+        column["digits"] = digits
+        # 已舍入到 digits 位的值按 10**digits 缩放为整数，能放进 int16/int32 时优先
+        scaled = np.round(array * 10**digits)
+        scaled_valid = scaled[~nulls]
+        for dtype, info in (
+            ("int16", np.iinfo(np.int16)),
+            ("int32", np.iinfo(np.int32)),
+        ):
+            if not len(scaled_valid) or (
+                scaled_valid.min() >= info.min and scaled_valid.max() <= info.max
+            ):
+                column["dtype"] = dtype
+                data = np.where(nulls, 0, scaled).astype(_SERIES_DTYPES[dtype])
+                break
+        else:
+            # float32 读回后按 digits 舍入能还原原值时用 float32，体积减半
+            narrow = valid.astype(np.float32).astype(np.float64)
+            column["dtype"] = (
+                "float32"
+                if np.array_equal(np.round(narrow, digits), valid)
+                else "float64"
+            )
+            data = array.astype(_SERIES_DTYPES[column["dtype"]])
+    else:
+        column["dtype"] = "float64"
+        data = array.astype(_SERIES_DTYPES["float64"])
+    column["data"] = _b64(data)
+    if nulls.any():
+        column["nulls"] = _b64(np.packbits(nulls, bitorder="little"))
+    return column
+
+
+def _decode_column(column: dict[str, Any]) -> list[Any]:
+    """_encode_column 的逆操作：还原为带 None 的数值列表。"""
+    values = _unb64(column["data"], _SERIES_DTYPES[column["dtype"]]).astype(np.float64)
+    digits = column.get("digits")
+    if column["dtype"] in ("int16", "int32"):
+        values = values / 10**digits
+    if digits is not None:
+        values = np.round(values, digits)
+    items: list[Any] = values.tolist()
+    if digits == 0:
+        items = [int(v) for v in items]
+    if "nulls" in column:
+        bitmap = np.unpackbits(
+            _unb64(column["nulls"], "u1"), count=column["count"], bitorder="little"
+        )
+        items = [None if null else v for v, null in zip(items, bitmap)]
+    return items
+
+
+def _encode_series(payload: Any, min_points: int) -> dict[str, Any] | None:
+    """把 {"xAxis": [...], "series": {名称: [...]}} 形式的时序图表转为列式编码。
+
+    结构不符（缺少字段、列长度与 x 轴不一致或含非数值内容）或点数少于
+    min_points 时返回 None。
+    """
+    if not isinstance(payload, dict):
+        return None
+    x_axis, series = payload.get("xAxis"), payload.get("series")
+    if not isinstance(x_axis, list) or not isinstance(series, dict):
+        return None
+    if len(x_axis) < min_points:
+        return None
+    if not all(isinstance(v, list) and len(v) == len(x_axis) for v in series.values()):
+        return None
+
+    columns = {}
+    for name, values in series.items():
+        column = _encode_column(values)
+        if column is None:
+            return None
+        columns[name] = column
+    encoded = {}
+    for key, value in payload.items():
+        if key == "xAxis":
+            value = _encode_axis(x_axis)
+        elif key == "series":
+            value = columns
+        encoded[key] = value
+    return encoded
+
+
+def _decode_series(payload: dict[str, Any]) -> dict[str, Any]:
+    """_encode_series 的逆操作。"""
+    decoded = {}
+    for key, value in payload.items():
+        if key == "xAxis":
+            value = _decode_axis(value)
+        elif key == "series":
+            value = {name: _decode_column(column) for name, column in value.items()}
+        decoded[key] = value
+    return decoded
+
+
+def encode_payload(payload: Any, min_points: int = SERIES_MIN_POINTS) -> dict[str, Any]:
+    """把图表数据包成 v2 信封；时序图表（点数不少于 min_points）改用列式编码。"""
+    encoded = _encode_series(payload, min_points)
+    if encoded is None:
+        return {"format": PAYLOAD_FORMAT, "encoding": "plain", "payload": payload}
+    return {"format": PAYLOAD_FORMAT, "encoding": "columnar", "payload": encoded}
+
+
+def is_payload_envelope(document: Any) -> bool:
+    """是否为 encode_payload 写出的 v2 信封。"""
+    return (
+        isinstance(document, dict)
+        and set(document) == _ENVELOPE_KEYS
+        and document["format"] == PAYLOAD_FORMAT
+    )
+
+
+def decode_payload(document: Any) -> Any:
+    """encode_payload 的逆操作，还原为 v1 图表数据；v1 文件（没有信封）原样返回。"""
+    if not is_payload_envelope(document):
+        return document
+    encoding = document["encoding"]
+    if encoding == "plain":
+        return document["payload"]
+    if encoding == "columnar":
+        return _decode_series(document["payload"])
+    raise ValueError(f"未知的图表数据编码: {encoding}")
@@ -4,12 +4,14 @@ from __future__ import annotations
 
 import pandas as pd
 
-from common import ProcessResult, load_cleaned_json, save_processed_json, to_numeric
+from chart_output import save_processed_json
+from cleaned_data import load_cleaned_dataset
+from common import ProcessResult, to_numeric
 
 
 def process_air_quality_charts() -> list[ProcessResult]:
     """生成空气优良天数相关图表最终数据。"""
-    df = load_cleaned_json("air_quality_good_days")
+    df = load_cleaned_dataset("air_quality_good_days")
     if df.empty:
         return []
 
@@ -111,7 +113,8 @@ def process_air_quality_charts() -> list[ProcessResult]:
     quality = {
         "rows": int(len(df)),
         "invalid_month_rows": (
-            int((~df["month"].between(1, 12, inclusive="both")).sum())
+            # Parquet 读回的 month 为可空整数，缺失值同样计为无效月份
+            int((~df["month"].between(1, 12, inclusive="both").fillna(False)).sum())
             if "month" in df.columns
             else 0
         ),
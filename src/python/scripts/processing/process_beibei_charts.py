@@ -1,36 +1,67 @@
-"""北碚年度气象：图表最终数据二次处理。"""
+"""区县年度气象：图表最终数据二次处理（全市汇总与分区县）。"""
 
 from __future__ import annotations
 
 import math
 import pandas as pd
 
-from common import ProcessResult, load_cleaned_json, save_processed_json, to_numeric
+from chart_output import save_processed_json
+from cleaned_data import load_cleaned_dataset
+from common import ProcessResult, to_numeric
+
+
+NUMERIC_COLUMNS = ["nf", "pjqw", "jsl", "pjxdsd", "pjqy", "pjfs", "rzss", "wsq"]
+# 趋势图系列名与字段
+TREND_SERIES = {
+    "avg_temp": "pjqw",
+    "rainfall": "jsl",
+    "humidity": "pjxdsd",
+    "pressure": "pjqy",
+}
+CORR_COLUMNS = ["pjqw", "jsl", "pjxdsd", "pjqy", "pjfs", "rzss", "wsq"]
+EXTREME_METRICS = ["pjqw", "jsl", "rzss", "pjxdsd"]
 
 
 def process_beibei_yearly_charts() -> list[ProcessResult]:
-    """生成北碚年度气象相关图表所需最终数据。"""
-    df = load_cleaned_json("beibei_yearly_weather")
+    """生成区县年度气象相关图表所需最终数据。
+
+    chart_yearly_* 与 chart_correlation_matrix 为跨区县汇总（年度取各区县均值，
+    相关矩阵基于全部区县年份），只有一个区县时即为该区县本身；
+    chart_district_* 为各区县的趋势、极值与相关矩阵，均由分组运算一次得出。
+    """
+    df = load_cleaned_dataset("beibei_yearly_weather")
     if df.empty:
         return []
 
     # 关键字段转数值
-    df = to_numeric(df, ["nf", "pjqw", "jsl", "pjxdsd", "pjqy", "pjfs", "rzss", "wsq"])
+    df = to_numeric(df, NUMERIC_COLUMNS)
     df = df[df["nf"].notna()].copy() if "nf" in df.columns else df.copy()
     df = df.sort_values(by=["nf"], kind="stable")
 
     results: list[ProcessResult] = []
+    trend_cols = [col for col in TREND_SERIES.values() if col in df.columns]
+    corr_cols = [col for col in CORR_COLUMNS if col in df.columns]
+    has_districts = "district" in df.columns and "nf" in df.columns
+
+    # 跨区县年度均值（单区县时与原始序列一致）
+    value_cols = list(dict.fromkeys(trend_cols + EXTREME_METRICS))
+    value_cols = [col for col in value_cols if col in df.columns]
+    yearly = (
+        df.groupby("nf", sort=True)[value_cols].mean().reset_index()
+        if "nf" in df.columns
+        else df[value_cols]
+    )
 
     # 1) 年度趋势：温度、降水、湿度、气压
     trend_payload = {
         "xAxis": (
-            df["nf"].astype("Int64").astype(str).tolist() if "nf" in df.columns else []
+            yearly["nf"].astype("Int64").astype(str).tolist()
+            if "nf" in yearly.columns
+            else []
         ),
         "series": {
-            "avg_temp": _round_list(df.get("pjqw")),
-            "rainfall": _round_list(df.get("jsl")),
-            "humidity": _round_list(df.get("pjxdsd")),
-            "pressure": _round_list(df.get("pjqy")),
+            name: _round_list(yearly.get(column))
+            for name, column in TREND_SERIES.items()
         },
     }
     results.append(
@@ -43,21 +74,12 @@ def process_beibei_yearly_charts() -> list[ProcessResult]:
     )
 
     # 2) 相关矩阵：支持热力图
-    corr_cols = [
-        col
-        for col in ["pjqw", "jsl", "pjxdsd", "pjqy", "pjfs", "rzss", "wsq"]
-        if col in df.columns
-    ]
     corr_df = (
         df[corr_cols].corr(numeric_only=True).fillna(0) if corr_cols else pd.DataFrame()
     )
     matrix_payload = {
         "metrics": corr_df.columns.tolist(),
-        "matrix": (
-            [[round(float(v), 4) for v in row] for row in corr_df.values.tolist()]
-            if not corr_df.empty
-            else []
-        ),
+        "matrix": _round_matrix(corr_df),
     }
     results.append(
         save_processed_json(
@@ -69,37 +91,174 @@ def process_beibei_yearly_charts() -> list[ProcessResult]:
     )
 
     # 3) 极值年份：用于条形图/标签卡片
-    extremes = []
-    for metric in ["pjqw", "jsl", "rzss", "pjxdsd"]:
-        if metric not in df.columns:
-            continue
-        metric_df = df[["nf", metric]].dropna()
-        if metric_df.empty:
-            continue
-        max_row = metric_df.loc[metric_df[metric].idxmax()]
-        min_row = metric_df.loc[metric_df[metric].idxmin()]
-        extremes.append(
+    extremes = (
+        _extreme_items(yearly, by=[]) if "nf" in yearly.columns else pd.DataFrame()
+    )
+    extreme_items = _extreme_records(extremes, by=[])
+    results.append(
+        save_processed_json(
+            dataset_name="chart_yearly_extremes",
+            payload={"items": extreme_items},
+            rows_in=len(df),
+            rows_out=len(extreme_items),
+        )
+    )
+
+    if has_districts:
+        results.extend(_district_charts(df, trend_cols, corr_cols))
+    return results
+
+
+def _district_charts(
+    df: pd.DataFrame, trend_cols: list[str], corr_cols: list[str]
+) -> list[ProcessResult]:
+    """分区县的趋势、极值与相关矩阵；区县按数据中首次出现的顺序排列。"""
+    districts = [str(name) for name in pd.unique(df["district"].dropna())]
+    df = df[df["district"].notna()].astype({"district": object})
+    years = sorted(int(year) for year in pd.unique(df["nf"]))
+    results: list[ProcessResult] = []
+
+    # 1) 各区县年度趋势：按 (区县, 年份) 分组后展开为 年份 x (字段, 区县)
+    by_district = (
+        df.groupby(["nf", "district"], sort=False)[trend_cols]
+        .mean()
+        .unstack("district")
+        .reindex(years)
+    )
+    trend_payload = {
+        "xAxis": [str(year) for year in years],
+        "items": [
             {
-                "metric": metric,
-                "max_year": int(max_row["nf"]),
-                "max_value": round(float(max_row[metric]), 3),
-                "min_year": int(min_row["nf"]),
-                "min_value": round(float(min_row[metric]), 3),
+                "district": district,
+                "series": {
+                    name: _round_list(
+                        by_district[(column, district)]
+                        if (column, district) in by_district.columns
+                        else None
+                    )
+                    for name, column in TREND_SERIES.items()
+                    if column in trend_cols
+                },
             }
+            for district in districts
+        ],
+    }
+    results.append(
+        save_processed_json(
+            dataset_name="chart_district_yearly_trends",
+            payload=trend_payload,
+            rows_in=len(df),
+            rows_out=len(districts),
         )
+    )
 
+    # 2) 各区县相关矩阵：一次分组求相关
+    district_corr = (
+        df[["district", *corr_cols]]
+        .astype({col: "float64" for col in corr_cols})
+        .groupby("district", sort=False)
+        .corr()
+        .fillna(0)
+        if corr_cols
+        else pd.DataFrame()
+    )
+    corr_payload = {
+        "metrics": corr_cols,
+        "items": [
+            {
+                "district": district,
+                "matrix": _round_matrix(
+                    district_corr.xs(district, level="district")
+                    if not district_corr.empty
+                    else pd.DataFrame()
+                ),
+            }
+            for district in districts
+        ],
+    }
     results.append(
         save_processed_json(
-            dataset_name="chart_yearly_extremes",
-            payload={"items": extremes},
+            dataset_name="chart_district_correlation",
+            payload=corr_payload,
             rows_in=len(df),
-            rows_out=len(extremes),
+            rows_out=len(districts),
         )
     )
 
+    # 3) 各区县极值年份
+    extreme_items = _extreme_records(
+        _extreme_items(df, by=["district"], order=districts), by=["district"]
+    )
+    results.append(
+        save_processed_json(
+            dataset_name="chart_district_extremes",
+            payload={"items": extreme_items},
+            rows_in=len(df),
+            rows_out=len(extreme_items),
+        )
+    )
     return results
 
 
+def _extreme_items(
+    df: pd.DataFrame, by: list[str], order: list[str] | None = None
+) -> pd.DataFrame:
+    """按 by 与指标分组求最大 / 最小值所在年份（并列取最早出现的行）。"""
+    metrics = [metric for metric in EXTREME_METRICS if metric in df.columns]
+    if not metrics or df.empty:
+        return pd.DataFrame()
+
+    long_df = df.melt(id_vars=[*by, "nf"], value_vars=metrics, var_name="metric")
+    long_df["value"] = pd.to_numeric(long_df["value"], errors="coerce").astype(
+        "float64"
+    )
+    long_df = long_df[long_df["value"].notna()]
+    if long_df.empty:
+        return pd.DataFrame()
+    # 分组顺序：区县按给定顺序，指标按 EXTREME_METRICS 顺序
+    long_df["metric"] = pd.Categorical(long_df["metric"], categories=metrics)
+    if order is not None:
+        long_df[by[0]] = pd.Categorical(long_df[by[0]], categories=order)
+
+    values = long_df.groupby([*by, "metric"], observed=True, sort=True)["value"]
+    max_rows = long_df.loc[values.idxmax()].reset_index(drop=True)
+    min_rows = long_df.loc[values.idxmin()].reset_index(drop=True)
+    return pd.DataFrame(
+        {
+            **{key: max_rows[key].astype(object) for key in by},
+            "metric": max_rows["metric"].astype(object),
+            "max_year": max_rows["nf"].to_numpy(),
+            "max_value": max_rows["value"].to_numpy(),
+            "min_year": min_rows["nf"].to_numpy(),
+            "min_value": min_rows["value"].to_numpy(),
+        }
+    )
+
+
+def _extreme_records(extremes: pd.DataFrame, by: list[str]) -> list[dict]:
+    """极值表转为图表记录。"""
+    if extremes.empty:
+        return []
+    return [
+        {
+            **{key: str(row[key]) for key in by},
+            "metric": str(row["metric"]),
+            "max_year": int(row["max_year"]),
+            "max_value": round(float(row["max_value"]), 3),
+            "min_year": int(row["min_year"]),
+            "min_value": round(float(row["min_value"]), 3),
+        }
+        for row in extremes.to_dict("records")
+    ]
+
+
+def _round_matrix(corr_df: pd.DataFrame) -> list[list[float]]:
+    """相关矩阵保留 4 位小数。"""
+    if corr_df.empty:
+        return []
+    return [[round(float(v), 4) for v in row] for row in corr_df.values.tolist()]
+
+
 def _round_list(series: pd.Series | None) -> list[float | None]:
     """数值序列统一保留 3 位小数。"""
     if series is None:
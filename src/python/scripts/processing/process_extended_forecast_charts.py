@@ -5,15 +5,27 @@ from __future__ import annotations
 import re
 import pandas as pd
 
-from common import ProcessResult, load_cleaned_json, save_processed_json, to_numeric
+from chart_output import save_processed_json
+from cleaned_data import load_cleaned_dataset
+from common import ProcessResult, frame_series, to_numeric
 
 
+# 时序图系列（rain_avg 输出为 rain_avg_mm）
+TIMELINE_SERIES = [
+    "temp_min",
+    "temp_max",
+    "temp_avg",
+    "rain_min_mm",
+    "rain_max_mm",
+    "rain_avg",
+]
+
 WEATHER_TAGS = ["小雨", "中雨", "大雨", "暴雨", "降温", "高温", "雨夹雪", "小雪"]
 
 
 def process_extended_forecast_charts() -> list[ProcessResult]:
     """生成延伸期预报相关图表最终数据。"""
-    df = load_cleaned_json("extended_forecast")
+    df = load_cleaned_dataset("extended_forecast")
     if df.empty:
         return []
 
@@ -37,32 +49,11 @@ def process_extended_forecast_charts() -> list[ProcessResult]:
             d.date().isoformat() if pd.notna(d) else ""
             for d in timeline_df["publish_date"].tolist()
         ],
-        "series": {
-            "temp_min": timeline_df["temp_min"]
-            .round(3)
-            .where(pd.notna(timeline_df["temp_min"]), None)
-            .tolist(),
-            "temp_max": timeline_df["temp_max"]
-            .round(3)
-            .where(pd.notna(timeline_df["temp_max"]), None)
-            .tolist(),
-            "temp_avg": timeline_df["temp_avg"]
-            .round(3)
-            .where(pd.notna(timeline_df["temp_avg"]), None)
-            .tolist(),
-            "rain_min_mm": timeline_df["rain_min_mm"]
-            .round(3)
-            .where(pd.notna(timeline_df["rain_min_mm"]), None)
-            .tolist(),
-            "rain_max_mm": timeline_df["rain_max_mm"]
-            .round(3)
-            .where(pd.notna(timeline_df["rain_max_mm"]), None)
-            .tolist(),
-            "rain_avg_mm": timeline_df["rain_avg"]
-            .round(3)
-            .where(pd.notna(timeline_df["rain_avg"]), None)
-            .tolist(),
-        },
+        # 整表一次转换，缺测统一写为 null
+        "series": frame_series(
+            timeline_df[TIMELINE_SERIES].rename(columns={"rain_avg": "rain_avg_mm"}),
+            3,
+        ),
     }
     results.append(
         save_processed_json(
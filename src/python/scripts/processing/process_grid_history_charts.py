@@ -2,133 +2,484 @@
 
 from __future__ import annotations
 
+from dataclasses import dataclass, field
+from pathlib import Path
+import json
+import shutil
+from typing import Any
+import zipfile
+
+import numpy as np
 import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_numeric_dtype
 
-from common import ProcessResult, load_cleaned_json, save_processed_json
+from chart_output import save_processed_json
+from cleaned_data import (
+    DATASET_WIDE,
+    DEFAULT_CHUNK_ROWS,
+    ID_COLUMNS,
+    grid_metric_columns,
+    iter_cleaned_batches,
+    load_cleaned_dataset,
+)
+from common import (
+    PROCESSED_DIR,
+    ProcessResult,
+    code_version,
+    column_values,
+    frame_records,
+    frame_series,
+    load_partition_manifest,
+    timed_substep,
+)
+from partitions import load_cleaned_partition, ordered_partitions
+from running_stats import RunningStats
 
 
-def process_grid_history_charts() -> list[ProcessResult]:
-    """生成网格历史相关图表最终数据。"""
-    wide_df = load_cleaned_json("grid_history_wide")
-    long_df = load_cleaned_json("grid_history_long")
-    if wide_df.empty and long_df.empty:
-        return []
+# 分块模式下无需读取的列
+SKIPPED_COLUMNS = {"recv_time", "source_file"}
+
+TOP_METRICS = 5
+TOP_STATIONS = 20
+
+# 增量模式下各来源文件分区的累计量缓存：每个分区一个 .npz（子目录，不会被导库读取）
+STATE_DIR = PROCESSED_DIR / "grid_history_charts_state"
+# 缓存格式版本：累计量结构或编码变化时递增，旧版本缓存视为失效
+STATE_VERSION = 1
+
+
+def _parse_timestamps(timestamps: pd.Series | None) -> pd.Series | None:
+    """JSON 读回的是字符串需转换；Parquet 已保留 dtype，直接跳过。"""
+    if timestamps is not None and not is_datetime64_any_dtype(timestamps):
+        return pd.to_datetime(timestamps, errors="coerce")
+    return timestamps
+
+
+def _numeric_sp_id(sp_id: pd.Series) -> pd.Series:
+    """非空的数值化站点 ID；紧凑模式下 sp_id 已是最小整数类型，直接复用不再转换。"""
+    if not is_numeric_dtype(sp_id):
+        sp_id = pd.to_numeric(sp_id, errors="coerce")
+    return sp_id[sp_id.notna()]
+
+
+def _top_metrics(stats_df: pd.DataFrame) -> list[str]:
+    """按读数条数取 Top 指标。"""
+    return (
+        stats_df["count"].sort_values(ascending=False).head(TOP_METRICS).index.tolist()
+    )
+
 
+def _save_results(
+    stats_df: pd.DataFrame,
+    trend_group: pd.DataFrame | None,
+    top_metrics: list[str],
+    station_counts: pd.DataFrame | None,
+    rows_in: int,
+    station_rows_in: int,
+) -> list[ProcessResult]:
+    """由聚合结果生成并保存三类图表数据；整表与分块两种计算方式共用。"""
     results: list[ProcessResult] = []
 
-    # 优先使用长表，图表复用性更高
-    if not long_df.empty:
-        if "timestamp" in long_df.columns:
-            long_df["timestamp"] = pd.to_datetime(long_df["timestamp"], errors="coerce")
-        if "value" in long_df.columns:
-            long_df["value"] = pd.to_numeric(long_df["value"], errors="coerce")
-
-        # 1) 指标统计：用于箱线图、排行图
-        # 使用显式命名聚合，避免 pandas 不同版本返回多重列名导致的列数不匹配
-        stats_df = (
-            long_df.dropna(subset=["metric", "value"])
-            .groupby("metric", as_index=False)
-            .agg(
-                count=("value", "count"),
-                mean=("value", "mean"),
-                min=("value", "min"),
-                max=("value", "max"),
-                std=("value", "std"),
-            )
-        )
+    # 1) 指标统计：用于箱线图、排行图
+    if not stats_df.empty:
         stats_payload = {
-            "items": [
+            "items": frame_records(
                 {
-                    "metric": str(row["metric"]),
-                    "count": int(row["count"]),
-                    "mean": round(float(row["mean"]), 4),
-                    "min": round(float(row["min"]), 4),
-                    "max": round(float(row["max"]), 4),
-                    "std": (
-                        round(float(row["std"]), 4) if pd.notna(row["std"]) else None
-                    ),
+                    "metric": [str(metric) for metric in stats_df.index],
+                    "count": column_values(stats_df["count"].astype("int64")),
+                    "mean": column_values(stats_df["mean"], 4),
+                    "min": column_values(stats_df["min"], 4),
+                    "max": column_values(stats_df["max"], 4),
+                    "std": column_values(stats_df["std"], 4),
                 }
-                for _, row in stats_df.iterrows()
-            ]
+            )
         }
         results.append(
             save_processed_json(
                 dataset_name="chart_grid_metric_stats",
                 payload=stats_payload,
-                rows_in=len(long_df),
+                rows_in=rows_in,
                 rows_out=len(stats_payload["items"]),
             )
         )
 
-        # 2) 指标时序（Top5 指标）
-        if "timestamp" in long_df.columns and long_df["timestamp"].notna().any():
-            metric_counts = (
-                long_df.dropna(subset=["metric"])
-                .groupby("metric")
-                .size()
-                .sort_values(ascending=False)
+    # 2) 指标时序（Top5 指标）
+    if trend_group is not None:
+        x_axis = [str(day) for day in trend_group.index]
+        series = frame_series(trend_group[top_metrics], 4)
+
+        trend_payload = {"xAxis": x_axis, "series": series}
+        results.append(
+            save_processed_json(
+                dataset_name="chart_grid_metric_trends",
+                payload=trend_payload,
+                rows_in=rows_in,
+                rows_out=len(x_axis),
+            )
+        )
+
+    # 3) 站点概览（若存在 sp_id）
+    if station_counts is not None and not station_counts.empty:
+        items = station_counts.sort_values(by=["records"], ascending=False).head(
+            TOP_STATIONS
+        )
+        payload = {
+            "items": frame_records(
+                {
+                    "sp_id": column_values(items["sp_id"].astype("int64")),
+                    "records": column_values(items["records"].astype("int64")),
+                }
+            )
+        }
+        results.append(
+            save_processed_json(
+                dataset_name="chart_grid_station_overview",
+                payload=payload,
+                rows_in=station_rows_in,
+                rows_out=len(payload["items"]),
             )
-            top_metrics = metric_counts.head(5).index.tolist()
-
-            trend_df = long_df[
-                long_df["metric"].isin(top_metrics)
-                & long_df["timestamp"].notna()
-                & long_df["value"].notna()
-            ].copy()
-            trend_df["date"] = trend_df["timestamp"].dt.date
+        )
+
+    return results
+
+
+def _process_in_memory() -> list[ProcessResult]:
+    """整表读入宽表后聚合。"""
+    # 统计与时序直接在宽表指标列上聚合，无需读取或展开长表
+    wide_df = load_cleaned_dataset(DATASET_WIDE)
+    if wide_df.empty:
+        return []
+
+    metrics = grid_metric_columns(wide_df)
+    values = wide_df[metrics]
+    # 长表行数 = 各指标非空读数之和
+    rows_in = int(values.count().sum())
+
+    stats_df = pd.DataFrame(
+        {
+            "count": values.count(),
+            "mean": values.mean(),
+            "min": values.min(),
+            "max": values.max(),
+            "std": values.std(),
+        }
+    )
+
+    trend_group = None
+    top_metrics: list[str] = []
+    timestamps = _parse_timestamps(wide_df.get("timestamp"))
+    if metrics and timestamps is not None and timestamps.notna().any():
+        top_metrics = _top_metrics(stats_df)
+        valid = timestamps.notna()
+        with timed_substep("trend_pivot"):
             trend_group = (
-                trend_df.groupby(["date", "metric"], as_index=False)["value"]
+                values.loc[valid, top_metrics]
+                .groupby(timestamps[valid].dt.date)
                 .mean()
-                .sort_values(by=["date", "metric"], kind="stable")
+                .dropna(how="all")
             )
 
-            x_axis = sorted({str(d) for d in trend_group["date"].tolist()})
-            series = {}
-            for metric in top_metrics:
-                metric_part = trend_group[trend_group["metric"] == metric]
-                mapper = {
-                    str(row["date"]): round(float(row["value"]), 4)
-                    for _, row in metric_part.iterrows()
-                }
-                series[str(metric)] = [mapper.get(day) for day in x_axis]
-
-            trend_payload = {"xAxis": x_axis, "series": series}
-            results.append(
-                save_processed_json(
-                    dataset_name="chart_grid_metric_trends",
-                    payload=trend_payload,
-                    rows_in=len(long_df),
-                    rows_out=len(x_axis),
-                )
+    station_counts = None
+    if "sp_id" in wide_df.columns:
+        station_counts = (
+            _numeric_sp_id(wide_df["sp_id"])
+            .to_frame()
+            .groupby("sp_id", as_index=False)
+            .size()
+            .rename(columns={"size": "records"})
+        )
+
+    return _save_results(
+        stats_df, trend_group, top_metrics, station_counts, rows_in, len(wide_df)
+    )
+
+
+def _frame_arrays(prefix: str, frame: pd.DataFrame) -> dict[str, np.ndarray]:
+    """按日累计表编码为 npz 数组：日期索引、列名与逐列数值（各列保留原 dtype）。"""
+    arrays = {
+        f"{prefix}_index": np.array(list(frame.index), dtype="datetime64[D]"),
+        f"{prefix}_columns": np.array([str(col) for col in frame.columns], dtype=str),
+    }
+    for position, col in enumerate(frame.columns):
+        arrays[f"{prefix}_{position}"] = frame[col].to_numpy()
+    return arrays
+
+
+def _frame_from_arrays(arrays: Any, prefix: str) -> pd.DataFrame | None:
+    """_frame_arrays 的逆过程；日期还原为 datetime.date，与分组结果的索引一致。"""
+    if f"{prefix}_index" not in arrays:
+        return None
+    columns = arrays[f"{prefix}_columns"].tolist()
+    return pd.DataFrame(
+        {col: arrays[f"{prefix}_{position}"] for position, col in enumerate(columns)},
+        index=pd.Index(arrays[f"{prefix}_index"].astype(object)),
+        columns=columns,
+    )
+
+
+def _accumulate(total: Any, part: Any) -> Any:
+    """按索引对齐累加两份计数/求和结果（缺失项按 0 处理）。"""
+    if part is None:
+        return total
+    return part if total is None else total.add(part, fill_value=0)
+
+
+@dataclass
+class _GridAggregates:
+    """宽表的可合并累计量：分块模式逐批累加，增量模式按来源文件缓存后合并。"""
+
+    stats: dict[str, RunningStats] = field(default_factory=dict)
+    # 出现过非数值内容的列不是指标列（与整表模式按 dtype 判断一致）
+    non_numeric: set[str] = field(default_factory=set)
+    day_sums: pd.DataFrame | None = None
+    day_counts: pd.DataFrame | None = None
+    station_counts: pd.Series | None = None
+    has_sp_id: bool = False
+    has_timestamp: bool = False
+    total_rows: int = 0
+
+    def add(self, chunk: pd.DataFrame) -> None:
+        """累加一批宽表数据。"""
+        self.total_rows += len(chunk)
+        candidates = [
+            col
+            for col in chunk.columns
+            if col not in ID_COLUMNS and col not in SKIPPED_COLUMNS
+        ]
+        numeric = []
+        for col in candidates:
+            if is_numeric_dtype(chunk[col]):
+                numeric.append(col)
+            elif chunk[col].notna().any():
+                self.non_numeric.add(col)
+        for col in numeric:
+            self.stats.setdefault(col, RunningStats()).merge(
+                RunningStats.from_values(chunk[col])
             )
 
-    # 3) 站点概览（若存在 sp_id）
-    if not wide_df.empty and "sp_id" in wide_df.columns:
-        station_df = wide_df.copy()
-        station_df["sp_id"] = pd.to_numeric(station_df["sp_id"], errors="coerce")
-        station_df = station_df[station_df["sp_id"].notna()]
-
-        if not station_df.empty:
-            items = (
-                station_df.groupby("sp_id", as_index=False)
-                .size()
-                .rename(columns={"size": "records"})
-                .sort_values(by=["records"], ascending=False)
-                .head(20)
+        timestamps = _parse_timestamps(chunk.get("timestamp"))
+        if timestamps is not None and numeric:
+            valid = timestamps.notna()
+            self.has_timestamp = self.has_timestamp or bool(valid.any())
+            with timed_substep("trend_pivot"):
+                grouped = chunk.loc[valid, numeric].groupby(timestamps[valid].dt.date)
+                sums, counts = grouped.sum(), grouped.count()
+            self.day_sums = _accumulate(self.day_sums, sums)
+            self.day_counts = _accumulate(self.day_counts, counts)
+
+        if "sp_id" in chunk.columns:
+            self.has_sp_id = True
+            counts = _numeric_sp_id(chunk["sp_id"]).value_counts()
+            self.station_counts = _accumulate(self.station_counts, counts)
+
+    def merge(self, other: _GridAggregates) -> None:
+        """合并另一份累计量（不修改 other）。"""
+        for col, item in other.stats.items():
+            self.stats.setdefault(col, RunningStats()).merge(item)
+        self.non_numeric |= other.non_numeric
+        self.day_sums = _accumulate(self.day_sums, other.day_sums)
+        self.day_counts = _accumulate(self.day_counts, other.day_counts)
+        self.station_counts = _accumulate(self.station_counts, other.station_counts)
+        self.has_sp_id = self.has_sp_id or other.has_sp_id
+        self.has_timestamp = self.has_timestamp or other.has_timestamp
+        self.total_rows += other.total_rows
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """编码为 npz 数组（不依赖 pickle），from_arrays 读回后合并结果不变。"""
+        arrays = {
+            "stats_columns": np.array(list(self.stats), dtype=str),
+            "stats": np.array(
+                [
+                    [item.count, item.mean, item.m2, item.min, item.max]
+                    for item in self.stats.values()
+                ],
+                dtype=np.float64,
+            ).reshape(-1, 5),
+            "non_numeric": np.array(sorted(self.non_numeric), dtype=str),
+            "flags": np.array([self.has_sp_id, self.has_timestamp]),
+            "total_rows": np.array(self.total_rows, dtype=np.int64),
+        }
+        for prefix in ("day_sums", "day_counts"):
+            frame = getattr(self, prefix)
+            if frame is not None:
+                arrays.update(_frame_arrays(prefix, frame))
+        if self.station_counts is not None:
+            arrays["station_ids"] = self.station_counts.index.to_numpy()
+            arrays["station_counts"] = self.station_counts.to_numpy()
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Any) -> _GridAggregates:
+        """由 to_arrays 写出的数组（dict 或 np.load 结果）还原累计量。"""
+        stats = {
+            col: RunningStats(
+                count=int(row[0]),
+                mean=float(row[1]),
+                m2=float(row[2]),
+                min=float(row[3]),
+                max=float(row[4]),
             )
-            payload = {
-                "items": [
-                    {"sp_id": int(row["sp_id"]), "records": int(row["records"])}
-                    for _, row in items.iterrows()
-                ]
-            }
-            results.append(
-                save_processed_json(
-                    dataset_name="chart_grid_station_overview",
-                    payload=payload,
-                    rows_in=len(wide_df),
-                    rows_out=len(payload["items"]),
-                )
+            for col, row in zip(arrays["stats_columns"].tolist(), arrays["stats"])
+        }
+        station_counts = None
+        if "station_ids" in arrays:
+            station_counts = pd.Series(
+                arrays["station_counts"], index=pd.Index(arrays["station_ids"])
             )
+        has_sp_id, has_timestamp = (bool(flag) for flag in arrays["flags"])
+        return cls(
+            stats=stats,
+            non_numeric=set(arrays["non_numeric"].tolist()),
+            day_sums=_frame_from_arrays(arrays, "day_sums"),
+            day_counts=_frame_from_arrays(arrays, "day_counts"),
+            station_counts=station_counts,
+            has_sp_id=has_sp_id,
+            has_timestamp=has_timestamp,
+            total_rows=int(arrays["total_rows"]),
+        )
 
-    return results
+    def save_results(self) -> list[ProcessResult]:
+        """由累计量生成并保存图表数据。"""
+        if self.total_rows == 0:
+            return []
+
+        stats = self.stats
+        metrics = sorted(
+            col
+            for col, item in stats.items()
+            if col not in self.non_numeric and item.count
+        )
+        stats_df = pd.DataFrame(
+            {
+                "count": [stats[col].count for col in metrics],
+                "mean": [stats[col].mean for col in metrics],
+                "min": [stats[col].min for col in metrics],
+                "max": [stats[col].max for col in metrics],
+                "std": [stats[col].std for col in metrics],
+            },
+            index=metrics,
+        )
+        rows_in = int(stats_df["count"].sum())
+
+        trend_group = None
+        top_metrics: list[str] = []
+        if metrics and self.has_timestamp and self.day_sums is not None:
+            top_metrics = _top_metrics(stats_df)
+            counts = self.day_counts.reindex(columns=top_metrics).fillna(0)
+            sums = self.day_sums.reindex(columns=top_metrics).fillna(0)
+            trend_group = (
+                (sums / counts.where(counts > 0)).sort_index().dropna(how="all")
+            )
+
+        station_frame = None
+        if self.has_sp_id:
+            station_counts = self.station_counts
+            station_frame = (
+                (station_counts if station_counts is not None else pd.Series(dtype=int))
+                .sort_index()
+                .rename_axis("sp_id")
+                .rename("records")
+                .reset_index()
+            )
+
+        return _save_results(
+            stats_df, trend_group, top_metrics, station_frame, rows_in, self.total_rows
+        )
+
+
+def _process_chunked(chunk_rows: int) -> list[ProcessResult]:
+    """分批流式读取宽表，用可合并的累计量聚合，内存只与批大小和日期/站点数相关。"""
+    aggregates = _GridAggregates()
+    for chunk in iter_cleaned_batches(DATASET_WIDE, batch_size=chunk_rows):
+        aggregates.add(chunk)
+    return aggregates.save_results()
+
+
+def _state_code() -> str:
+    """累计量缓存的代码版本（同构建指纹），相关源码任一改动即令缓存失效。"""
+    return code_version([Path(__file__).name])
+
+
+def _load_partition_state(path: Path, header: dict[str, Any]) -> _GridAggregates | None:
+    """读取分区累计量缓存；版本或 header（代码版本、清洗参数、分区哈希）不符、
+    文件缺失或损坏时返回 None。"""
+    if not path.exists():
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"]) != STATE_VERSION:
+                return None
+            if json.loads(str(data["header"])) != header:
+                return None
+            return _GridAggregates.from_arrays(data)
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return None
+
+
+def _save_partition_state(
+    path: Path, header: dict[str, Any], aggregates: _GridAggregates
+) -> None:
+    """写出单个分区的累计量缓存（先写临时文件再替换）。"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    staging = path.with_name(path.name + ".tmp")
+    with staging.open("wb") as f:
+        np.savez(
+            f,
+            version=np.array(STATE_VERSION),
+            header=np.array(json.dumps(header, ensure_ascii=False, sort_keys=True)),
+            **aggregates.to_arrays(),
+        )
+    staging.replace(path)
+
+
+def _process_incremental(chunk_rows: int | None) -> list[ProcessResult]:
+    """按来源文件分区增量聚合：只读取新增或变化的分区，其余复用缓存的累计量。
+
+    每个分区的累计量单独缓存，只有新增或变化的分区会重算并重写缓存；已删除
+    分区的缓存同步移除。预处理未以增量模式运行（没有分区）时退回分块模式全量聚合。
+    """
+    manifest = load_partition_manifest(DATASET_WIDE)
+    if manifest is None:
+        shutil.rmtree(STATE_DIR, ignore_errors=True)
+        return _process_chunked(chunk_rows or DEFAULT_CHUNK_ROWS)
+
+    code = _state_code()
+    aggregates = _GridAggregates()
+    keep: set[str] = set()
+    for record in ordered_partitions(manifest):
+        path = STATE_DIR / f"{record['name']}.npz"
+        keep.add(path.name)
+        header = {
+            "code": code,
+            "params": manifest["params"],
+            "sha256": record["sha256"],
+        }
+        part = _load_partition_state(path, header)
+        if part is None:
+            part = _GridAggregates()
+            with timed_substep("aggregate_partitions"):
+                part.add(load_cleaned_partition(DATASET_WIDE, record))
+            _save_partition_state(path, header, part)
+        aggregates.merge(part)
+
+    if STATE_DIR.exists():
+        for path in STATE_DIR.iterdir():
+            if path.name not in keep:
+                path.unlink()
+    return aggregates.save_results()
+
+
+def process_grid_history_charts(
+    chunk_rows: int | None = None, incremental: bool = False
+) -> list[ProcessResult]:
+    """生成网格历史相关图表最终数据。
+
+    chunk_rows 为空时整表读入；指定时按该行数分批流式读取并合并累计量，
+    输出与整表模式相同，可在固定内存下处理多年历史数据。incremental=True 时
+    按预处理写出的来源文件分区缓存累计量，新增文件只需读取其自身分区。
+    """
+    if incremental:
+        return _process_incremental(chunk_rows)
+    if chunk_rows:
+        return _process_chunked(chunk_rows)
+    return _process_in_memory()
@@ -0,0 +1,201 @@
+"""网格历史数据：按站点、指标生成多分辨率降采样金字塔。
+
+每个站点一个文件（data_processed/grid_pyramid/<sp_id>.json），包含：
+- raw：原始读数经 LTTB 降采样后的点（保留峰谷形状），每个指标独立选点；
+- hour / day / week / month：按时间桶聚合的 min / max / mean / count。
+每层点数不超过 max_points，超过的聚合层不输出；前端按可视范围选择满足点数的
+最细层级缩放，无需拉取完整序列。索引文件 grid_pyramid/index.json 列出各站点
+可用层级与点数；与站点文件同放在子目录，不会被当作顶层图表导库。
+"""
+
+from __future__ import annotations
+
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_numeric_dtype
+
+from chart_output import COMPRESSED_SUFFIXES, save_processed_json
+from cleaned_data import DATASET_WIDE, grid_metric_columns, load_cleaned_dataset
+from common import PROCESSED_DIR, ProcessResult, column_values, timed_substep
+from lttb import lttb_indices
+
+
+PYRAMID_DIR = "grid_pyramid"
+INDEX_NAME = "index"
+# 索引曾写在顶层，重建时删除以免被导库
+LEGACY_INDEX_DATASET = "chart_grid_pyramid_index"
+
+# 每层（每个指标）最多输出的点数
+DEFAULT_MAX_POINTS = 2000
+
+# 聚合层级 -> (pandas 频率, x 轴格式)；周以周一为起点，月以 1 日为起点
+BUCKET_LEVELS = {
+    "hour": ("h", "%Y-%m-%d %H:%M:%S"),
+    "day": ("D", "%Y-%m-%d"),
+    "week": ("W", "%Y-%m-%d"),
+    "month": ("M", "%Y-%m-%d"),
+}
+RAW_FORMAT = "%Y-%m-%d %H:%M:%S"
+BUCKET_STATS = ["min", "max", "mean", "count"]
+
+
+def _bucket_starts(timestamps: pd.Series, freq: str) -> pd.Series:
+    """时间所在桶的起点；小时、日直接取整，周、月按周期起点。"""
+    if freq in ("h", "D"):
+        return timestamps.dt.floor(freq)
+    return timestamps.dt.to_period(freq).dt.start_time
+
+
+def _raw_level(station_df: pd.DataFrame, metrics: list[str], max_points: int) -> dict:
+    """原始读数层：每个指标按 LTTB 选出不超过 max_points 个点。"""
+    series = {}
+    for metric in metrics:
+        readings = station_df.loc[station_df[metric].notna(), ["timestamp", metric]]
+        x = readings["timestamp"].to_numpy().astype("datetime64[ns]").astype("int64")
+        selected = readings.iloc[
+            lttb_indices(x, readings[metric].to_numpy(), max_points)
+        ]
+        series[str(metric)] = {
+            "total": len(readings),
+            "xAxis": selected["timestamp"].dt.strftime(RAW_FORMAT).tolist(),
+            "values": column_values(selected[metric], 4),
+        }
+    return {"series": series}
+
+
+def _bucket_level(stats: pd.DataFrame, metrics: list[str], fmt: str) -> dict:
+    """聚合层：共享 x 轴，每个指标输出 min / max / mean / count 四列。"""
+    return {
+        "xAxis": stats.index.strftime(fmt).tolist(),
+        "series": {
+            str(metric): {
+                stat: column_values(
+                    stats[(metric, stat)].astype("int64")
+                    if stat == "count"
+                    else stats[(metric, stat)],
+                    None if stat == "count" else 4,
+                )
+                for stat in BUCKET_STATS
+            }
+            for metric in metrics
+        },
+    }
+
+
+def _remove_stale_files(keep: set[str]) -> None:
+    """删除本次未生成的站点文件（站点被移除或改名时）与顶层旧索引，含预压缩副本。"""
+    suffixes = (".json", *COMPRESSED_SUFFIXES.values())
+    for suffix in suffixes:
+        (PROCESSED_DIR / f"{LEGACY_INDEX_DATASET}{suffix}").unlink(missing_ok=True)
+    directory = PROCESSED_DIR / PYRAMID_DIR
+    if not directory.exists():
+        return
+    for path in directory.iterdir():
+        name = next(
+            (path.name[: -len(s)] for s in suffixes if path.name.endswith(s)), None
+        )
+        if name is not None and name not in keep:
+            path.unlink()
+
+
+def process_grid_metric_pyramid(
+    max_points: int = DEFAULT_MAX_POINTS,
+) -> list[ProcessResult]:
+    """生成各站点的多分辨率降采样金字塔与索引。"""
+    wide_df = load_cleaned_dataset(DATASET_WIDE)
+    if wide_df.empty or "sp_id" not in wide_df.columns:
+        return []
+
+    timestamps = wide_df.get("timestamp")
+    if timestamps is None:
+        return []
+    if not is_datetime64_any_dtype(timestamps):
+        timestamps = pd.to_datetime(timestamps, errors="coerce")
+    sp_id = wide_df["sp_id"]
+    if not is_numeric_dtype(sp_id):
+        sp_id = pd.to_numeric(sp_id, errors="coerce")
+
+    metrics = grid_metric_columns(wide_df)
+    valid = timestamps.notna() & sp_id.notna()
+    if not metrics or not valid.any():
+        return []
+
+    frame = (
+        wide_df.loc[valid, metrics]
+        .assign(sp_id=sp_id[valid].astype("int64"), timestamp=timestamps[valid])
+        .sort_values(by=["sp_id", "timestamp"], kind="stable")
+    )
+
+    # 全部站点一次分组聚合，逐站点只做切片
+    bucket_stats: dict[str, pd.DataFrame] = {}
+    with timed_substep("bucket_aggregate"):
+        for level, (freq, _) in BUCKET_LEVELS.items():
+            buckets = _bucket_starts(frame["timestamp"], freq).rename("bucket")
+            bucket_stats[level] = frame.groupby([frame["sp_id"], buckets])[metrics].agg(
+                BUCKET_STATS
+            )
+
+    results: list[ProcessResult] = []
+    stations = []
+    written: set[str] = set()
+    for station, station_df in frame.groupby("sp_id", sort=True):
+        levels = {}
+        with timed_substep("lttb"):
+            levels["raw"] = _raw_level(station_df, metrics, max_points)
+        points = {
+            "raw": max(
+                (len(item["xAxis"]) for item in levels["raw"]["series"].values()),
+                default=0,
+            )
+        }
+        for level, (_, fmt) in BUCKET_LEVELS.items():
+            stats = bucket_stats[level].xs(station, level="sp_id")
+            if len(stats) > max_points:
+                continue
+            levels[level] = _bucket_level(stats, metrics, fmt)
+            points[level] = len(stats)
+
+        name = str(int(station))
+        entry = {
+            "sp_id": int(station),
+            "path": f"{PYRAMID_DIR}/{name}.json",
+            "start": station_df["timestamp"].iloc[0].strftime(RAW_FORMAT),
+            "end": station_df["timestamp"].iloc[-1].strftime(RAW_FORMAT),
+            "rows": len(station_df),
+            "levels": points,
+        }
+        payload = {
+            "sp_id": entry["sp_id"],
+            "start": entry["start"],
+            "end": entry["end"],
+            "max_points": max_points,
+            "metrics": [str(metric) for metric in metrics],
+            "levels": levels,
+        }
+        results.append(
+            save_processed_json(
+                dataset_name=f"{PYRAMID_DIR}/{name}",
+                payload=payload,
+                rows_in=len(station_df),
+                rows_out=sum(points.values()),
+            )
+        )
+        written.add(name)
+        stations.append(entry)
+
+    _remove_stale_files(written | {INDEX_NAME})
+
+    index_payload = {
+        "max_points": max_points,
+        "levels": ["raw", *BUCKET_LEVELS],
+        "metrics": [str(metric) for metric in metrics],
+        "stations": stations,
+    }
+    results.append(
+        save_processed_json(
+            dataset_name=f"{PYRAMID_DIR}/{INDEX_NAME}",
+            payload=index_payload,
+            rows_in=len(frame),
+            rows_out=len(stations),
+        )
+    )
+    return results
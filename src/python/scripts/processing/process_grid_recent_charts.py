@@ -0,0 +1,90 @@
+"""网格历史数据：最近时间窗口的逐小时趋势图表数据二次处理。"""
+
+from __future__ import annotations
+
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype
+
+from chart_output import save_processed_json
+from cleaned_data import DATASET_WIDE, grid_metric_columns, load_cleaned_dataset
+from common import ProcessResult, frame_series, load_time_partitions, timed_substep
+
+
+# 窗口覆盖最新读数所在日期及之前的天数
+RECENT_DAYS = 30
+TOP_METRICS = 5
+
+
+def _parse_timestamps(timestamps: pd.Series | None) -> pd.Series | None:
+    """JSON 读回的是字符串需转换；Parquet 已保留 dtype，直接跳过。"""
+    if timestamps is not None and not is_datetime64_any_dtype(timestamps):
+        return pd.to_datetime(timestamps, errors="coerce")
+    return timestamps
+
+
+def _window_start(latest: pd.Timestamp, days: int) -> pd.Timestamp:
+    """窗口起点：最新读数所在日期往前 days - 1 天的零点。"""
+    return latest.normalize() - pd.Timedelta(days=days - 1)
+
+
+def _load_window(days: int) -> tuple[pd.DataFrame, pd.Series | None]:
+    """读取最近 days 天的宽表行及其时间列。
+
+    有按月时间分区时由分区元数据确定最新时间，只读取窗口内的分区；
+    否则整表读入后按时间筛选。
+    """
+    meta = load_time_partitions(DATASET_WIDE)
+    if meta is None:
+        wide_df = load_cleaned_dataset(DATASET_WIDE)
+        timestamps = _parse_timestamps(wide_df.get("timestamp"))
+        if timestamps is None or timestamps.isna().all():
+            return wide_df.iloc[0:0], None
+        in_window = timestamps >= _window_start(timestamps.max(), days)
+        return wide_df[in_window], timestamps[in_window]
+
+    ends = [part["end"] for part in meta["partitions"] if part.get("end")]
+    if not ends:
+        return pd.DataFrame(), None
+    latest = max(pd.Timestamp(end) for end in ends)
+    wide_df = load_cleaned_dataset(DATASET_WIDE, start=_window_start(latest, days))
+    return wide_df, _parse_timestamps(wide_df.get("timestamp"))
+
+
+def process_grid_recent_charts(days: int = RECENT_DAYS) -> list[ProcessResult]:
+    """生成最近 days 天全网逐小时均值趋势（按窗口内读数条数取 Top 指标）。"""
+    wide_df, timestamps = _load_window(days)
+    if wide_df.empty or timestamps is None:
+        return []
+
+    metrics = grid_metric_columns(wide_df)
+    if not metrics:
+        return []
+
+    values = wide_df[metrics]
+    top_metrics = grid_metric_columns(values, top=TOP_METRICS)
+    with timed_substep("hourly_mean"):
+        hourly = (
+            values[top_metrics]
+            .groupby(timestamps.dt.floor("h"))
+            .mean()
+            .dropna(how="all")
+        )
+    if hourly.empty:
+        return []
+
+    x_axis = [stamp.strftime("%Y-%m-%d %H:%M") for stamp in hourly.index]
+    payload = {
+        "window_days": days,
+        "start": x_axis[0],
+        "end": x_axis[-1],
+        "xAxis": x_axis,
+        "series": frame_series(hourly, 4),
+    }
+    return [
+        save_processed_json(
+            dataset_name="chart_grid_recent_trends",
+            payload=payload,
+            rows_in=int(values.count().sum()),
+            rows_out=len(x_axis),
+        )
+    ]
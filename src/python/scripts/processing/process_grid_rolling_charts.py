@@ -0,0 +1,270 @@
+"""网格历史数据：按站点的滑动时间窗口统计与滑动均值达标率图表数据二次处理。"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_numeric_dtype
+
+from chart_output import save_processed_json
+from cleaned_data import DATASET_WIDE, grid_metric_columns, load_cleaned_dataset
+from common import ProcessResult, column_values, frame_records, timed_substep
+
+
+# 滑动窗口（pandas 时间偏移写法，窗口为 (t - w, t]）与统计量（pNN 为百分位数）
+ROLLING_WINDOWS = ("1h", "8h", "24h", "7D")
+ROLLING_STATS = ("mean", "max", "p90")
+TOP_METRICS = 5
+# 跨站点汇总时报告的高位百分位数
+SUMMARY_PERCENTILE = 95
+
+
+@dataclass(frozen=True)
+class ComplianceLimit:
+    """滑动均值达标限值：窗口、浓度限值与窗口内最少读数条数。"""
+
+    window: str
+    limit: float
+    min_count: int
+
+
+# GB 3095-2012 二级浓度限值，换算为网格数据的 mg/m³（如 PM2.5 日均 75 μg/m³）；
+# 有效性要求 24 小时至少 20 个、8 小时至少 6 个小时值
+COMPLIANCE_LIMITS = {
+    "pm2_5": ComplianceLimit("24h", 0.075, 20),
+    "pm10": ComplianceLimit("24h", 0.15, 20),
+    "so2": ComplianceLimit("24h", 0.15, 20),
+    "no2": ComplianceLimit("24h", 0.08, 20),
+    "co": ComplianceLimit("24h", 4.0, 20),
+    "o3": ComplianceLimit("8h", 0.16, 6),
+}
+
+
+def _stat_method(stat: str) -> tuple[str, float | None]:
+    """统计量名解析为 rolling 方法：mean / max / min / sum / std 或 pNN 百分位数。"""
+    if stat in {"mean", "max", "min", "sum", "std"}:
+        return stat, None
+    if stat.startswith("p") and stat[1:].isdigit() and 0 <= int(stat[1:]) <= 100:
+        return "quantile", int(stat[1:]) / 100
+    raise ValueError(f"不支持的滑动统计量：{stat}")
+
+
+def rolling_statistics(
+    frame: pd.DataFrame,
+    metric: str,
+    window: str,
+    stats: Iterable[str] = ROLLING_STATS,
+) -> pd.DataFrame:
+    """单个指标按站点的时间滑动窗口统计。
+
+    frame 需含 sp_id、datetime 类型的 timestamp 与 metric 列，按 (sp_id, timestamp)
+    排序且 metric 非空。各统计量由分组 rolling 在全部站点上一次计算，不逐行循环；
+    返回与 frame 行对齐的 sp_id、timestamp、count（窗口内读数条数）及各统计量列。
+    """
+    values = frame[metric].astype("float64")
+    values.index = pd.DatetimeIndex(frame["timestamp"])
+    rolling = values.groupby(frame["sp_id"].to_numpy(), sort=False).rolling(
+        window, min_periods=1
+    )
+
+    result = {
+        "sp_id": frame["sp_id"].to_numpy(),
+        "timestamp": frame["timestamp"].to_numpy(),
+        "count": rolling.count().to_numpy(),
+    }
+    for stat in stats:
+        method, quantile = _stat_method(stat)
+        if quantile is None:
+            rolled = getattr(rolling, method)()
+        else:
+            rolled = rolling.quantile(quantile)
+        result[stat] = rolled.to_numpy()
+    return pd.DataFrame(result)
+
+
+def _metric_frame(
+    wide_df: pd.DataFrame, sp_id: pd.Series, timestamps: pd.Series, metric: str
+) -> pd.DataFrame:
+    """单个指标的有效读数，按 (sp_id, timestamp) 排序。"""
+    valid = sp_id.notna() & timestamps.notna() & wide_df[metric].notna()
+    frame = pd.DataFrame(
+        {
+            "sp_id": sp_id[valid].astype("int64"),
+            "timestamp": timestamps[valid],
+            metric: wide_df.loc[valid, metric],
+        }
+    )
+    return frame.sort_values(by=["sp_id", "timestamp"], kind="stable").reset_index(
+        drop=True
+    )
+
+
+def _summary_item(rolled: pd.DataFrame, metric: str, window: str, stat: str) -> dict:
+    """某一窗口统计量在全部站点、时刻上的均值、高位百分位数与最大值出现位置。"""
+    values = rolled[stat].to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return {}
+    top = int(np.nanargmax(values))
+    return {
+        "window": window,
+        "metric": metric,
+        "stat": stat,
+        "mean": round(float(values[valid].mean()), 4),
+        f"p{SUMMARY_PERCENTILE}": round(
+            float(np.percentile(values[valid], SUMMARY_PERCENTILE)), 4
+        ),
+        "max": round(float(values[top]), 4),
+        "max_sp_id": int(rolled["sp_id"].iat[top]),
+        "max_time": pd.Timestamp(rolled["timestamp"].iat[top]).strftime(
+            "%Y-%m-%d %H:%M"
+        ),
+    }
+
+
+def _compliance_frame(
+    rolled: pd.DataFrame, metric: str, limit: ComplianceLimit
+) -> pd.DataFrame:
+    """各站点滑动均值的有效小时数、超标小时数、达标率与最大滑动均值。"""
+    valid = rolled["count"].to_numpy() >= limit.min_count
+    means = rolled["mean"].to_numpy(dtype=float)
+    grouped = (
+        pd.DataFrame(
+            {
+                "sp_id": rolled["sp_id"],
+                "hours": valid,
+                "exceed_hours": valid & (means > limit.limit),
+                "max_value": np.where(valid, means, np.nan),
+            }
+        )
+        .groupby("sp_id", sort=True)
+        .agg(
+            hours=("hours", "sum"),
+            exceed_hours=("exceed_hours", "sum"),
+            max_value=("max_value", "max"),
+        )
+        .reset_index()
+    )
+    hours = grouped["hours"].astype("int64")
+    grouped["compliance_rate"] = (
+        1 - grouped["exceed_hours"] / hours.where(hours > 0)
+    ).astype("float64")
+    grouped["metric"] = metric
+    return grouped
+
+
+def process_grid_rolling_charts(
+    windows: Iterable[str] = ROLLING_WINDOWS,
+    stats: Iterable[str] = ROLLING_STATS,
+) -> list[ProcessResult]:
+    """生成按站点滑动窗口统计汇总与滑动均值达标率图表数据。
+
+    指标取读数条数最多的 TOP_METRICS 个，并补充有达标限值的指标；
+    每个指标、窗口只做一次分组 rolling，达标率复用同窗口的滑动均值。
+    """
+    windows = tuple(windows)
+    stats = tuple(stats)
+    for stat in stats:
+        _stat_method(stat)
+
+    wide_df = load_cleaned_dataset(DATASET_WIDE)
+    if wide_df.empty or "sp_id" not in wide_df.columns:
+        return []
+    timestamps = wide_df.get("timestamp")
+    if timestamps is None:
+        return []
+    if not is_datetime64_any_dtype(timestamps):
+        timestamps = pd.to_datetime(timestamps, errors="coerce")
+    sp_id = wide_df["sp_id"]
+    if not is_numeric_dtype(sp_id):
+        sp_id = pd.to_numeric(sp_id, errors="coerce")
+
+    top = set(grid_metric_columns(wide_df, top=TOP_METRICS))
+    metrics = [
+        col
+        for col in grid_metric_columns(wide_df)
+        if col in top or col in COMPLIANCE_LIMITS
+    ]
+    if not metrics:
+        return []
+
+    summary_items: list[dict] = []
+    compliance_frames: list[pd.DataFrame] = []
+    rows_in = 0
+    for metric in metrics:
+        frame = _metric_frame(wide_df, sp_id, timestamps, metric)
+        if frame.empty:
+            continue
+        rows_in += len(frame)
+        limit = COMPLIANCE_LIMITS.get(metric)
+        metric_windows = windows
+        if limit is not None and limit.window not in windows:
+            metric_windows = (*windows, limit.window)
+
+        for window in metric_windows:
+            reported = window in windows
+            window_stats = stats if reported else ()
+            if (
+                limit is not None
+                and limit.window == window
+                and "mean" not in window_stats
+            ):
+                window_stats = (*window_stats, "mean")
+            with timed_substep(f"rolling_{window}"):
+                rolled = rolling_statistics(frame, metric, window, window_stats)
+            if reported:
+                for stat in stats:
+                    item = _summary_item(rolled, metric, window, stat)
+                    if item:
+                        summary_items.append(item)
+            if limit is not None and limit.window == window:
+                compliance_frames.append(_compliance_frame(rolled, metric, limit))
+
+    results: list[ProcessResult] = []
+    if summary_items:
+        results.append(
+            save_processed_json(
+                dataset_name="chart_grid_rolling_stats",
+                payload={
+                    "windows": list(windows),
+                    "stats": list(stats),
+                    "items": summary_items,
+                },
+                rows_in=rows_in,
+                rows_out=len(summary_items),
+            )
+        )
+
+    if compliance_frames:
+        compliance = pd.concat(compliance_frames, ignore_index=True)
+        limits = compliance["metric"].map(COMPLIANCE_LIMITS)
+        items = frame_records(
+            {
+                "metric": compliance["metric"].astype(str).tolist(),
+                "sp_id": column_values(compliance["sp_id"].astype("int64")),
+                "window": [limit.window for limit in limits],
+                "limit": [limit.limit for limit in limits],
+                "hours": column_values(compliance["hours"].astype("int64")),
+                "exceed_hours": column_values(
+                    compliance["exceed_hours"].astype("int64")
+                ),
+                "compliance_rate": column_values(compliance["compliance_rate"], 4),
+                "max_value": column_values(compliance["max_value"], 4),
+            }
+        )
+        results.append(
+            save_processed_json(
+                dataset_name="chart_grid_rolling_compliance",
+                payload={
+                    "standard": "GB 3095-2012 二级",
+                    "unit": "mg/m3",
+                    "items": items,
+                },
+                rows_in=rows_in,
+                rows_out=len(items),
+            )
+        )
+    return results
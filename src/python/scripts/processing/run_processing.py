@@ -2,30 +2,277 @@
 
 from __future__ import annotations
 
-from dataclasses import asdict
+from dataclasses import asdict, dataclass
 from datetime import datetime
 from pathlib import Path
+import argparse
 import json
+from typing import Any, Callable
 
-from common import PROCESSED_DIR, ProcessResult, ensure_processed_dir
+from chart_output import (
+    JsonOutputOptions,
+    json_output_options,
+    normalize_json_output,
+    output_paths,
+)
+from common import (
+    BUILD_MANIFEST_PATH,
+    CLEANED_DIR,
+    PROCESSED_DIR,
+    PY_ROOT_DIR,
+    ProcessResult,
+    build_fingerprint,
+    code_version,
+    collect_step_metrics,
+    ensure_processed_dir,
+    file_sha256,
+    load_build_manifest,
+    load_partition_manifest,
+    partitions_dir,
+    save_build_manifest,
+)
 from process_air_quality_charts import process_air_quality_charts
 from process_beibei_charts import process_beibei_yearly_charts
 from process_extended_forecast_charts import process_extended_forecast_charts
 from process_grid_history_charts import process_grid_history_charts
+from process_grid_pyramid import process_grid_metric_pyramid
+from process_grid_recent_charts import process_grid_recent_charts
+from process_grid_rolling_charts import process_grid_rolling_charts
 
 
-def run_all_processing() -> list[ProcessResult]:
-    """执行全部二次处理流程。"""
+@dataclass(frozen=True)
+class ProcessStep:
+    """单个二次处理步骤：依赖的清洗数据集、源码模块与执行函数。"""
+
+    name: str
+    module_file: str
+    cleaned_datasets: tuple[str, ...]
+    run: Callable[..., list[ProcessResult]]
+    supports_chunking: bool = False
+    supports_incremental: bool = False
+
+
+# 执行顺序即报告中的图表顺序
+PROCESS_STEPS = [
+    ProcessStep(
+        "beibei_charts",
+        "process_beibei_charts.py",
+        ("beibei_yearly_weather",),
+        process_beibei_yearly_charts,
+    ),
+    ProcessStep(
+        "air_quality_charts",
+        "process_air_quality_charts.py",
+        ("air_quality_good_days",),
+        process_air_quality_charts,
+    ),
+    ProcessStep(
+        "extended_forecast_charts",
+        "process_extended_forecast_charts.py",
+        ("extended_forecast",),
+        process_extended_forecast_charts,
+    ),
+    ProcessStep(
+        "grid_history_charts",
+        "process_grid_history_charts.py",
+        ("grid_history_wide",),
+        process_grid_history_charts,
+        supports_chunking=True,
+        supports_incremental=True,
+    ),
+    ProcessStep(
+        "grid_pyramid",
+        "process_grid_pyramid.py",
+        ("grid_history_wide",),
+        process_grid_metric_pyramid,
+    ),
+    ProcessStep(
+        "grid_recent_charts",
+        "process_grid_recent_charts.py",
+        ("grid_history_wide",),
+        process_grid_recent_charts,
+    ),
+    ProcessStep(
+        "grid_rolling_charts",
+        "process_grid_rolling_charts.py",
+        ("grid_history_wide",),
+        process_grid_rolling_charts,
+    ),
+]
+
+
+def _step_outputs_exist(step_entry: dict[str, Any]) -> bool:
+    """检查清单中记录的图表文件（含预压缩副本）是否仍然存在。"""
+    return all(
+        path.exists()
+        for item in step_entry.get("results", [])
+        for path in output_paths(Path(item["json_path"]), item.get("sizes", {}))
+    )
+
+
+def run_process_step(
+    step: ProcessStep,
+    manifest: dict[str, Any],
+    file_hashes: dict[str, Any],
+    force: bool = False,
+    chunk_rows: int | None = None,
+    output: JsonOutputOptions | None = None,
+    incremental: bool = False,
+) -> list[ProcessResult]:
+    """增量执行单个二次处理步骤，并把最新记录写回 manifest 与 file_hashes。
+
+    依赖的清洗数据内容（整表文件哈希，或来源文件分区清单中的记录）与代码版本
+    均未变化且图表仍在时直接复用上次结果；force=True 时强制重建。重建时每个
+    结果附带读取/转换/序列化耗时、峰值内存增量与读写字节数（metrics）。
+    chunk_rows 只影响支持分块的步骤，分块与整表输出相同，因此不计入构建指纹；
+    output 为图表 JSON 写出方式（紧凑输出、预压缩副本），非默认时计入指纹。
+    incremental 只影响支持按来源文件分区增量聚合的步骤，同样不计入指纹。
+    """
+    output = output or JsonOutputOptions()
+    previous_hashes = manifest["file_hashes"]
+
+    inputs = {}
+    params = output.fingerprint_params()
+    for dataset in step.cleaned_datasets:
+        for path in sorted(CLEANED_DIR.glob(f"{dataset}.*")):
+            inputs[path.name] = file_sha256(path, previous_hashes)
+            key = str(path.resolve().relative_to(PY_ROOT_DIR))
+            file_hashes[key] = previous_hashes[key]
+        parts = load_partition_manifest(dataset)
+        if parts is not None:
+            # 来源文件分区的内容由原始文件哈希与清洗参数确定，直接取清单记录，无需重新哈希
+            directory = partitions_dir(dataset).name
+            for record in parts["files"].values():
+                inputs[f"{directory}/{record['file']}"] = record["sha256"]
+            params = {**params, f"{directory}_params": parts["params"]}
+
+    code = code_version([step.module_file])
+    fingerprint = build_fingerprint(inputs, code, params)
+
+    previous = manifest["steps"].get(step.name, {})
+    if (
+        not force
+        and previous.get("fingerprint") == fingerprint
+        and _step_outputs_exist(previous)
+    ):
+        # 跳过的步骤没有本次运行指标，清空以免监控误读上次数值
+        return [
+            ProcessResult(**{**item, "rebuilt": False, "metrics": {}})
+            for item in previous.get("results", [])
+        ]
+
+    with collect_step_metrics() as metrics, json_output_options(output):
+        options: dict[str, Any] = {}
+        if step.supports_chunking:
+            options["chunk_rows"] = chunk_rows
+        if step.supports_incremental:
+            options["incremental"] = incremental
+        step_results = step.run(**options)
+    for item in step_results:
+        item.metrics = metrics.for_result(item.dataset)
+    manifest["steps"][step.name] = {
+        "fingerprint": fingerprint,
+        "inputs": inputs,
+        "code_version": code,
+        "results": [asdict(item) for item in step_results],
+    }
+    return step_results
+
+
+def run_all_processing(
+    force: bool = False,
+    chunk_rows: int | None = None,
+    minify: bool = False,
+    compress: list[str] | tuple[str, ...] | None = None,
+    payload_version: int = 1,
+    incremental: bool = False,
+) -> list[ProcessResult]:
+    """执行全部二次处理流程；默认按构建清单增量执行，force=True 时全部重建。
+
+    chunk_rows 指定时，网格历史图表按该行数分批流式聚合，内存占用与数据总量无关；
+    minify 输出紧凑 JSON，compress 同时写出 gz / br 预压缩副本，
+    payload_version=2 时图表包在 v2 信封中（时序图表列式编码）；incremental=True
+    时网格历史图表按来源文件分区缓存累计量，只聚合新增或变化的文件。
+    """
     ensure_processed_dir()
+    output = normalize_json_output(minify, compress, payload_version)
+
+    manifest = load_build_manifest(BUILD_MANIFEST_PATH)
+    file_hashes: dict[str, Any] = {}
 
     results: list[ProcessResult] = []
-    results.extend(process_beibei_yearly_charts())
-    results.extend(process_air_quality_charts())
-    results.extend(process_extended_forecast_charts())
-    results.extend(process_grid_history_charts())
+    for step in PROCESS_STEPS:
+        results.extend(
+            run_process_step(
+                step, manifest, file_hashes, force, chunk_rows, output, incremental
+            )
+        )
+
+    # 只保留本次仍存在的清洗数据哈希缓存
+    manifest["file_hashes"] = file_hashes
+    save_build_manifest(manifest, BUILD_MANIFEST_PATH)
     return results
 
 
+def run_named_step(
+    step_name: str,
+    force: bool = False,
+    chunk_rows: int | None = None,
+    minify: bool = False,
+    compress: list[str] | tuple[str, ...] | None = None,
+    payload_version: int = 1,
+    incremental: bool = False,
+) -> dict[str, Any]:
+    """执行单个命名步骤并返回可序列化结果，供流水线调度器在独立进程中调用。
+
+    构建清单只读不写，由 write_step_payloads 在调度结束后统一合并写出。
+    """
+    ensure_processed_dir()
+    step = next(item for item in PROCESS_STEPS if item.name == step_name)
+    manifest = load_build_manifest(BUILD_MANIFEST_PATH)
+    file_hashes: dict[str, Any] = {}
+    output = normalize_json_output(minify, compress, payload_version)
+    results = run_process_step(
+        step, manifest, file_hashes, force, chunk_rows, output, incremental
+    )
+    return {
+        "results": [asdict(item) for item in results],
+        "entry": manifest["steps"].get(step_name),
+        "file_hashes": file_hashes,
+    }
+
+
+def write_step_payloads(
+    payloads: dict[str, dict[str, Any]], keep_missing: bool = False
+) -> Path:
+    """合并 run_named_step 的结果，写出构建清单与二次处理报告，返回报告路径。
+
+    keep_missing=True 用于只执行部分节点（监听模式）：未执行步骤沿用清单中的
+    记录与文件哈希缓存，并以未重建状态列入报告。
+    """
+    manifest = load_build_manifest(BUILD_MANIFEST_PATH)
+    file_hashes: dict[str, Any] = dict(manifest["file_hashes"]) if keep_missing else {}
+    results: list[ProcessResult] = []
+    for step in PROCESS_STEPS:
+        payload = payloads.get(step.name)
+        if payload is None:
+            previous = manifest["steps"].get(step.name)
+            if keep_missing and previous:
+                results.extend(
+                    ProcessResult(**{**item, "rebuilt": False, "metrics": {}})
+                    for item in previous["results"]
+                )
+            continue
+        if payload["entry"] is not None:
+            manifest["steps"][step.name] = payload["entry"]
+        file_hashes.update(payload["file_hashes"])
+        results.extend(ProcessResult(**item) for item in payload["results"])
+
+    manifest["file_hashes"] = file_hashes
+    save_build_manifest(manifest, BUILD_MANIFEST_PATH)
+    return write_report(results)
+
+
 def write_report(results: list[ProcessResult]) -> Path:
     """输出二次处理报告，便于前后端联调。"""
     report_path = PROCESSED_DIR / "processing_report.json"
@@ -34,6 +281,12 @@ def write_report(results: list[ProcessResult]) -> Path:
         "generated_at": datetime.now().isoformat(timespec="seconds"),
         "datasets": [asdict(item) for item in results],
     }
+    sizes: dict[str, int] = {}
+    for item in results:
+        for fmt, size in item.sizes.items():
+            sizes[fmt] = sizes.get(fmt, 0) + size
+    if sizes:
+        payload["sizes"] = sizes
 
     with report_path.open("w", encoding="utf-8") as f:
         json.dump(payload, f, ensure_ascii=False, indent=2)
@@ -41,14 +294,67 @@ def write_report(results: list[ProcessResult]) -> Path:
     return report_path
 
 
+def _parse_args() -> argparse.Namespace:
+    """解析命令行参数。"""
+    parser = argparse.ArgumentParser(description="DPV-CQW 二次处理")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="忽略构建清单，重建全部图表数据",
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=None,
+        help="网格历史图表按该行数分批流式聚合（默认整表读入）",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="图表 JSON 紧凑输出（无缩进，安装 orjson 时用其编码）",
+    )
+    parser.add_argument(
+        "--compress",
+        nargs="+",
+        choices=("gz", "br"),
+        default=None,
+        help="同时写出预压缩副本 .json.gz / .json.br（br 需安装 brotli）",
+    )
+    parser.add_argument(
+        "--payload-version",
+        type=int,
+        choices=(1, 2),
+        default=1,
+        help="图表数据格式：1 为原格式，2 为带版本信封（时序图表列式编码）（默认 1）",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="网格历史图表按来源文件分区缓存累计量，只聚合新增或变化的文件（需预处理同样使用 --incremental）",
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    processing_results = run_all_processing()
+    args = _parse_args()
+    processing_results = run_all_processing(
+        force=args.force,
+        chunk_rows=args.chunk_rows,
+        minify=args.minify,
+        compress=args.compress,
+        payload_version=args.payload_version,
+        incremental=args.incremental,
+    )
     report_file = write_report(processing_results)
 
     print("\n二次处理完成，结果如下：")
     for item in processing_results:
+        status = "" if item.rebuilt else "（未变化，已跳过）"
+        cost = f", 步骤耗时 {item.metrics['step_seconds']:.2f}s" if item.metrics else ""
+        size = " / ".join(f"{fmt} {value} B" for fmt, value in item.sizes.items())
         print(
-            f"- {item.dataset}: 输入 {item.rows_in} 行, 输出 {item.rows_out} 行\n"
-            f"  JSON: {item.json_path}"
+            f"- {item.dataset}{status}: 输入 {item.rows_in} 行, 输出 {item.rows_out} 行"
+            f"{cost}\n"
+            f"  JSON: {item.json_path}" + (f"（{size}）" if size else "")
         )
     print(f"\n报告文件: {report_file}")
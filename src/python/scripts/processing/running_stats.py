@@ -0,0 +1,62 @@
+"""可分批合并的流式统计量。"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import math
+from typing import Any
+
+import numpy as np
+
+
+@dataclass
+class RunningStats:
+    """可合并的流式统计量：计数、均值、离差平方和（M2）与最值。
+
+    各批独立求统计量后按 Chan 并行公式合并，避免“平方和减平方”式的数值抵消。
+    """
+
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    min: float = math.inf
+    max: float = -math.inf
+
+    @classmethod
+    def from_values(cls, values: Any) -> RunningStats:
+        """由一批数值（忽略 NaN）计算统计量。"""
+        array = np.asarray(values, dtype=np.float64)
+        array = array[~np.isnan(array)]
+        if array.size == 0:
+            return cls()
+        mean = array.mean()
+        return cls(
+            count=int(array.size),
+            mean=float(mean),
+            m2=float(np.square(array - mean).sum()),
+            min=float(array.min()),
+            max=float(array.max()),
+        )
+
+    def merge(self, other: RunningStats) -> RunningStats:
+        """把另一批统计量合并进来（原地更新并返回自身）。"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return self
+
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def std(self) -> float:
+        """样本标准差（ddof=1，与 pandas 一致）；不足两个值时为 NaN。"""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
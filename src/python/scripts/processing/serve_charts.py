@@ -0,0 +1,643 @@
+"""DPV-CQW 本地图表查询服务：直接读取 data_processed 与网格站点索引，无需数据库。
+
+接口与 Elysia 后端一致（/api/charts/...），可作为 React 大屏开发、端到端延迟
+测量与压测时的替代后端；另提供 /api/grid/... 按站点、指标、时间范围切片查询
+清洗后的网格数据（依赖预处理阶段写出的站点时间索引）。
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+import argparse
+import hashlib
+import json
+import re
+import sys
+import threading
+from typing import Any
+
+import pandas as pd
+
+from chart_output import encode_json
+from common import (
+    PARTITIONS_FILE,
+    PROCESSED_DIR,
+    STATION_INDEX_FILE,
+    column_values,
+    partitions_dir,
+    station_index_dir,
+)
+from station_index import PartitionedStationIndex, StationIndex, load_station_index
+
+
+DEFAULT_HOST = "127.0.0.1"
+# 与 Elysia 后端同端口，前端无需修改 VITE_API_BASE_URL
+DEFAULT_PORT = 3000
+DEFAULT_WORKERS = 16
+DEFAULT_CACHE_MB = 256
+DEFAULT_CORS_ORIGIN = "http://localhost:5173"
+
+# 与 Elysia DTO 的取值范围一致
+MAX_BATCH_KEYS = 100
+MAX_LIST_LIMIT = 200
+DEFAULT_LIST_LIMIT = 100
+
+# 单次切片最多返回的行数，超过时要求缩小时间范围
+MAX_SLICE_ROWS = 200_000
+SLICE_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+GRID_DATASET = "grid_history_wide"
+
+# 处理报告、构建清单与调度报告不是图表数据（与导库脚本一致）
+EXCLUDED_FILES = {
+    "processing_report.json",
+    "build_manifest.json",
+    "pipeline_report.json",
+}
+
+# 空闲长连接的超时（秒）：避免占满线程池
+KEEP_ALIVE_TIMEOUT = 5
+
+_DATE_ONLY = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+class ServiceError(Exception):
+    """请求参数错误或资源不存在，携带返回的 HTTP 状态码。"""
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# ---------------------------------------------------------------------------
+# 缓存
+# ---------------------------------------------------------------------------
+
+
+class ByteLruCache:
+    """按字节数淘汰的线程安全 LRU 缓存。
+
+    每项带版本戳（文件 mtime / 大小等），读取时版本不符视为未命中；超过容量时
+    淘汰最久未使用的项，单项大于容量时不缓存。
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items: OrderedDict[Any, tuple[Any, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any, stamp: Any) -> bytes | None:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] != stamp:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key: Any, stamp: Any, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[1])
+            self._items[key] = (stamp, value)
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def _etag(*parts: Any) -> str:
+    """由版本戳计算强 ETag，不需要先生成响应体。"""
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def _item_count(payload: Any) -> int:
+    """与导库脚本 calcItemCount 一致。"""
+    if isinstance(payload, list):
+        return len(payload)
+    if isinstance(payload, dict):
+        for key in ("items", "xAxis"):
+            if isinstance(payload.get(key), list):
+                return len(payload[key])
+        return len(payload)
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# 图表数据集
+# ---------------------------------------------------------------------------
+
+
+class ChartStore:
+    """data_processed 下图表 JSON 的读取与缓存（缓存的是序列化后的数据集记录）。"""
+
+    def __init__(self, processed_dir: Path, cache: ByteLruCache):
+        self.processed_dir = processed_dir.resolve()
+        self.cache = cache
+        # 列表接口用的元数据：数量少、体积小，不参与字节淘汰
+        self._meta: dict[str, tuple[tuple[int, int], dict[str, Any]]] = {}
+        self._meta_lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        path = (self.processed_dir / f"{key}.json").resolve()
+        if self.processed_dir not in path.parents or path.name in EXCLUDED_FILES:
+            raise ServiceError(HTTPStatus.NOT_FOUND, f"未找到数据集: {key}")
+        return path
+
+    def stamp(self, key: str) -> tuple[int, int] | None:
+        """数据集文件的版本戳（mtime_ns, 大小）；不存在时返回 None。"""
+        try:
+            stat = self._path(key).stat()
+        except (OSError, ServiceError):
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def keys(self) -> list[str]:
+        """顶层图表数据集（与导库范围一致），按名称排序。"""
+        return sorted(
+            path.stem
+            for path in self.processed_dir.glob("*.json")
+            if path.name not in EXCLUDED_FILES
+        )
+
+    def record(self, key: str) -> bytes:
+        """单个数据集记录（字段与 Elysia 返回一致）的 JSON 字节。"""
+        stamp = self.stamp(key)
+        if stamp is None:
+            raise ServiceError(HTTPStatus.NOT_FOUND, f"未找到数据集: {key}")
+        cached = self.cache.get(("dataset", key), stamp)
+        if cached is not None:
+            return cached
+
+        path = self._path(key)
+        payload = json.loads(path.read_bytes())
+        meta = {
+            "datasetKey": key,
+            "sourceFile": path.name,
+            "payloadType": "array" if isinstance(payload, list) else "object",
+            "itemCount": _item_count(payload),
+            "updatedAt": datetime.fromtimestamp(stamp[0] / 1e9, tz=timezone.utc)
+            .isoformat(timespec="milliseconds")
+            .replace("+00:00", "Z"),
+        }
+        data = encode_json({**meta, "payload": payload}, minify=True)
+        self.cache.put(("dataset", key), stamp, data)
+        with self._meta_lock:
+            self._meta[key] = (stamp, meta)
+        return data
+
+    def meta(self, key: str) -> dict[str, Any] | None:
+        """数据集元数据（不含 payload）；文件已删除时返回 None。"""
+        stamp = self.stamp(key)
+        if stamp is None:
+            return None
+        with self._meta_lock:
+            cached = self._meta.get(key)
+        if cached is None or cached[0] != stamp:
+            self.record(key)
+            with self._meta_lock:
+                cached = self._meta[key]
+        return cached[1]
+
+
+# ---------------------------------------------------------------------------
+# 网格切片
+# ---------------------------------------------------------------------------
+
+
+class GridSlicer:
+    """基于站点时间索引的切片查询；索引文件更新后自动重新加载。"""
+
+    def __init__(self, dataset: str = GRID_DATASET):
+        self.dataset = dataset
+        self._index: StationIndex | PartitionedStationIndex | None = None
+        self._stamp: int | None = None
+        self._lock = threading.Lock()
+
+    def stamp(self) -> int | None:
+        # 没有整表索引时以来源文件分区清单为准（预处理增量模式，各分区自带索引）
+        for path in (
+            station_index_dir(self.dataset) / STATION_INDEX_FILE,
+            partitions_dir(self.dataset) / PARTITIONS_FILE,
+        ):
+            try:
+                return path.stat().st_mtime_ns
+            except OSError:
+                continue
+        return None
+
+    def index(self) -> StationIndex | PartitionedStationIndex:
+        stamp = self.stamp()
+        with self._lock:
+            if stamp is None:
+                self._index, self._stamp = None, None
+            elif self._index is None or self._stamp != stamp:
+                self._index, self._stamp = load_station_index(self.dataset), stamp
+            index = self._index
+        if index is None:
+            raise ServiceError(
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                "网格站点索引不存在，请先运行预处理（run_preprocessing.py）",
+            )
+        return index
+
+    def stations(self) -> dict[str, Any]:
+        index = self.index()
+        return {
+            "metrics": index.value_columns,
+            "items": [
+                {"sp_id": key, "rows": rows}
+                for key, rows in sorted(index.station_rows().items())
+            ],
+        }
+
+    def slice(
+        self,
+        sp_id: int,
+        metrics: list[str] | None,
+        start: pd.Timestamp | None,
+        end: pd.Timestamp | None,
+    ) -> dict[str, Any]:
+        index = self.index()
+        selected = index.value_columns if not metrics else metrics
+        unknown = sorted(set(selected) - set(index.value_columns))
+        if unknown:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, f"未知指标: {unknown}")
+        rows = index.count(sp_id, start, end)
+        if rows > MAX_SLICE_ROWS:
+            raise ServiceError(
+                HTTPStatus.BAD_REQUEST,
+                f"切片 {rows} 行超过上限 {MAX_SLICE_ROWS}，请缩小时间范围",
+            )
+        df = index.query(sp_id, start, end, columns=selected)
+        return {
+            "sp_id": sp_id,
+            "rows": len(df),
+            "xAxis": df[index.time_column].dt.strftime(SLICE_TIME_FORMAT).tolist(),
+            "series": {metric: column_values(df[metric], 4) for metric in selected},
+        }
+
+
+# ---------------------------------------------------------------------------
+# 路由
+# ---------------------------------------------------------------------------
+
+
+def _envelope(data: bytes) -> bytes:
+    return b'{"success":true,"data":' + data + b"}"
+
+
+def _error_body(message: str) -> bytes:
+    return encode_json({"success": False, "message": message}, minify=True)
+
+
+def _query_int(query: dict[str, list[str]], name: str, default: int) -> int:
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        return int(values[0])
+    except ValueError:
+        raise ServiceError(HTTPStatus.BAD_REQUEST, f"参数 {name} 须为整数") from None
+
+
+def _query_time(query: dict[str, list[str]], name: str) -> pd.Timestamp | None:
+    """解析时间参数；end 只给日期时包含当天（转为次日零点的开区间）。"""
+    values = query.get(name)
+    if not values or not values[0]:
+        return None
+    try:
+        value = pd.Timestamp(values[0])
+    except ValueError:
+        raise ServiceError(HTTPStatus.BAD_REQUEST, f"参数 {name} 不是有效时间") from None
+    if name == "end" and _DATE_ONLY.match(values[0]):
+        value += timedelta(days=1)
+    return value
+
+
+class ChartService:
+    """与 HTTP 框架无关的请求处理：返回 (状态码, 响应体, ETag)。"""
+
+    def __init__(
+        self,
+        processed_dir: Path = PROCESSED_DIR,
+        cache_bytes: int = DEFAULT_CACHE_MB << 20,
+    ):
+        self.cache = ByteLruCache(cache_bytes)
+        self.store = ChartStore(processed_dir, self.cache)
+        self.grid = GridSlicer()
+
+    def handle(
+        self, method: str, target: str, body: bytes, if_none_match: str | None
+    ) -> tuple[HTTPStatus, bytes, str | None]:
+        parts = urlsplit(target)
+        path = unquote(parts.path).rstrip("/") or "/"
+        query = parse_qs(parts.query)
+        try:
+            if method == "GET" and path == "/":
+                return HTTPStatus.OK, "DPV-CQW Python API is running".encode(), None
+            if method == "GET" and path == "/health":
+                payload = {"success": True, "service": "dpv-cqw-python"}
+                return HTTPStatus.OK, encode_json(payload, minify=True), None
+            if method == "GET" and path == "/api/cache/stats":
+                stats = encode_json(self.cache.stats(), minify=True)
+                return HTTPStatus.OK, _envelope(stats), None
+            if method == "GET" and path == "/api/charts/datasets":
+                return self._list(query, if_none_match)
+            if method == "GET" and path.startswith("/api/charts/datasets/"):
+                key = path[len("/api/charts/datasets/") :]
+                return self._single(key, if_none_match)
+            if method == "POST" and path == "/api/charts/datasets/query":
+                return self._batch(body, if_none_match)
+            if method == "GET" and path == "/api/grid/stations":
+                return self._grid_stations(if_none_match)
+            if method == "GET" and path == "/api/grid/slice":
+                return self._grid_slice(query, if_none_match)
+            raise ServiceError(HTTPStatus.NOT_FOUND, f"未知接口: {method} {path}")
+        except ServiceError as exc:
+            return exc.status, _error_body(str(exc)), None
+
+    @staticmethod
+    def _not_modified(etag: str, if_none_match: str | None) -> bool:
+        if not if_none_match:
+            return False
+        candidates = {item.strip() for item in if_none_match.split(",")}
+        return etag in candidates or "*" in candidates
+
+    def _respond(
+        self, etag: str, if_none_match: str | None, build: Any
+    ) -> tuple[HTTPStatus, bytes, str | None]:
+        """ETag 匹配时直接返回 304，不生成响应体。"""
+        if self._not_modified(etag, if_none_match):
+            return HTTPStatus.NOT_MODIFIED, b"", etag
+        return HTTPStatus.OK, build(), etag
+
+    def _single(self, key: str, if_none_match: str | None):
+        stamp = self.store.stamp(key)
+        if stamp is None:
+            raise ServiceError(HTTPStatus.NOT_FOUND, f"未找到数据集: {key}")
+        etag = _etag("dataset", key, stamp)
+        return self._respond(
+            etag, if_none_match, lambda: _envelope(self.store.record(key))
+        )
+
+    def _batch(self, body: bytes, if_none_match: str | None):
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, "请求体不是有效 JSON") from None
+        keys = request.get("datasetKeys") if isinstance(request, dict) else None
+        if (
+            not isinstance(keys, list)
+            or not 1 <= len(keys) <= MAX_BATCH_KEYS
+            or not all(isinstance(key, str) and key for key in keys)
+        ):
+            raise ServiceError(
+                HTTPStatus.BAD_REQUEST,
+                f"datasetKeys 须为 1~{MAX_BATCH_KEYS} 个非空字符串",
+            )
+
+        # 与 Elysia 一致：命中项按 datasetKey 升序，requestCount 为请求中的个数
+        stamps = {key: self.store.stamp(key) for key in sorted(set(keys))}
+        hits = [key for key, stamp in stamps.items() if stamp is not None]
+        etag = _etag("batch", [(key, stamps[key]) for key in hits], len(keys))
+
+        def build() -> bytes:
+            items = b",".join(
+                json.dumps(key, ensure_ascii=False).encode("utf-8")
+                + b":"
+                + self.store.record(key)
+                for key in hits
+            )
+            tail = f',"hitCount":{len(hits)},"requestCount":{len(keys)}}}'
+            return _envelope(b'{"items":{' + items + b"}" + tail.encode("utf-8"))
+
+        return self._respond(etag, if_none_match, build)
+
+    def _list(self, query: dict[str, list[str]], if_none_match: str | None):
+        keyword = (query.get("keyword") or [""])[0].strip()
+        limit = _query_int(query, "limit", DEFAULT_LIST_LIMIT)
+        offset = _query_int(query, "offset", 0)
+        if not 1 <= limit <= MAX_LIST_LIMIT or offset < 0:
+            raise ServiceError(
+                HTTPStatus.BAD_REQUEST, f"limit 须为 1~{MAX_LIST_LIMIT}，offset 须非负"
+            )
+
+        keys = [key for key in self.store.keys() if keyword in key]
+        page = keys[offset : offset + limit]
+        stamps = [(key, self.store.stamp(key)) for key in page]
+        etag = _etag("list", keyword, limit, offset, len(keys), stamps)
+
+        def build() -> bytes:
+            metas = [self.store.meta(key) for key in page]
+            data = {
+                "total": len(keys),
+                "limit": limit,
+                "offset": offset,
+                "items": [meta for meta in metas if meta is not None],
+            }
+            return _envelope(encode_json(data, minify=True))
+
+        return self._respond(etag, if_none_match, build)
+
+    def _grid_stations(self, if_none_match: str | None):
+        etag = _etag("stations", self.grid.stamp())
+        return self._respond(
+            etag,
+            if_none_match,
+            lambda: _envelope(encode_json(self.grid.stations(), minify=True)),
+        )
+
+    def _grid_slice(self, query: dict[str, list[str]], if_none_match: str | None):
+        if "sp_id" not in query:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, "缺少参数 sp_id")
+        sp_id = _query_int(query, "sp_id", 0)
+        metrics = sorted(
+            {
+                name.strip()
+                for value in query.get("metric", [])
+                for name in value.split(",")
+                if name.strip()
+            }
+        )
+        start, end = _query_time(query, "start"), _query_time(query, "end")
+        # 区分“站点不存在”（404）与“时间范围内无数据”（200 + 空数组）
+        if sp_id not in self.grid.index().station_rows():
+            raise ServiceError(HTTPStatus.NOT_FOUND, f"未找到站点: {sp_id}")
+        stamp = self.grid.stamp()
+        cache_key = ("slice", sp_id, tuple(metrics), start, end)
+        etag = _etag(cache_key, stamp)
+
+        def build() -> bytes:
+            cached = self.cache.get(cache_key, stamp)
+            if cached is None:
+                data = self.grid.slice(sp_id, metrics, start, end)
+                cached = _envelope(encode_json(data, minify=True))
+                self.cache.put(cache_key, stamp, cached)
+            return cached
+
+        return self._respond(etag, if_none_match, build)
+
+
+# ---------------------------------------------------------------------------
+# HTTP 服务
+# ---------------------------------------------------------------------------
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """把请求转交 ChartService，并补充 CORS、ETag 与长连接响应头。"""
+
+    protocol_version = "HTTP/1.1"
+    timeout = KEEP_ALIVE_TIMEOUT
+    server: PooledHTTPServer
+
+    def _send(self, status: HTTPStatus, body: bytes, etag: str | None) -> None:
+        self.send_response(status)
+        self.send_header("Access-Control-Allow-Origin", self.server.cors_origin)
+        self.send_header("Access-Control-Allow-Methods", "GET,POST,OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type, Authorization")
+        self.send_header("Access-Control-Expose-Headers", "ETag")
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if status != HTTPStatus.NOT_MODIFIED:
+            content_type = (
+                "application/json" if body[:1] in (b"{", b"[") else "text/plain"
+            )
+            self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if status != HTTPStatus.NOT_MODIFIED and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _dispatch(self, method: str) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        try:
+            status, payload, etag = self.server.service.handle(
+                method, self.path, body, self.headers.get("If-None-Match")
+            )
+        except Exception as exc:  # 未预期错误也返回 JSON，避免连接被直接断开
+            status, payload, etag = (
+                HTTPStatus.INTERNAL_SERVER_ERROR,
+                _error_body(f"服务内部错误: {exc}"),
+                None,
+            )
+        self._send(status, payload, etag)
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_HEAD(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def do_OPTIONS(self) -> None:
+        self._send(HTTPStatus.NO_CONTENT, b"", None)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class PooledHTTPServer(HTTPServer):
+    """固定大小线程池处理连接的 HTTP 服务（并发数可控，适合压测）。"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        service: ChartService,
+        workers: int = DEFAULT_WORKERS,
+        cors_origin: str = DEFAULT_CORS_ORIGIN,
+        quiet: bool = False,
+    ):
+        super().__init__(address, _RequestHandler)
+        self.service = service
+        self.cors_origin = cors_origin
+        self.quiet = quiet
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="chart-api"
+        )
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        self._pool.submit(self._process_in_pool, request, client_address)
+
+    def _process_in_pool(self, request: Any, client_address: Any) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _parse_args() -> argparse.Namespace:
+    """解析命令行参数。"""
+    parser = argparse.ArgumentParser(description="DPV-CQW 本地图表查询服务")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="监听地址")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="监听端口")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="处理请求的线程数")
+    parser.add_argument(
+        "--cache-mb",
+        type=int,
+        default=DEFAULT_CACHE_MB,
+        help="响应缓存容量（MB），按字节数 LRU 淘汰",
+    )
+    parser.add_argument(
+        "--cors-origin", default=DEFAULT_CORS_ORIGIN, help="允许跨域访问的前端地址"
+    )
+    parser.add_argument("--quiet", action="store_true", help="不输出逐条请求日志")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    chart_service = ChartService(cache_bytes=args.cache_mb << 20)
+    server = PooledHTTPServer(
+        (args.host, args.port),
+        chart_service,
+        workers=args.workers,
+        cors_origin=args.cors_origin,
+        quiet=args.quiet,
+    )
+    print(f"图表查询服务已启动: http://{args.host}:{args.port}（数据目录 {PROCESSED_DIR}）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n服务已停止", file=sys.stderr)
+    finally:
+        server.server_close()
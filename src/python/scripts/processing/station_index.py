@@ -0,0 +1,216 @@
+"""站点时间索引（预处理阶段 save_station_index 写出）：二分定位后只读取命中行。
+
+预处理增量模式下没有整表索引，每个来源文件分区自带索引，由
+PartitionedStationIndex 逐分区查询后按时间合并。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+import pandas as pd
+
+from common import (
+    STATION_INDEX_FILE,
+    load_partition_manifest,
+    load_station_index_meta,
+    partitions_dir,
+    record_load,
+    station_index_dir,
+)
+from partitions import ordered_partitions
+
+
+def _to_ns(value: Any) -> int | None:
+    """时间参数转为纳秒整数；None 表示不限。"""
+    if value is None:
+        return None
+    return int(pd.Timestamp(value).as_unit("ns").value)
+
+
+@dataclass
+class StationIndex:
+    """按 (站点, 时间) 排序的列式索引，列文件以内存映射方式按需读取。"""
+
+    directory: Path
+    key_column: str
+    time_column: str
+    block_rows: int
+    columns: list[str]
+    stations: dict[int, dict[str, Any]]
+    _arrays: dict[str, np.ndarray] = field(default_factory=dict, repr=False)
+
+    @property
+    def value_columns(self) -> list[str]:
+        """可查询的数值列（不含键、时间与原表行号）。"""
+        fixed = {self.key_column, self.time_column, "row"}
+        return [col for col in self.columns if col not in fixed]
+
+    def _array(self, column: str) -> np.ndarray:
+        if column not in self._arrays:
+            path = self.directory / f"{column}.npy"
+            self._arrays[column] = np.load(path, mmap_mode="r")
+        return self._arrays[column]
+
+    def locate(self, key: int, start: Any = None, end: Any = None) -> tuple[int, int]:
+        """返回站点在 [start, end) 时间范围内的行区间；站点不存在时为 (0, 0)。
+
+        先在内存中的块起始时间上二分，再只在首尾所在块内对时间列二分。取起始时间
+        严格早于边界的最后一块，时间相同的行跨块时也能找到第一条。
+        """
+        entry = self.stations.get(int(key))
+        if entry is None:
+            return 0, 0
+        lo, hi = entry["start"], entry["end"]
+        times = self._array(self.time_column)
+        start_ns, end_ns = _to_ns(start), _to_ns(end)
+        if start_ns is not None:
+            block = max(int(np.searchsorted(entry["blocks"], start_ns, "left")) - 1, 0)
+            block_lo = lo + block * self.block_rows
+            block_hi = min(block_lo + self.block_rows, hi)
+            lo = block_lo + int(np.searchsorted(times[block_lo:block_hi], start_ns))
+        if end_ns is not None:
+            block = max(int(np.searchsorted(entry["blocks"], end_ns, "left")) - 1, 0)
+            block_lo = entry["start"] + block * self.block_rows
+            block_hi = min(block_lo + self.block_rows, entry["end"])
+            hi = min(
+                hi, block_lo + int(np.searchsorted(times[block_lo:block_hi], end_ns))
+            )
+        return lo, max(lo, hi)
+
+    def count(self, key: int, start: Any = None, end: Any = None) -> int:
+        """站点在 [start, end) 时间范围内的行数。"""
+        lo, hi = self.locate(key, start, end)
+        return hi - lo
+
+    def station_rows(self) -> dict[int, int]:
+        """各站点的总行数。"""
+        return {
+            key: entry["end"] - entry["start"] for key, entry in self.stations.items()
+        }
+
+    def query(
+        self,
+        key: int,
+        start: Any = None,
+        end: Any = None,
+        columns: Iterable[str] | None = None,
+    ) -> pd.DataFrame:
+        """取出单个站点 [start, end) 内的行，返回含时间列与所选数值列的 DataFrame。"""
+        lo, hi = self.locate(key, start, end)
+        selected = self.value_columns if columns is None else list(columns)
+        unknown = set(selected) - set(self.value_columns)
+        if unknown:
+            raise KeyError(f"索引中不存在的列: {sorted(unknown)}")
+        data = {
+            self.time_column: np.asarray(self._array(self.time_column)[lo:hi]).astype(
+                "datetime64[ns]"
+            )
+        }
+        for col in selected:
+            data[col] = np.asarray(self._array(col)[lo:hi])
+        return pd.DataFrame(data)
+
+
+@dataclass
+class PartitionedStationIndex:
+    """按来源文件分区的站点时间索引：逐分区查询后按时间稳定排序合并。
+
+    各分区按来源文件顺序排列，合并结果与整表索引的行序一致（同一时间的行按
+    原宽表中的先后）。数值列取各分区的并集，分区缺少的列以 NaN 填充。
+    """
+
+    parts: list[StationIndex]
+
+    @property
+    def key_column(self) -> str:
+        return self.parts[0].key_column
+
+    @property
+    def time_column(self) -> str:
+        return self.parts[0].time_column
+
+    @property
+    def value_columns(self) -> list[str]:
+        """各分区可查询数值列的并集，按首次出现的顺序。"""
+        return list(
+            dict.fromkeys(col for part in self.parts for col in part.value_columns)
+        )
+
+    def count(self, key: int, start: Any = None, end: Any = None) -> int:
+        """站点在 [start, end) 时间范围内各分区的行数之和。"""
+        return sum(part.count(key, start, end) for part in self.parts)
+
+    def station_rows(self) -> dict[int, int]:
+        """各站点在全部分区中的总行数。"""
+        rows: dict[int, int] = {}
+        for part in self.parts:
+            for key, count in part.station_rows().items():
+                rows[key] = rows.get(key, 0) + count
+        return rows
+
+    def query(
+        self,
+        key: int,
+        start: Any = None,
+        end: Any = None,
+        columns: Iterable[str] | None = None,
+    ) -> pd.DataFrame:
+        """同 StationIndex.query，结果按时间排序。"""
+        selected = self.value_columns if columns is None else list(columns)
+        unknown = set(selected) - set(self.value_columns)
+        if unknown:
+            raise KeyError(f"索引中不存在的列: {sorted(unknown)}")
+        frames = [
+            part.query(
+                key, start, end, [col for col in selected if col in part.value_columns]
+            ).reindex(columns=[self.time_column, *selected])
+            for part in self.parts
+        ]
+        df = pd.concat(frames, ignore_index=True)
+        return df.sort_values(self.time_column, kind="stable", ignore_index=True)
+
+
+def _read_station_index(directory: Path) -> StationIndex | None:
+    """读取索引目录中的元数据（列文件在查询时才映射）；不存在或损坏时返回 None。"""
+    with record_load(directory / STATION_INDEX_FILE):
+        meta = load_station_index_meta(directory)
+    if meta is None:
+        return None
+    return StationIndex(
+        directory=directory,
+        key_column=meta["key_column"],
+        time_column=meta["time_column"],
+        block_rows=int(meta["block_rows"]),
+        columns=list(meta["columns"]),
+        stations={
+            int(key): {**entry, "blocks": np.asarray(entry["blocks"], dtype=np.int64)}
+            for key, entry in meta["stations"].items()
+        },
+    )
+
+
+def load_station_index(
+    dataset_name: str = "grid_history_wide",
+) -> StationIndex | PartitionedStationIndex | None:
+    """读取数据集的站点时间索引；索引不存在或损坏时返回 None。
+
+    没有整表索引而有来源文件分区（预处理增量模式）时，读取各分区自带的索引。
+    """
+    index = _read_station_index(station_index_dir(dataset_name))
+    if index is not None:
+        return index
+    manifest = load_partition_manifest(dataset_name)
+    if manifest is None:
+        return None
+    directory = partitions_dir(dataset_name)
+    parts = [
+        _read_station_index(directory / record["index"])
+        for record in ordered_partitions(manifest)
+        if record.get("index")
+    ]
+    parts = [part for part in parts if part is not None]
+    return PartitionedStationIndex(parts) if parts else None
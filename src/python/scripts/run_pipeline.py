@@ -0,0 +1,516 @@
+"""DPV-CQW 全流程调度入口：预处理与二次处理按依赖图并行执行。"""
+
+from __future__ import annotations
+
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime
+from fnmatch import fnmatchcase
+from pathlib import Path
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from typing import Any
+
+from shared.paths import PROCESSED_DIR, RAW_DATA_DIR
+
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+PIPELINE_REPORT_PATH = PROCESSED_DIR / "pipeline_report.json"
+
+# 阶段目录 -> 入口模块（两个阶段各有同名 common 模块，只能在独立进程中导入）
+STAGE_MODULES = {
+    "preprocessing": "run_preprocessing",
+    "processing": "run_processing",
+}
+
+# 监听模式：轮询间隔与防抖时长（秒），防抖期内文件仍在变化则继续等待
+WATCH_POLL_SECONDS = 1.0
+WATCH_DEBOUNCE_SECONDS = 3.0
+
+
+@dataclass(frozen=True)
+class PipelineNode:
+    """依赖图节点：对应某个阶段入口脚本中的一个命名步骤。"""
+
+    name: str
+    stage: str
+    inputs: tuple[str, ...] = ()
+    outputs: tuple[str, ...] = ()
+
+
+# 依赖图：原始文件 -> 清洗数据集 -> chart_* 图表数据，边由 inputs/outputs 推导
+PIPELINE_GRAPH = [
+    PipelineNode("beibei_yearly", "preprocessing", outputs=("beibei_yearly_weather",)),
+    PipelineNode(
+        "air_quality_days", "preprocessing", outputs=("air_quality_good_days",)
+    ),
+    PipelineNode("extended_forecast", "preprocessing", outputs=("extended_forecast",)),
+    PipelineNode(
+        "grid_history",
+        "preprocessing",
+        outputs=("grid_history_wide", "grid_history_long"),
+    ),
+    PipelineNode("beibei_charts", "processing", inputs=("beibei_yearly_weather",)),
+    PipelineNode("air_quality_charts", "processing", inputs=("air_quality_good_days",)),
+    PipelineNode(
+        "extended_forecast_charts", "processing", inputs=("extended_forecast",)
+    ),
+    PipelineNode("grid_history_charts", "processing", inputs=("grid_history_wide",)),
+    PipelineNode("grid_pyramid", "processing", inputs=("grid_history_wide",)),
+    PipelineNode("grid_recent_charts", "processing", inputs=("grid_history_wide",)),
+    PipelineNode("grid_rolling_charts", "processing", inputs=("grid_history_wide",)),
+]
+
+
+def node_dependencies(graph: list[PipelineNode]) -> dict[str, list[str]]:
+    """根据节点的输入/输出数据集推导上游依赖。"""
+    producers = {dataset: node.name for node in graph for dataset in node.outputs}
+    return {
+        node.name: sorted(
+            {producers[dataset] for dataset in node.inputs if dataset in producers}
+        )
+        for node in graph
+    }
+
+
+def downstream_nodes(deps: dict[str, list[str]], names: set[str]) -> set[str]:
+    """给定节点及其全部下游节点。"""
+    selected = set(names)
+    while True:
+        extra = {
+            name
+            for name, upstream in deps.items()
+            if name not in selected and selected.intersection(upstream)
+        }
+        if not extra:
+            return selected
+        selected |= extra
+
+
+def critical_path(
+    deps: dict[str, list[str]], durations: dict[str, float]
+) -> tuple[list[str], float]:
+    """按节点实际耗时求依赖图上的最长路径（关键路径）。"""
+    finish: dict[str, tuple[float, str | None]] = {}
+
+    def visit(name: str) -> float:
+        if name not in finish:
+            upstream = max(deps[name], key=visit, default=None)
+            base = visit(upstream) if upstream else 0.0
+            finish[name] = (base + durations.get(name, 0.0), upstream)
+        return finish[name][0]
+
+    if not deps:
+        return [], 0.0
+
+    tail = max(deps, key=visit)
+    path: list[str] = []
+    cursor: str | None = tail
+    while cursor:
+        path.append(cursor)
+        cursor = finish[cursor][1]
+    return path[::-1], round(finish[tail][0], 3)
+
+
+def _import_stage(stage: str):
+    """在当前（独立）进程中导入阶段入口模块。"""
+    sys.path.insert(0, str(SCRIPTS_DIR / stage))
+    return importlib.import_module(STAGE_MODULES[stage])
+
+
+def _run_node(stage: str, step_name: str, options: dict[str, Any]) -> dict[str, Any]:
+    """子进程任务：执行单个节点并附带起止时间。"""
+    module = _import_stage(stage)
+    started_at = time.time()
+    payload = module.run_named_step(step_name, **options)
+    payload["started_at"] = started_at
+    payload["finished_at"] = time.time()
+    return payload
+
+
+def _write_stage_report(
+    stage: str, payloads: dict[str, dict[str, Any]], keep_missing: bool = False
+) -> str:
+    """子进程任务：合并阶段内各节点结果，写出构建清单与阶段报告。"""
+    module = _import_stage(stage)
+    return str(module.write_step_payloads(payloads, keep_missing=keep_missing))
+
+
+def _raw_patterns() -> dict[str, tuple[str, ...]]:
+    """子进程任务：预处理步骤名 -> 原始文件匹配模式（取自预处理入口，避免重复维护）。"""
+    module = _import_stage("preprocessing")
+    return {step.name: step.raw_patterns for step in module.PREPROCESS_STEPS}
+
+
+def run_pipeline(
+    jobs: int | None = None,
+    workers: int | None = 1,
+    formats: list[str] | None = None,
+    force: bool = False,
+    compact: bool = False,
+    chunk_rows: int | None = None,
+    minify: bool = False,
+    compress: list[str] | None = None,
+    payload_version: int = 1,
+    incremental: bool = False,
+    time_partitions: bool = False,
+    targets: set[str] | None = None,
+) -> dict[str, Any]:
+    """按依赖图调度全部节点，上游完成即提交下游，独立分支并行执行。
+
+    jobs 为同时运行的节点数（默认 CPU 核数）；workers/formats/force/compact
+    透传给预处理阶段，force 同时作用于二次处理阶段，chunk_rows/minify/compress/
+    payload_version 透传给二次处理阶段，incremental（按来源文件分区增量清洗与
+    聚合）同时作用于两个阶段，time_partitions（额外写出按月时间分区）透传给
+    预处理阶段。targets 指定时只执行这些节点及其下游，
+    其余节点视为已是最新（产物沿用磁盘上的结果）。
+    返回流水线报告内容。
+    """
+    nodes = {node.name: node for node in PIPELINE_GRAPH}
+    deps = node_dependencies(PIPELINE_GRAPH)
+    selected = set(nodes) if targets is None else downstream_nodes(deps, targets)
+    options = {
+        "preprocessing": {
+            "workers": workers,
+            "formats": formats,
+            "force": force,
+            "compact": compact,
+            "incremental": incremental,
+            "time_partitions": time_partitions,
+        },
+        "processing": {
+            "force": force,
+            "chunk_rows": chunk_rows,
+            "minify": minify,
+            "compress": compress,
+            "payload_version": payload_version,
+            "incremental": incremental,
+        },
+    }
+
+    payloads: dict[str, dict[str, Any]] = {}
+    failed: dict[str, str] = {}
+    blocked: list[str] = []
+    pending = [node.name for node in PIPELINE_GRAPH if node.name in selected]
+    running: dict[Future, str] = {}
+    stage_reports: dict[str, str] = {}
+
+    # 每个任务使用全新的 spawn 进程，避免两个阶段的 common 模块互相覆盖
+    context = multiprocessing.get_context("spawn")
+    started_at = time.time()
+    with ProcessPoolExecutor(
+        max_workers=jobs or os.cpu_count() or 1,
+        mp_context=context,
+        max_tasks_per_child=1,
+    ) as executor:
+        while pending or running:
+            for name in list(pending):
+                if any(dep in failed or dep in blocked for dep in deps[name]):
+                    pending.remove(name)
+                    blocked.append(name)
+                elif all(dep in payloads or dep not in selected for dep in deps[name]):
+                    pending.remove(name)
+                    stage = nodes[name].stage
+                    future = executor.submit(_run_node, stage, name, options[stage])
+                    running[future] = name
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    payloads[name] = future.result()
+                except Exception as exc:  # 记录失败并阻断下游，其余分支继续
+                    failed[name] = f"{type(exc).__name__}: {exc}"
+
+        # 两个阶段的清单与报告互不相关，并行写出
+        report_futures = {}
+        for stage in STAGE_MODULES:
+            stage_payloads = {
+                name: payload
+                for name, payload in payloads.items()
+                if nodes[name].stage == stage
+            }
+            if stage_payloads:
+                report_futures[stage] = executor.submit(
+                    _write_stage_report, stage, stage_payloads, targets is not None
+                )
+        for stage, future in report_futures.items():
+            stage_reports[stage] = future.result()
+    finished_at = time.time()
+
+    durations = {
+        name: payload["finished_at"] - payload["started_at"]
+        for name, payload in payloads.items()
+    }
+    path, path_seconds = critical_path(deps, durations)
+
+    node_items = []
+    for node in PIPELINE_GRAPH:
+        item: dict[str, Any] = {
+            "name": node.name,
+            "stage": node.stage,
+            "depends_on": deps[node.name],
+        }
+        payload = payloads.get(node.name)
+        if payload is not None:
+            item["status"] = (
+                "rebuilt"
+                if any(result.get("rebuilt", True) for result in payload["results"])
+                else "skipped"
+            )
+            item["start_offset_seconds"] = round(payload["started_at"] - started_at, 3)
+            item["seconds"] = round(durations[node.name], 3)
+            item["datasets"] = [result["dataset"] for result in payload["results"]]
+        elif node.name in failed:
+            item["status"] = "failed"
+            item["error"] = failed[node.name]
+        elif node.name not in selected:
+            item["status"] = "unaffected"
+        else:
+            item["status"] = "blocked"
+        node_items.append(item)
+
+    return {
+        "project": "DPV-CQW",
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "jobs": jobs or os.cpu_count() or 1,
+        "wall_seconds": round(finished_at - started_at, 3),
+        "critical_path": {"nodes": path, "seconds": path_seconds},
+        "nodes": node_items,
+        "stage_reports": stage_reports,
+    }
+
+
+def write_report(report: dict[str, Any]) -> Path:
+    """输出流水线调度报告（含关键路径）。"""
+    PIPELINE_REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with PIPELINE_REPORT_PATH.open("w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return PIPELINE_REPORT_PATH
+
+
+def _print_report(report: dict[str, Any], report_file: Path) -> None:
+    """打印节点状态、关键路径与总耗时。"""
+    print("\n全流程执行完成，节点如下：")
+    for node_item in report["nodes"]:
+        if node_item["status"] == "unaffected":
+            continue
+        seconds = node_item.get("seconds")
+        cost = f"{seconds:.2f}s" if seconds is not None else "-"
+        print(
+            f"- [{node_item['stage']}] {node_item['name']}: {node_item['status']} {cost}"
+        )
+        if "error" in node_item:
+            print(f"  错误: {node_item['error']}")
+    critical = report["critical_path"]
+    print(
+        f"\n关键路径: {' -> '.join(critical['nodes'])} ({critical['seconds']:.2f}s)"
+        f"\n总耗时: {report['wall_seconds']:.2f}s"
+    )
+    print(f"报告文件: {report_file}")
+
+
+def _raw_snapshot() -> dict[str, tuple[int, int]]:
+    """原始数据目录下各文件的（大小, 修改时间）。"""
+    snapshot: dict[str, tuple[int, int]] = {}
+    if not RAW_DATA_DIR.exists():
+        return snapshot
+    for path in RAW_DATA_DIR.iterdir():
+        try:
+            stat = path.stat()
+        except FileNotFoundError:  # 轮询期间被删除
+            continue
+        if path.is_file():
+            snapshot[path.name] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+def affected_nodes(
+    file_names: set[str], patterns: dict[str, tuple[str, ...]]
+) -> set[str]:
+    """变化的原始文件对应的预处理节点。"""
+    return {
+        step
+        for step, globs in patterns.items()
+        if any(fnmatchcase(name, glob) for name in file_names for glob in globs)
+    }
+
+
+def watch_pipeline(
+    poll_seconds: float = WATCH_POLL_SECONDS,
+    debounce_seconds: float = WATCH_DEBOUNCE_SECONDS,
+    **options: Any,
+) -> None:
+    """监听原始数据目录，文件新增、修改或删除后只重跑受影响的节点及其下游。
+
+    启动时先增量执行一次全流程；之后每 poll_seconds 轮询一次，一批变化在
+    debounce_seconds 内不再有新变化时才触发执行，避免文件复制过程中反复重建。
+    options 透传给 run_pipeline。
+    """
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        patterns = executor.submit(_raw_patterns).result()
+
+    # 基线在首次执行前取得：执行期间被修改的文件会在第一次轮询时被发现
+    snapshot = _raw_snapshot()
+    report = run_pipeline(**options)
+    _print_report(report, write_report(report))
+
+    changed: set[str] = set()
+    last_change = 0.0
+    print(f"\n正在监听 {RAW_DATA_DIR}（Ctrl+C 退出）")
+    while True:
+        time.sleep(poll_seconds)
+        current = _raw_snapshot()
+        diff = {
+            name
+            for name in snapshot.keys() | current.keys()
+            if snapshot.get(name) != current.get(name)
+        }
+        snapshot = current
+        if diff:
+            changed |= diff
+            last_change = time.monotonic()
+            continue
+        if not changed or time.monotonic() - last_change < debounce_seconds:
+            continue
+
+        targets = affected_nodes(changed, patterns)
+        print(f"\n检测到原始文件变化: {', '.join(sorted(changed))}")
+        changed = set()
+        if not targets:
+            print("没有对应的预处理步骤，已忽略")
+            continue
+        report = run_pipeline(**options, targets=targets)
+        _print_report(report, write_report(report))
+
+
+def _parse_args() -> argparse.Namespace:
+    """解析命令行参数。"""
+    parser = argparse.ArgumentParser(description="DPV-CQW 全流程调度")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=0,
+        help="同时执行的节点数，0 为按 CPU 核数（默认 0）",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="网格历史与区县年度气象文件并行清洗进程数，1 为串行，0 为按 CPU 核数（默认 1）",
+    )
+    parser.add_argument(
+        "--format",
+        dest="formats",
+        nargs="+",
+        choices=("json", "parquet"),
+        default=["json"],
+        help="清洗结果落盘格式，可多选（默认 json；parquet 需安装 pyarrow）",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="忽略构建清单，重建全部数据集与图表",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="网格宽表使用紧凑 dtype（float32、最小整数、分类列），节省内存",
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=None,
+        help="网格历史图表按该行数分批流式聚合（默认整表读入）",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="图表 JSON 紧凑输出（无缩进，安装 orjson 时用其编码）",
+    )
+    parser.add_argument(
+        "--compress",
+        nargs="+",
+        choices=("gz", "br"),
+        default=None,
+        help="同时写出预压缩副本 .json.gz / .json.br（br 需安装 brotli）",
+    )
+    parser.add_argument(
+        "--payload-version",
+        type=int,
+        choices=(1, 2),
+        default=1,
+        help="图表数据格式：1 为原格式，2 为带版本信封（时序图表列式编码）（默认 1）",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="网格历史按来源文件分区，只清洗、聚合新增或变化的文件",
+    )
+    parser.add_argument(
+        "--time-partitions",
+        action="store_true",
+        help="网格历史额外按月写出时间分区，按时间范围读取时只读相交的分区",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="持续监听原始数据目录，文件变化后只重跑受影响的节点及其下游",
+    )
+    parser.add_argument(
+        "--poll-seconds",
+        type=float,
+        default=WATCH_POLL_SECONDS,
+        help=f"监听模式轮询间隔（秒，默认 {WATCH_POLL_SECONDS}）",
+    )
+    parser.add_argument(
+        "--debounce-seconds",
+        type=float,
+        default=WATCH_DEBOUNCE_SECONDS,
+        help=f"监听模式防抖时长，文件在此期间无新变化才触发（秒，默认 {WATCH_DEBOUNCE_SECONDS}）",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    pipeline_options = {
+        "jobs": args.jobs,
+        "workers": args.workers,
+        "formats": args.formats,
+        "force": args.force,
+        "compact": args.compact,
+        "chunk_rows": args.chunk_rows,
+        "minify": args.minify,
+        "compress": args.compress,
+        "payload_version": args.payload_version,
+        "incremental": args.incremental,
+        "time_partitions": args.time_partitions,
+    }
+    if args.watch:
+        try:
+            watch_pipeline(
+                poll_seconds=args.poll_seconds,
+                debounce_seconds=args.debounce_seconds,
+                **pipeline_options,
+            )
+        except KeyboardInterrupt:
+            print("\n已停止监听")
+        sys.exit(0)
+
+    pipeline_report = run_pipeline(**pipeline_options)
+    _print_report(pipeline_report, write_report(pipeline_report))
+
+    if any(
+        item["status"] in {"failed", "blocked"} for item in pipeline_report["nodes"]
+    ):
+        sys.exit(1)
@@ -0,0 +1,5 @@
+"""预处理与二次处理共用的工具：目录定义与清洗结果布局、运行指标、构建清单与 JSON 流式解析。
+
+两个阶段的脚本经本阶段 common 模块导入这些名称（common 负责把 scripts 目录
+加入 sys.path），不直接导入本包。
+"""
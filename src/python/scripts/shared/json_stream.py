@@ -0,0 +1,85 @@
+"""顶层 JSON 数组的流式解析：按块读入文本，逐个产出元素，内存只与块大小相关。"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import json
+from typing import Any, Iterator
+
+
+# 每次从磁盘读取的字符数
+STREAM_CHUNK_CHARS = 1 << 20
+
+_JSON_DECODER = json.JSONDecoder()
+_JSON_WHITESPACE = " \t\n\r"
+_JSON_DELIMITERS = _JSON_WHITESPACE + ",]"
+
+
+def iter_json_array(
+    file_path: Path, chunk_chars: int = STREAM_CHUNK_CHARS
+) -> Iterator[Any]:
+    """流式解析顶层 JSON 数组并逐个产出元素；顶层不是数组时不产出任何元素。"""
+    with file_path.open("r", encoding="utf-8") as f:
+        buffer = ""
+        pos = 0
+        eof = False
+
+        def fill() -> bool:
+            """读入下一块文本，同时丢弃已消费部分，返回是否读到新内容。"""
+            nonlocal buffer, pos, eof
+            if eof:
+                return False
+            chunk = f.read(chunk_chars)
+            if not chunk:
+                eof = True
+                return False
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            return True
+
+        def next_token() -> str:
+            """跳过空白并返回下一个非空白字符，文件结束时返回空串。"""
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in _JSON_WHITESPACE:
+                    pos += 1
+                if pos < len(buffer):
+                    return buffer[pos]
+                if not fill():
+                    return ""
+
+        if next_token() != "[":
+            return
+        pos += 1
+        if next_token() == "]":
+            return
+
+        while True:
+            if not next_token():
+                raise json.JSONDecodeError("JSON 数组未闭合", buffer, pos)
+
+            # 值可能被块边界截断：解析失败，或解析终点之后不是分隔符
+            # （如数字 "2.5" 只读到 "2."）时补读后重试
+            while True:
+                try:
+                    value, end = _JSON_DECODER.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if fill():
+                        continue
+                    raise
+                truncated = end >= len(buffer) or buffer[end] not in _JSON_DELIMITERS
+                if truncated and fill():
+                    continue
+                break
+            pos = end
+            yield value
+
+            token = next_token()
+            if token == ",":
+                pos += 1
+                continue
+            if token == "]":
+                return
+            if not token:
+                raise json.JSONDecodeError("JSON 数组未闭合", buffer, pos)
+            raise json.JSONDecodeError("JSON 数组元素之间缺少分隔符", buffer, pos)
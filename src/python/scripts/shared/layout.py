@@ -0,0 +1,83 @@
+"""清洗结果的目录布局：站点时间索引、按月时间分区与按来源文件分区。
+
+预处理阶段按这里的约定写出，二次处理阶段按同一约定读取；元数据读取函数在
+文件不存在或损坏时返回 None，由调用方决定回退方式。
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import json
+from typing import Any
+
+from shared.paths import CLEANED_DIR
+
+
+# 站点时间索引：<dataset>_index/index.json + 每列一个 .npy
+STATION_INDEX_SUFFIX = "_index"
+STATION_INDEX_FILE = "index.json"
+
+# 按月时间分区：<dataset>_by_month/partitions.json + <YYYY-MM>.<fmt>
+TIME_PARTITIONS_SUFFIX = "_by_month"
+TIME_PARTITIONS_FILE = "partitions.json"
+
+# 按来源文件分区（增量模式）：<dataset>_parts/parts.json + 每个来源文件一个 Parquet 分区
+PARTITIONS_SUFFIX = "_parts"
+PARTITIONS_FILE = "parts.json"
+# 分区清单版本：分区文件格式或记录结构变化时递增，旧版本清单视为不存在
+PARTITIONS_VERSION = 2
+
+
+def station_index_dir(dataset_name: str) -> Path:
+    """数据集站点时间索引目录 <dataset_name>_index/。"""
+    return CLEANED_DIR / f"{dataset_name}{STATION_INDEX_SUFFIX}"
+
+
+def time_partitions_dir(dataset_name: str) -> Path:
+    """数据集按月分区目录 <dataset_name>_by_month/。"""
+    return CLEANED_DIR / f"{dataset_name}{TIME_PARTITIONS_SUFFIX}"
+
+
+def partitions_dir(dataset_name: str) -> Path:
+    """数据集按来源文件分区目录 <dataset_name>_parts/。"""
+    return CLEANED_DIR / f"{dataset_name}{PARTITIONS_SUFFIX}"
+
+
+def _load_meta(path: Path, key: str, kind: type) -> dict[str, Any] | None:
+    """读取 JSON 元数据；不存在、损坏或 key 字段类型不符时返回 None。"""
+    if not path.exists():
+        return None
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if not isinstance(meta, dict) or not isinstance(meta.get(key), kind):
+        return None
+    return meta
+
+
+def load_station_index_meta(directory: Path) -> dict[str, Any] | None:
+    """读取索引目录中站点时间索引的元数据（各站点起止行与时间块起点）。"""
+    return _load_meta(directory / STATION_INDEX_FILE, "stations", dict)
+
+
+def load_time_partitions(dataset_name: str) -> dict[str, Any] | None:
+    """读取按月时间分区的元数据（各分区起止时间、站点集合与行数）。"""
+    return _load_meta(
+        time_partitions_dir(dataset_name) / TIME_PARTITIONS_FILE, "partitions", list
+    )
+
+
+def load_partition_manifest(dataset_name: str) -> dict[str, Any] | None:
+    """读取按来源文件分区的清单。
+
+    清单结构：params 为生成分区时的清洗参数，files 为来源文件名 -> 分区记录
+    （sha256、分区名与文件名、行数、起止时间与站点集合等）。版本不符（如旧版
+    pickle 分区）时同样返回 None。
+    """
+    manifest = _load_meta(partitions_dir(dataset_name) / PARTITIONS_FILE, "files", dict)
+    if manifest is None or manifest.get("version") != PARTITIONS_VERSION:
+        return None
+    manifest.setdefault("params", {})
+    return manifest
@@ -0,0 +1,93 @@
+"""增量构建：输入文件哈希、代码版本、构建指纹与构建清单读写。"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from pathlib import Path
+import hashlib
+import json
+from typing import Any, Iterable
+
+from shared.paths import PY_ROOT_DIR
+
+
+SHARED_DIR = Path(__file__).resolve().parent
+
+
+def file_sha256(file_path: Path, hash_cache: dict[str, Any] | None = None) -> str:
+    """计算文件内容哈希；文件大小与修改时间未变时直接复用缓存结果。"""
+    stat = file_path.stat()
+    key = str(file_path.resolve().relative_to(PY_ROOT_DIR))
+    cached = (hash_cache or {}).get(key)
+    if (
+        cached
+        and cached.get("size") == stat.st_size
+        and cached.get("mtime_ns") == stat.st_mtime_ns
+    ):
+        return cached["sha256"]
+
+    digest = hashlib.sha256()
+    with file_path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    sha256 = digest.hexdigest()
+
+    if hash_cache is not None:
+        hash_cache[key] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+        }
+    return sha256
+
+
+def code_version(scripts_dir: Path, module_files: Iterable[str]) -> str:
+    """以源码内容哈希作为代码版本：scripts_dir 下的 module_files 加上 shared 包各模块。"""
+    digest = hashlib.sha256()
+    for name in sorted(set(module_files)):
+        digest.update(name.encode("utf-8"))
+        digest.update((scripts_dir / name).read_bytes())
+    for path in sorted(SHARED_DIR.glob("*.py")):
+        digest.update(f"shared/{path.name}".encode("utf-8"))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def build_fingerprint(inputs: dict[str, str], code: str, params: dict[str, Any]) -> str:
+    """由输入哈希、代码版本与参数计算构建指纹。"""
+    payload = json.dumps(
+        {"inputs": inputs, "code": code, "params": params},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_build_manifest(manifest_path: Path) -> dict[str, Any]:
+    """读取构建清单；不存在或损坏时返回空清单。"""
+    empty: dict[str, Any] = {"steps": {}, "file_hashes": {}}
+    if not manifest_path.exists():
+        return empty
+    try:
+        with manifest_path.open("r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return empty
+    if not isinstance(manifest, dict):
+        return empty
+    manifest.setdefault("steps", {})
+    manifest.setdefault("file_hashes", {})
+    return manifest
+
+
+def save_build_manifest(manifest: dict[str, Any], manifest_path: Path) -> Path:
+    """写出构建清单（各阶段写在本阶段输出目录下）。"""
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "project": "DPV-CQW",
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        **{k: v for k, v in manifest.items() if k not in {"project", "generated_at"}},
+    }
+    with manifest_path.open("w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    return manifest_path
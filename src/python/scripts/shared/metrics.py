@@ -0,0 +1,249 @@
+"""运行指标：读取 / 转换 / 序列化耗时、峰值内存增量与读写字节数。
+
+读写工具函数与 timed_substep 把指标登记到 collect_step_metrics 当前采集的步骤；
+进程池任务经 call_with_worker_metrics 采集后由父进程合并。
+"""
+
+from __future__ import annotations
+
+from contextlib import ContextDecorator, contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator
+
+
+# 内存采样间隔（秒）：后台线程按此频率读取当前 RSS
+MEMORY_SAMPLE_INTERVAL = 0.01
+
+
+@dataclass
+class StepMetrics:
+    """单个步骤运行期间采集到的指标，由读写工具函数与 timed_substep 自动累加。"""
+
+    total_seconds: float = 0.0
+    load_seconds: float = 0.0
+    bytes_read: int = 0
+    peak_memory_delta_bytes: int | None = None
+    outputs: dict[str, dict[str, float]] = field(default_factory=dict)
+    substeps: dict[str, float] = field(default_factory=dict)
+
+    def for_result(self, dataset: str) -> dict[str, Any]:
+        """生成单个数据集的指标：序列化耗时与写出字节按数据集区分，其余为步骤共享。"""
+        serialize_total = sum(item["seconds"] for item in self.outputs.values())
+        output = self.outputs.get(dataset, {})
+        return {
+            "step_seconds": round(self.total_seconds, 4),
+            "load_seconds": round(self.load_seconds, 4),
+            "transform_seconds": round(
+                max(0.0, self.total_seconds - self.load_seconds - serialize_total), 4
+            ),
+            "serialize_seconds": round(output.get("seconds", 0.0), 4),
+            "peak_memory_delta_bytes": self.peak_memory_delta_bytes,
+            "bytes_read": self.bytes_read,
+            "bytes_written": int(output.get("bytes", 0)),
+            "substeps": {name: round(sec, 4) for name, sec in self.substeps.items()},
+        }
+
+
+_ACTIVE_METRICS: list[StepMetrics] = []
+
+
+def current_step_metrics() -> StepMetrics | None:
+    """当前正在采集的步骤指标；不在 collect_step_metrics 内时返回 None。"""
+    return _ACTIVE_METRICS[-1] if _ACTIVE_METRICS else None
+
+
+def _current_rss_bytes() -> int | None:
+    """当前进程常驻内存（字节）；平台不支持时返回 None。"""
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/statm", "r", encoding="ascii") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            # PROCESS_MEMORY_COUNTERS 结构
+            class _MemoryCounters(ctypes.Structure):
+                _fields_ = [
+                    ("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                ] + [
+                    (name, ctypes.c_size_t)
+                    for name in (
+                        "PeakWorkingSetSize",
+                        "WorkingSetSize",
+                        "QuotaPeakPagedPoolUsage",
+                        "QuotaPagedPoolUsage",
+                        "QuotaPeakNonPagedPoolUsage",
+                        "QuotaNonPagedPoolUsage",
+                        "PagefileUsage",
+                        "PeakPagefileUsage",
+                    )
+                ]
+
+            counters = _MemoryCounters(cb=ctypes.sizeof(_MemoryCounters))
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(
+                handle, ctypes.byref(counters), counters.cb
+            ):
+                return int(counters.WorkingSetSize)
+        except (AttributeError, OSError):
+            return None
+    return None
+
+
+def _max_rss_bytes() -> int | None:
+    """进程生命周期内的峰值 RSS（字节），用于补足采样遗漏的瞬时峰值。"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return int(peak) if sys.platform == "darwin" else int(peak) * 1024
+
+
+class _PeakMemorySampler:
+    """后台线程周期采样 RSS，得到区间内相对起点的峰值增量。"""
+
+    def __init__(self, interval: float = MEMORY_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._baseline = _current_rss_bytes()
+        self._max_rss_before = _max_rss_bytes()
+        self._peak = self._baseline
+
+    def _sample(self) -> None:
+        rss = _current_rss_bytes()
+        if rss is not None and self._peak is not None:
+            self._peak = max(self._peak, rss)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        if self._baseline is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> int | None:
+        if self._thread is None:
+            return None
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        # 进程峰值 RSS 在区间内被刷新，说明出现过采样未捕捉到的更高点
+        max_rss_after = _max_rss_bytes()
+        if max_rss_after is not None and max_rss_after > (self._max_rss_before or 0):
+            self._peak = max(self._peak, max_rss_after)
+        return max(0, self._peak - self._baseline)
+
+
+@contextmanager
+def collect_step_metrics() -> Iterator[StepMetrics]:
+    """采集 with 块内的运行指标：读写工具函数与 timed_substep 会自动登记到此处。"""
+    metrics = StepMetrics()
+    sampler = _PeakMemorySampler()
+    sampler.start()
+    _ACTIVE_METRICS.append(metrics)
+    started = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics.total_seconds = time.perf_counter() - started
+        _ACTIVE_METRICS.remove(metrics)
+        metrics.peak_memory_delta_bytes = sampler.stop()
+
+
+def call_with_worker_metrics(
+    func: Callable[..., Any], *args: Any
+) -> tuple[Any, StepMetrics]:
+    """在进程池任务中调用 func，并采集其读取耗时、读取字节与子步骤耗时。
+
+    子进程中没有父进程的 collect_step_metrics，读取指标会丢失；任务把采集结果随
+    返回值交回，由父进程 merge_worker_metrics 合并（不采样内存）。
+    """
+    metrics = StepMetrics()
+    _ACTIVE_METRICS.append(metrics)
+    try:
+        return func(*args), metrics
+    finally:
+        _ACTIVE_METRICS.remove(metrics)
+
+
+def merge_worker_metrics(worker: StepMetrics) -> None:
+    """把进程池任务的指标并入当前步骤；读取耗时为各任务之和（可大于墙钟时间）。"""
+    metrics = current_step_metrics()
+    if metrics is None:
+        return
+    metrics.load_seconds += worker.load_seconds
+    metrics.bytes_read += worker.bytes_read
+    for name, seconds in worker.substeps.items():
+        metrics.substeps[name] = metrics.substeps.get(name, 0.0) + seconds
+
+
+class _SubstepTimer(ContextDecorator):
+    """子步骤计时器，可作上下文管理器或装饰器使用。"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._started: list[float] = []
+
+    def __enter__(self) -> _SubstepTimer:
+        self._started.append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc_info: Any) -> bool:
+        elapsed = time.perf_counter() - self._started.pop()
+        metrics = current_step_metrics()
+        if metrics is not None:
+            metrics.substeps[self.name] = metrics.substeps.get(self.name, 0.0) + elapsed
+        return False
+
+
+def timed_substep(name: str) -> _SubstepTimer:
+    """为子步骤计时并记入当前步骤指标的 substeps（同名多次调用累加）。
+
+    用法：``with timed_substep("trend_pivot"): ...`` 或 ``@timed_substep("to_long")``；
+    不在 collect_step_metrics 内时只计时不记录，开销可忽略。
+    """
+    return _SubstepTimer(name)
+
+
+@contextmanager
+def record_load(file_path: Path) -> Iterator[None]:
+    """把 with 块耗时与文件大小计入当前步骤的读取指标。"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = current_step_metrics()
+        if metrics is not None:
+            metrics.load_seconds += time.perf_counter() - started
+            if file_path.exists():
+                metrics.bytes_read += file_path.stat().st_size
+
+
+@contextmanager
+def record_serialize(dataset_name: str, paths: Iterable[Path]) -> Iterator[None]:
+    """把 with 块耗时与写出文件大小计入当前步骤中该数据集的序列化指标。"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = current_step_metrics()
+        if metrics is not None:
+            output = metrics.outputs.setdefault(
+                dataset_name, {"seconds": 0.0, "bytes": 0}
+            )
+            output["seconds"] += time.perf_counter() - started
+            output["bytes"] += sum(p.stat().st_size for p in paths if p.exists())
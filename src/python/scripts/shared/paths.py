@@ -0,0 +1,16 @@
+"""目录定义：统一从 src/python 根目录推导。"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import os
+
+
+# 设置 DPV_CQW_PY_ROOT 时改用该目录（基准测试等场景在临时目录中运行整条流水线）
+PY_ROOT_ENV = "DPV_CQW_PY_ROOT"
+PY_ROOT_DIR = Path(
+    os.environ.get(PY_ROOT_ENV) or Path(__file__).resolve().parents[2]
+).resolve()
+RAW_DATA_DIR = PY_ROOT_DIR / "data"
+CLEANED_DIR = PY_ROOT_DIR / "data_cleaned"
+PROCESSED_DIR = PY_ROOT_DIR / "data_processed"
@@ -0,0 +1,55 @@
+"""测试公共设置。
+
+两个阶段的脚本目录各有同名模块（common 等），按阶段导入时先移出另一阶段已导入的
+同名模块；数据根目录指向临时目录，测试不会读写仓库中的 data_* 目录。
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+from types import ModuleType
+
+import pytest
+
+
+SCRIPTS_DIR = Path(__file__).resolve().parents[1] / "scripts"
+STAGES = ("preprocessing", "processing")
+
+# 须在导入 shared.paths 之前设置（目录常量在导入时确定）
+_DATA_ROOT = Path(tempfile.mkdtemp(prefix="dpv_cqw_tests_"))
+os.environ["DPV_CQW_PY_ROOT"] = str(_DATA_ROOT)
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+_active_stage: list[str] = []
+
+
+def import_stage_module(stage: str, name: str) -> ModuleType:
+    """导入阶段目录下的模块；切换阶段时先移出两个阶段已导入的模块。"""
+    if _active_stage != [stage]:
+        names = {
+            path.stem for item in STAGES for path in (SCRIPTS_DIR / item).glob("*.py")
+        }
+        for module in names:
+            sys.modules.pop(module, None)
+        for item in STAGES:
+            while str(SCRIPTS_DIR / item) in sys.path:
+                sys.path.remove(str(SCRIPTS_DIR / item))
+        sys.path.insert(0, str(SCRIPTS_DIR / stage))
+        _active_stage[:] = [stage]
+    return importlib.import_module(name)
+
+
+@pytest.fixture(scope="session")
+def stage_module():
+    """按阶段导入模块的函数：stage_module("processing", "lttb")。"""
+    return import_stage_module
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_DATA_ROOT, ignore_errors=True)
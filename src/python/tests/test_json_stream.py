@@ -0,0 +1,40 @@
+"""顶层 JSON 数组的流式解析：任意块大小下与 json.load 结果一致。"""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from shared.json_stream import iter_json_array
+
+
+SAMPLE = """
+ [
+  {"recv_time": "Fri Jan 01 01:00:00 CST 2021", "sp_id": 1483, "pm2_5": 0.035},
+  {"text": "逗号, 方括号 ] 与转义 \\" 引号", "nested": {"a": [1, [2, {"b": null}]]}},
+  2.5e-3, -0, 12345678901234567890, true, false, null, "", [], {}
+ ]
+"""
+
+
+@pytest.mark.parametrize("chunk_chars", [1, 2, 3, 7, 64, 1 << 20])
+def test_matches_json_load(tmp_path, chunk_chars):
+    path = tmp_path / "sample.json"
+    path.write_text(SAMPLE, encoding="utf-8")
+    assert list(iter_json_array(path, chunk_chars)) == json.loads(SAMPLE)
+
+
+@pytest.mark.parametrize("text", ["[]", "  [ \n ]  ", '{"a": [1, 2]}', "", "3"])
+def test_empty_or_not_an_array(tmp_path, text):
+    path = tmp_path / "sample.json"
+    path.write_text(text, encoding="utf-8")
+    assert list(iter_json_array(path, 2)) == []
+
+
+@pytest.mark.parametrize("text", ["[1, 2", "[1 2]", '[{"a": 1}', "[1,", '["abc'])
+def test_malformed_arrays_raise(tmp_path, text):
+    path = tmp_path / "sample.json"
+    path.write_text(text, encoding="utf-8")
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(path, 3))
@@ -0,0 +1,66 @@
+"""LTTB 降采样：向量化实现与逐桶循环的原始算法选点一致。"""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="module")
+def lttb(stage_module):
+    return stage_module("processing", "lttb")
+
+
+def _reference_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> list[int]:
+    """Steinarsson 原始 LTTB：逐桶、逐点求三角形面积。"""
+    count = len(x)
+    every = (count - 2) / (threshold - 2)
+    selected = [0]
+    previous = 0
+    for i in range(threshold - 2):
+        avg_lo = int((i + 1) * every) + 1
+        avg_hi = min(int((i + 2) * every) + 1, count)
+        avg_x = x[avg_lo:avg_hi].mean()
+        avg_y = y[avg_lo:avg_hi].mean()
+        best, best_area = -1, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs(
+                (x[previous] - avg_x) * (y[j] - y[previous])
+                - (x[previous] - x[j]) * (avg_y - y[previous])
+            )
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        previous = best
+    selected.append(count - 1)
+    return selected
+
+
+@pytest.mark.parametrize(
+    ("count", "threshold"), [(10, 3), (100, 7), (1000, 50), (1001, 999), (5000, 333)]
+)
+def test_matches_reference(lttb, count, threshold):
+    rng = np.random.default_rng(count + threshold)
+    x = np.sort(rng.random(count)) * 1000
+    y = rng.normal(size=count).cumsum()
+    result = lttb.lttb_indices(x, y, threshold)
+    assert result.tolist() == _reference_indices(x, y, threshold)
+
+
+def test_selection_shape(lttb):
+    """首尾点保留、下标严格递增，孤立峰值被选中。"""
+    x = np.arange(2000, dtype=np.float64)
+    y = np.sin(x / 50)
+    y[1234] = 40.0
+    result = lttb.lttb_indices(x, y, 100)
+    assert len(result) == 100
+    assert result[0] == 0 and result[-1] == len(x) - 1
+    assert (np.diff(result) > 0).all()
+    assert 1234 in result
+
+
+@pytest.mark.parametrize("threshold", [0, 2, 10, 11])
+def test_small_inputs_return_all_points(lttb, threshold):
+    x = np.arange(10, dtype=np.float64)
+    result = lttb.lttb_indices(x, x * 2, threshold)
+    assert result.tolist() == list(range(10))
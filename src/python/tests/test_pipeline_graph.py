@@ -0,0 +1,99 @@
+"""调度依赖图：关键路径、下游节点与监听模式下受影响节点的推导。"""
+
+from __future__ import annotations
+
+from itertools import permutations
+
+import pytest
+
+import run_pipeline
+
+
+def _all_paths(deps: dict[str, list[str]]) -> list[list[str]]:
+    """枚举依赖图上以任一节点结尾、沿上游回溯到源头的全部路径。"""
+    paths: list[list[str]] = []
+
+    def extend(path: list[str]) -> None:
+        upstream = deps[path[0]]
+        if not upstream:
+            paths.append(path)
+        for name in upstream:
+            extend([name, *path])
+
+    for name in deps:
+        extend([name])
+    return paths
+
+
+def _brute_force_critical_path(deps, durations) -> tuple[list[str], float]:
+    best = max(_all_paths(deps), key=lambda p: sum(durations.get(n, 0.0) for n in p))
+    return best, round(sum(durations.get(n, 0.0) for n in best), 3)
+
+
+def test_critical_path_on_pipeline_graph():
+    deps = run_pipeline.node_dependencies(run_pipeline.PIPELINE_GRAPH)
+    names = sorted(deps)
+    for seed in range(len(names)):
+        # 耗时为互不相同的 2 的幂：不同路径的总耗时两两不同，最长路径唯一
+        durations = {
+            name: 2.0 ** ((i * 7 + seed) % len(names)) for i, name in enumerate(names)
+        }
+        assert run_pipeline.critical_path(deps, durations) == (
+            _brute_force_critical_path(deps, durations)
+        )
+
+
+def test_critical_path_on_diamond_graph():
+    """多上游节点取完成最晚的一支；缺少耗时的节点按 0 计。"""
+    deps = {"a": [], "b": ["a"], "c": ["a"], "d": ["b", "c"], "e": []}
+    for order in permutations(["a", "b", "c", "d"]):
+        durations = {name: float(i + 1) for i, name in enumerate(order)}
+        durations["e"] = 0.5
+        assert run_pipeline.critical_path(deps, durations) == (
+            _brute_force_critical_path(deps, durations)
+        )
+    assert run_pipeline.critical_path(deps, {"e": 2.0}) == (["e"], 2.0)
+    assert run_pipeline.critical_path({}, {}) == ([], 0.0)
+
+
+def test_downstream_nodes():
+    deps = run_pipeline.node_dependencies(run_pipeline.PIPELINE_GRAPH)
+    assert run_pipeline.downstream_nodes(deps, {"grid_history"}) == {
+        "grid_history",
+        "grid_history_charts",
+        "grid_pyramid",
+        "grid_recent_charts",
+        "grid_rolling_charts",
+    }
+    assert run_pipeline.downstream_nodes(deps, {"beibei_charts"}) == {"beibei_charts"}
+    assert run_pipeline.downstream_nodes(deps, set()) == set()
+
+
+@pytest.fixture(scope="module")
+def raw_patterns(stage_module) -> dict[str, tuple[str, ...]]:
+    module = stage_module("preprocessing", "run_preprocessing")
+    return {step.name: step.raw_patterns for step in module.PREPROCESS_STEPS}
+
+
+@pytest.mark.parametrize(
+    "file_names",
+    [
+        {"大气网格化监测历史数据信息(4).json"},
+        {"空气优良天数(1).json", "延伸期预报气象服务(1).json"},
+        {"北碚区主要年份气象基本情况信息(2).json", "大气网格化监测历史数据信息(1).json"},
+        {"空气优良天数(2).json", "大气网格化监测历史数据信息.json", "notes.txt"},
+        set(),
+    ],
+)
+def test_affected_nodes_match_step_globs(tmp_path, raw_patterns, file_names):
+    """受影响节点与各预处理步骤在原始目录中实际匹配到的文件一致。"""
+    for name in file_names:
+        (tmp_path / name).write_text("[]", encoding="utf-8")
+    expected = {
+        step
+        for step, globs in raw_patterns.items()
+        if any(
+            path.name in file_names for glob in globs for path in tmp_path.glob(glob)
+        )
+    }
+    assert run_pipeline.affected_nodes(file_names, raw_patterns) == expected
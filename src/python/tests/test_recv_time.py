@@ -0,0 +1,67 @@
+"""recv_time 批量解析：去重 + 固定版式快速路径与原格式解析结果一致。"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture(scope="module")
+def common(stage_module):
+    return stage_module("preprocessing", "common")
+
+
+def _reference(common, series: pd.Series) -> pd.Series:
+    return pd.to_datetime(series, format=common.RECV_TIME_FORMAT, errors="coerce")
+
+
+def test_fast_path_matches_strptime(common):
+    series = pd.Series(
+        [
+            "Fri Jan 01 01:00:00 CST 2021",
+            "Fri Jan 01 01:00:00 CST 2021",
+            "Fri Jan 01 02:00:00 CST 2021",
+            "Sat Dec 31 23:59:59 CST 2022",
+            "Tue Feb 29 12:00:00 CST 2028",
+        ],
+        index=[10, 11, 12, 13, 14],
+    )
+    result = common.parse_recv_time_series(series)
+    pd.testing.assert_series_equal(result, _reference(common, series))
+
+
+def test_fallback_and_malformed_rows(common):
+    """不符合固定版式的行回退到原格式解析，无法解析的为 NaT。"""
+    series = pd.Series(
+        [
+            "Fri Jan 01 01:00:00 CST 2021",
+            # 日期只有一位：固定版式不匹配，原格式可解析
+            "Fri Jan 1 02:00:00 CST 2021",
+            # 星期与日期不符：两种解析都忽略星期
+            "Mon Jan 01 03:00:00 CST 2021",
+            "Sun Feb 30 01:00:00 CST 2021",
+            "Fri Jan 01 25:00:00 CST 2021",
+            "Fri Jan 01 01:00:00 UTC 2021",
+            "garbage",
+            "",
+            None,
+            np.nan,
+        ]
+    )
+    result = common.parse_recv_time_series(series)
+    pd.testing.assert_series_equal(result, _reference(common, series))
+    assert result.iloc[1] == pd.Timestamp("2021-01-01 02:00:00")
+    assert result.iloc[3:].isna().all()
+
+
+def test_all_missing_keeps_reference_dtype(common):
+    series = pd.Series([None, None], dtype="object")
+    result = common.parse_recv_time_series(series)
+    pd.testing.assert_series_equal(result, _reference(common, series))
+
+
+def test_empty_series(common):
+    series = pd.Series([], dtype="object")
+    result = common.parse_recv_time_series(series)
+    pd.testing.assert_series_equal(result, _reference(common, series))
@@ -0,0 +1,114 @@
+"""滑动窗口统计与达标率：分组 rolling 结果与逐站点、逐时刻的直接计算一致。"""
+
+from __future__ import annotations
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture(scope="module")
+def rolling(stage_module):
+    return stage_module("processing", "process_grid_rolling_charts")
+
+
+@pytest.fixture(scope="module")
+def wide() -> pd.DataFrame:
+    """3 个站点的逐小时读数：随机缺小时与缺值，站点 3 读数太少，没有有效窗口。"""
+    rng = np.random.default_rng(42)
+    frames = []
+    for sp_id, hours in ((1, 24 * 6), (2, 24 * 4), (3, 5)):
+        stamps = pd.date_range("2022-01-01", periods=hours, freq="h")
+        keep = rng.random(hours) > 0.15
+        count = int(keep.sum())
+        frames.append(
+            pd.DataFrame(
+                {
+                    "sp_id": sp_id,
+                    "timestamp": stamps[keep],
+                    "pm2_5": rng.normal(0.075, 0.02, count).round(4),
+                    "o3": rng.normal(0.15, 0.03, count).round(4),
+                }
+            )
+        )
+    df = pd.concat(frames, ignore_index=True)
+    df.loc[rng.random(len(df)) < 0.05, "pm2_5"] = np.nan
+    return df.sample(frac=1, random_state=1).reset_index(drop=True)
+
+
+def _naive_rolling(df: pd.DataFrame, metric: str, window: str) -> pd.DataFrame:
+    """逐行取同站点 (t - window, t] 内的读数求条数、均值与最大值。"""
+    width = pd.Timedelta(window)
+    valid = df.dropna(subset=[metric]).sort_values(["sp_id", "timestamp"])
+    rows = []
+    for sp_id, station in valid.groupby("sp_id"):
+        times = station["timestamp"]
+        for stamp in times:
+            values = station.loc[(times > stamp - width) & (times <= stamp), metric]
+            rows.append((sp_id, stamp, len(values), values.mean(), values.max()))
+    return pd.DataFrame(rows, columns=["sp_id", "timestamp", "count", "mean", "max"])
+
+
+@pytest.mark.parametrize("window", ["1h", "8h", "24h"])
+def test_rolling_statistics_matches_naive(rolling, wide, window):
+    frame = wide.dropna(subset=["pm2_5"]).sort_values(["sp_id", "timestamp"])
+    result = rolling.rolling_statistics(
+        frame.reset_index(drop=True), "pm2_5", window, ("mean", "max")
+    )
+    expected = _naive_rolling(wide, "pm2_5", window)
+    assert result["sp_id"].tolist() == expected["sp_id"].tolist()
+    assert (result["timestamp"].to_numpy() == expected["timestamp"].to_numpy()).all()
+    assert result["count"].tolist() == expected["count"].tolist()
+    np.testing.assert_allclose(result["mean"], expected["mean"], rtol=1e-12)
+    np.testing.assert_allclose(result["max"], expected["max"], rtol=0)
+
+
+def _naive_compliance(df: pd.DataFrame, metric: str, limit) -> dict[int, dict]:
+    rolled = _naive_rolling(df, metric, limit.window)
+    expected = {}
+    for sp_id, station in rolled.groupby("sp_id"):
+        valid = station[station["count"] >= limit.min_count]
+        hours = len(valid)
+        exceed = int((valid["mean"] > limit.limit).sum())
+        expected[int(sp_id)] = {
+            "hours": hours,
+            "exceed_hours": exceed,
+            "compliance_rate": round(1 - exceed / hours, 4) if hours else None,
+            "max_value": round(valid["mean"].max(), 4) if hours else None,
+        }
+    return expected
+
+
+def test_compliance_counts_match_naive(stage_module, rolling, wide):
+    """整个步骤读入清洗数据、写出达标率图表，各站点计数与直接计算一致。"""
+    common = stage_module("processing", "common")
+    common.CLEANED_DIR.mkdir(parents=True, exist_ok=True)
+    wide.to_json(
+        common.CLEANED_DIR / "grid_history_wide.json",
+        orient="records",
+        date_format="iso",
+    )
+    rolling.process_grid_rolling_charts(windows=("8h", "24h"), stats=("mean",))
+    path = common.PROCESSED_DIR / "chart_grid_rolling_compliance.json"
+    items = json.loads(path.read_text(encoding="utf-8"))["items"]
+
+    for metric in ("pm2_5", "o3"):
+        limit = rolling.COMPLIANCE_LIMITS[metric]
+        expected = _naive_compliance(wide, metric, limit)
+        actual = {
+            item["sp_id"]: item
+            for item in items
+            if item["metric"] == metric and item["window"] == limit.window
+        }
+        assert set(actual) == set(expected) == {1, 2, 3}
+        for sp_id, values in expected.items():
+            item = actual[sp_id]
+            assert item["hours"] == values["hours"]
+            assert item["exceed_hours"] == values["exceed_hours"]
+            assert item["compliance_rate"] == values["compliance_rate"]
+            assert item["max_value"] == values["max_value"]
+        # 样例需覆盖超标与没有有效窗口（站点 3 只有 5 小时数据）两种情况
+        assert expected[1]["exceed_hours"] > 0
+        assert actual[3]["hours"] == 0 and actual[3]["compliance_rate"] is None
@@ -0,0 +1,75 @@
+"""流式统计量：分批合并结果与 pandas 整体统计一致。"""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture(scope="module")
+def running_stats(stage_module):
+    return stage_module("processing", "running_stats")
+
+
+def _merged(running_stats, values: np.ndarray, cuts: list[int]):
+    total = running_stats.RunningStats()
+    for batch in np.split(values, cuts):
+        total.merge(running_stats.RunningStats.from_values(batch))
+    return total
+
+
+def _assert_matches(stats, values: np.ndarray, std_rel: float = 1e-9) -> None:
+    series = pd.Series(values)
+    assert stats.count == series.count()
+    assert stats.mean == pytest.approx(series.mean(), rel=1e-12)
+    assert stats.std == pytest.approx(series.std(), rel=std_rel)
+    assert stats.min == series.min()
+    assert stats.max == series.max()
+
+
+@pytest.mark.parametrize("cuts", [[], [1], [0, 0, 500], [3, 10, 999, 1500]])
+def test_merge_matches_pandas(running_stats, cuts):
+    rng = np.random.default_rng(11)
+    values = rng.normal(50, 5, 2000)
+    values[rng.random(2000) < 0.1] = np.nan
+    _assert_matches(_merged(running_stats, values, cuts), values)
+
+
+def test_large_offset_is_stable(running_stats):
+    """均值远大于离散度时，合并后的方差不受“平方和减平方”抵消影响。
+
+    各批均值本身只有约 1e-7 的绝对精度，标准差按 1e-6 相对误差比较；
+    平方和减平方的写法在此量级下方差完全抵消为 0。
+    """
+    rng = np.random.default_rng(5)
+    values = 1e9 + rng.random(1000)
+    merged = _merged(running_stats, values, [100, 250, 700])
+    _assert_matches(merged, values, std_rel=1e-6)
+
+
+def test_merge_order_does_not_matter(running_stats):
+    rng = np.random.default_rng(3)
+    batches = [rng.random(size) for size in (1, 7, 40)]
+    forward = running_stats.RunningStats()
+    backward = running_stats.RunningStats()
+    for batch in batches:
+        forward.merge(running_stats.RunningStats.from_values(batch))
+    for batch in reversed(batches):
+        backward.merge(running_stats.RunningStats.from_values(batch))
+    assert forward.count == backward.count
+    assert forward.mean == pytest.approx(backward.mean, rel=1e-12)
+    assert forward.m2 == pytest.approx(backward.m2, rel=1e-12)
+    assert (forward.min, forward.max) == (backward.min, backward.max)
+
+
+def test_empty_and_single_value(running_stats):
+    empty = running_stats.RunningStats.from_values([np.nan, np.nan])
+    assert empty.count == 0
+    assert math.isnan(empty.std)
+    single = running_stats.RunningStats().merge(empty)
+    single.merge(running_stats.RunningStats.from_values([4.0]))
+    assert (single.count, single.mean, single.min, single.max) == (1, 4.0, 4.0, 4.0)
+    assert math.isnan(single.std)
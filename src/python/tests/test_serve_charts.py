@@ -0,0 +1,152 @@
+"""本地查询服务：ETag / 304 协商与按字节淘汰的 LRU 缓存。"""
+
+from __future__ import annotations
+
+from http import HTTPStatus
+import json
+import os
+import random
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def serve_charts(stage_module):
+    return stage_module("processing", "serve_charts")
+
+
+class _ReferenceLru:
+    """直接的列表实现：按最近使用排序，超出容量时从最久未用的一端淘汰。"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.items: list[tuple[str, int, bytes]] = []
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, stamp):
+        for i, (item_key, item_stamp, value) in enumerate(self.items):
+            if item_key == key and item_stamp == stamp:
+                self.items.append(self.items.pop(i))
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def put(self, key, stamp, value):
+        if len(value) > self.max_bytes:
+            return
+        self.items = [item for item in self.items if item[0] != key]
+        self.items.append((key, stamp, value))
+        while sum(len(item[2]) for item in self.items) > self.max_bytes:
+            self.items.pop(0)
+            self.evictions += 1
+
+
+def test_lru_matches_reference(serve_charts):
+    rng = random.Random(0)
+    cache = serve_charts.ByteLruCache(100)
+    reference = _ReferenceLru(100)
+    for _ in range(2000):
+        key, stamp = f"k{rng.randrange(12)}", rng.randrange(2)
+        if rng.random() < 0.5:
+            assert cache.get(key, stamp) == reference.get(key, stamp)
+        else:
+            value = bytes(rng.randrange(130))
+            cache.put(key, stamp, value)
+            reference.put(key, stamp, value)
+    stats = cache.stats()
+    assert stats["entries"] == len(reference.items)
+    assert stats["bytes"] == sum(len(item[2]) for item in reference.items)
+    assert stats["bytes"] <= stats["max_bytes"]
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (
+        reference.hits,
+        reference.misses,
+        reference.evictions,
+    )
+    assert stats["evictions"] > 0
+
+
+def test_lru_evicts_least_recently_used(serve_charts):
+    cache = serve_charts.ByteLruCache(10)
+    cache.put("a", 1, b"aaaa")
+    cache.put("b", 1, b"bbbb")
+    assert cache.get("a", 1) == b"aaaa"
+    cache.put("c", 1, b"cccc")
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) == b"aaaa"
+    assert cache.get("a", 2) is None
+    cache.put("big", 1, b"x" * 11)
+    assert cache.get("big", 1) is None
+    assert cache.stats()["evictions"] == 1
+
+
+def _write(path, payload, mtime_ns: int) -> None:
+    path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def service(serve_charts, tmp_path):
+    _write(tmp_path / "chart_a.json", {"xAxis": [1, 2], "series": {}}, 10**18)
+    _write(tmp_path / "chart_b.json", [{"v": 1}], 10**18)
+    _write(tmp_path / "build_manifest.json", {"steps": {}}, 10**18)
+    return serve_charts.ChartService(processed_dir=tmp_path, cache_bytes=1 << 20)
+
+
+def test_single_dataset_etag_and_304(service, tmp_path):
+    path = "/api/charts/datasets/chart_a"
+    status, body, etag = service.handle("GET", path, b"", None)
+    assert status == HTTPStatus.OK and etag
+    data = json.loads(body)["data"]
+    assert data["datasetKey"] == "chart_a"
+    assert data["payload"] == json.loads((tmp_path / "chart_a.json").read_text())
+
+    for header in (etag, f'"other", {etag}', "*"):
+        status, body, again = service.handle("GET", path, b"", header)
+        assert (status, body, again) == (HTTPStatus.NOT_MODIFIED, b"", etag)
+    status, _, _ = service.handle("GET", path, b"", '"stale"')
+    assert status == HTTPStatus.OK
+
+    # 文件重写后版本戳变化：旧 ETag 不再命中，返回新内容
+    _write(tmp_path / "chart_a.json", {"xAxis": [1, 2, 3], "series": {}}, 2 * 10**18)
+    status, body, new_etag = service.handle("GET", path, b"", etag)
+    assert status == HTTPStatus.OK and new_etag != etag
+    assert json.loads(body)["data"]["payload"]["xAxis"] == [1, 2, 3]
+
+
+def test_batch_and_list_etags(service):
+    request = json.dumps({"datasetKeys": ["chart_b", "chart_a", "missing"]}).encode()
+    path = "/api/charts/datasets/query"
+    status, body, etag = service.handle("POST", path, request, None)
+    assert status == HTTPStatus.OK
+    data = json.loads(body)["data"]
+    assert sorted(data["items"]) == ["chart_a", "chart_b"]
+    assert (data["hitCount"], data["requestCount"]) == (2, 3)
+    assert service.handle("POST", path, request, etag)[0] == HTTPStatus.NOT_MODIFIED
+
+    status, body, etag = service.handle("GET", "/api/charts/datasets", b"", None)
+    keys = [item["datasetKey"] for item in json.loads(body)["data"]["items"]]
+    assert keys == ["chart_a", "chart_b"]
+    assert service.handle("GET", "/api/charts/datasets", b"", etag)[0] == (
+        HTTPStatus.NOT_MODIFIED
+    )
+
+
+@pytest.mark.parametrize("key", ["build_manifest", "../chart_a", "missing"])
+def test_excluded_and_unknown_keys(service, key):
+    status, body, etag = service.handle("GET", f"/api/charts/datasets/{key}", b"", None)
+    assert status == HTTPStatus.NOT_FOUND and etag is None
+    assert json.loads(body)["success"] is False
+
+
+def test_records_are_evicted_under_small_cache(serve_charts, tmp_path):
+    for index in range(5):
+        _write(tmp_path / f"chart_{index}.json", {"items": [index] * 50}, 10**18)
+    service = serve_charts.ChartService(processed_dir=tmp_path, cache_bytes=600)
+    for _ in range(2):
+        for index in range(5):
+            path = f"/api/charts/datasets/chart_{index}"
+            assert service.handle("GET", path, b"", None)[0] == HTTPStatus.OK
+    stats = service.cache.stats()
+    assert stats["evictions"] > 0
+    assert stats["bytes"] <= 600
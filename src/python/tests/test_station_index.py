@@ -0,0 +1,148 @@
+"""站点时间索引：二分定位与分区合并结果与 pandas 直接筛选一致。"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+BLOCK_ROWS = 4
+VALUE_COLUMNS = ["pm2_5", "no2"]
+
+
+def _sample_wide() -> pd.DataFrame:
+    """3 个站点，行序打乱；站点 1 的同一时间跨越块边界，另含缺键、缺时间的行。"""
+    base = pd.Timestamp("2022-03-01")
+    hours = [0, 1, 2, 3, 3, 3, 3, 3, 4, 5, 7, 7, 9]
+    rows = [(1, base + pd.Timedelta(hours=h)) for h in hours]
+    rows += [(2, base + pd.Timedelta(hours=h)) for h in range(0, 12, 2)]
+    rows += [(30, base + pd.Timedelta(hours=5))]
+    df = pd.DataFrame(rows, columns=["sp_id", "timestamp"])
+    rng = np.random.default_rng(7)
+    df["pm2_5"] = rng.random(len(df)).round(4)
+    df["no2"] = rng.random(len(df)).round(4)
+    df.loc[3, "no2"] = np.nan
+    df = df.sample(frac=1, random_state=3).reset_index(drop=True)
+    extra = pd.DataFrame(
+        {
+            "sp_id": [np.nan, 1],
+            "timestamp": [base, pd.NaT],
+            "pm2_5": [0.5, 0.5],
+            "no2": [0.5, 0.5],
+        }
+    )
+    return pd.concat([df, extra], ignore_index=True)
+
+
+def _reference(df: pd.DataFrame, key: int, start, end) -> pd.DataFrame:
+    """pandas 直接筛选 [start, end)，按 (站点, 时间) 稳定排序。"""
+    valid = df[df["sp_id"].notna() & df["timestamp"].notna()]
+    valid = valid.sort_values(["sp_id", "timestamp"], kind="stable")
+    mask = valid["sp_id"] == key
+    if start is not None:
+        mask &= valid["timestamp"] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= valid["timestamp"] < pd.Timestamp(end)
+    result = valid.loc[mask, ["timestamp", *VALUE_COLUMNS]].reset_index(drop=True)
+    result["timestamp"] = result["timestamp"].astype("datetime64[ns]")
+    return result.astype({col: "float64" for col in VALUE_COLUMNS})
+
+
+def _bounds(df: pd.DataFrame) -> list:
+    """全部出现过的时间、块边界上重复时间的前后 1 ns、范围外时间与 None。"""
+    times = [pd.Timestamp(stamp) for stamp in sorted(df["timestamp"].dropna().unique())]
+    boundary = pd.Timestamp("2022-03-01 03:00")
+    return [
+        None,
+        pd.Timestamp("2000-01-01"),
+        pd.Timestamp("2100-01-01"),
+        boundary - pd.Timedelta(1, "ns"),
+        boundary + pd.Timedelta(1, "ns"),
+        *times,
+    ]
+
+
+@pytest.fixture(scope="module")
+def sample() -> pd.DataFrame:
+    return _sample_wide()
+
+
+@pytest.fixture(scope="module")
+def station_index(stage_module, sample):
+    """先以预处理阶段写出整表索引与两个分区索引，再切换到二次处理阶段读取。"""
+    prep = stage_module("preprocessing", "common")
+    half = len(sample) // 2
+    for name, df in (
+        ("test_full", sample),
+        ("test_part_a", sample.iloc[:half]),
+        ("test_part_b", sample.iloc[half:]),
+    ):
+        prep.save_station_index(df, name, VALUE_COLUMNS, block_rows=BLOCK_ROWS)
+    return stage_module("processing", "station_index")
+
+
+def test_index_spans_block_boundaries(station_index):
+    index = station_index.load_station_index("test_full")
+    entry = index.stations[1]
+    # 站点 1 的 5 行相同时间落在第 1、2 两个块中
+    assert entry["end"] - entry["start"] == 13
+    assert len(entry["blocks"]) == 4
+
+
+def test_locate_matches_pandas(station_index, sample):
+    index = station_index.load_station_index("test_full")
+    bounds = _bounds(sample)
+    for key in (1, 2, 30):
+        for start in bounds:
+            for end in bounds:
+                expected = _reference(sample, key, start, end)
+                assert index.count(key, start, end) == len(expected)
+                result = index.query(key, start, end)
+                pd.testing.assert_frame_equal(result, expected)
+
+
+def test_first_duplicate_time_on_block_boundary(station_index, sample):
+    index = station_index.load_station_index("test_full")
+    start = pd.Timestamp("2022-03-01 03:00")
+    lo, hi = index.locate(1, start, start + pd.Timedelta(hours=1))
+    assert (lo, hi) == (index.stations[1]["start"] + 3, index.stations[1]["start"] + 8)
+
+
+def test_unknown_station(station_index):
+    index = station_index.load_station_index("test_full")
+    assert index.locate(999) == (0, 0)
+    assert index.count(999) == 0
+    result = index.query(999, columns=["pm2_5"])
+    assert result.empty
+    assert list(result.columns) == ["timestamp", "pm2_5"]
+
+
+def test_unknown_column(station_index):
+    index = station_index.load_station_index("test_full")
+    with pytest.raises(KeyError):
+        index.query(1, columns=["so2"])
+
+
+def test_partitioned_index_matches_full(station_index, sample):
+    full = station_index.load_station_index("test_full")
+    parts = station_index.PartitionedStationIndex(
+        [
+            station_index.load_station_index("test_part_a"),
+            station_index.load_station_index("test_part_b"),
+        ]
+    )
+    assert parts.value_columns == full.value_columns
+    assert parts.station_rows() == full.station_rows()
+    bounds = _bounds(sample)
+    for key in (1, 2, 30, 999):
+        for start in bounds:
+            for end in bounds:
+                assert parts.count(key, start, end) == full.count(key, start, end)
+                pd.testing.assert_frame_equal(
+                    parts.query(key, start, end), full.query(key, start, end)
+                )
+
+
+def test_missing_index_returns_none(station_index):
+    assert station_index.load_station_index("test_missing") is None